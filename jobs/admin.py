@@ -0,0 +1,21 @@
+from django.contrib import admin
+from django.utils import timezone
+
+from .models import Job
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ['task', 'status', 'attempts', 'max_attempts', 'run_at', 'locked_by', 'locked_until', 'created_at']
+    list_filter = ['status', 'task']
+    search_fields = ['task', 'last_error']
+    readonly_fields = ['attempts', 'locked_by', 'locked_until', 'last_error', 'created_at', 'finished_at']
+    actions = ['retry_jobs']
+
+    @admin.action(description='Перезапустить выбранные задачи')
+    def retry_jobs(self, request, queryset):
+        updated = queryset.update(
+            status='queued', attempts=0, run_at=timezone.now(),
+            locked_by='', locked_until=None, finished_at=None,
+        )
+        self.message_user(request, f'Задач поставлено в очередь: {updated}')
@@ -0,0 +1,73 @@
+import multiprocessing
+import signal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from jobs.worker import run_worker, worker_name
+
+
+class _StopFlag:
+    def __init__(self):
+        self.stopped = False
+
+    def __call__(self):
+        return self.stopped
+
+    def stop(self, *args):
+        self.stopped = True
+
+
+def _worker_process(sleep, burst):
+    stop = _StopFlag()
+    signal.signal(signal.SIGTERM, stop.stop)
+    signal.signal(signal.SIGINT, stop.stop)
+    run_worker(worker=worker_name(), sleep=sleep, burst=burst, should_stop=stop)
+
+
+class Command(BaseCommand):
+    help = ('Выполняет фоновые задачи из очереди. С --processes N запускает N процессов-обработчиков; '
+            'останавливается по SIGTERM/SIGINT после завершения текущих задач')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=1,
+                            help='Количество процессов-обработчиков')
+        parser.add_argument('--sleep', type=float, default=1.0,
+                            help='Пауза в секундах между опросами пустой очереди')
+        parser.add_argument('--burst', action='store_true',
+                            help='Выйти, когда в очереди не останется доступных задач')
+
+    def handle(self, *args, **options):
+        processes = options['processes']
+        if processes < 1:
+            raise CommandError('--processes должно быть не меньше 1')
+
+        if processes == 1:
+            stop = _StopFlag()
+            signal.signal(signal.SIGTERM, stop.stop)
+            signal.signal(signal.SIGINT, stop.stop)
+            processed = run_worker(sleep=options['sleep'], burst=options['burst'], should_stop=stop)
+            self.stdout.write(self.style.SUCCESS(f'Обработчик остановлен. Выполнено задач: {processed}'))
+            return
+
+        # Дочерние процессы не должны наследовать открытые соединения с базой
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        workers = [
+            context.Process(target=_worker_process, args=(options['sleep'], options['burst']), name=f'worker-{number}')
+            for number in range(processes)
+        ]
+        for process in workers:
+            process.start()
+        self.stdout.write(f'Запущено обработчиков: {processes}')
+
+        def forward(signum, frame):
+            for process in workers:
+                if process.is_alive():
+                    process.terminate()
+
+        signal.signal(signal.SIGTERM, forward)
+        signal.signal(signal.SIGINT, forward)
+        for process in workers:
+            process.join()
+        self.stdout.write(self.style.SUCCESS('Все обработчики остановлены'))
@@ -0,0 +1,95 @@
+"""Регистрация фоновых задач и постановка их в очередь.
+
+    from jobs.queue import task
+
+    @task(max_attempts=3)
+    def send_digest(user_id):
+        ...
+
+    send_digest.delay(user.pk)
+
+Задача попадает в таблицу Job только после коммита текущей транзакции
+(transaction.on_commit), поэтому обработчик никогда не увидит данные,
+которые ещё не записаны, а откаченные изменения не порождают задач.
+Аргументы должны сериализоваться в JSON — передавайте id, а не объекты.
+При JOBS_EAGER = True задачи выполняются сразу после коммита в том же
+процессе (удобно для тестов и отладки).
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+
+DEFAULT_MAX_ATTEMPTS = 5
+DEFAULT_TIMEOUT = 300
+DEFAULT_BACKOFF = 30
+MAX_BACKOFF = 3600
+
+_registry = {}
+
+
+class Task:
+    def __init__(self, func, name, max_attempts, timeout, backoff):
+        self.func = func
+        self.name = name
+        self.max_attempts = max_attempts
+        self.timeout = timeout
+        self.backoff = backoff
+        self.__doc__ = func.__doc__
+
+    def __call__(self, *args, **kwargs):
+        return self.func(*args, **kwargs)
+
+    def __repr__(self):
+        return f'<Task {self.name}>'
+
+    def delay(self, *args, **kwargs):
+        """Поставить задачу в очередь после коммита текущей транзакции"""
+        enqueue(self, args, kwargs)
+
+    def retry_delay(self, attempts):
+        """Экспоненциальная задержка перед следующей попыткой"""
+        return timedelta(seconds=min(self.backoff * 2 ** max(attempts - 1, 0), MAX_BACKOFF))
+
+
+def task(func=None, *, name=None, max_attempts=DEFAULT_MAX_ATTEMPTS, timeout=DEFAULT_TIMEOUT,
+         backoff=DEFAULT_BACKOFF):
+    """Декоратор, регистрирующий функцию как фоновую задачу.
+
+    timeout — время аренды задачи обработчиком: если за это время обработчик
+    не отчитался (упал или завис), задача снова становится доступной.
+    """
+    def decorator(func):
+        task_name = name or f'{func.__module__}.{func.__qualname__}'
+        registered = Task(func, task_name, max_attempts, timeout, backoff)
+        _registry[task_name] = registered
+        return registered
+
+    return decorator(func) if func is not None else decorator
+
+
+def get_task(name):
+    return _registry.get(name)
+
+
+def is_eager():
+    return getattr(settings, 'JOBS_EAGER', False)
+
+
+def enqueue(task, args=(), kwargs=None):
+    kwargs = kwargs or {}
+    if is_eager():
+        transaction.on_commit(lambda: task.func(*args, **kwargs))
+        return
+
+    def create_job():
+        from .models import Job
+
+        Job.objects.create(
+            task=task.name,
+            args=list(args),
+            kwargs=kwargs,
+            max_attempts=task.max_attempts,
+        )
+
+    transaction.on_commit(create_job)
@@ -0,0 +1,172 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.db import transaction
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from .models import Job
+from .queue import MAX_BACKOFF, get_task, task
+from .worker import claim, execute, run_worker
+
+calls = []
+
+
+@task(name='jobs.tests.record', timeout=60)
+def record(value):
+    calls.append(value)
+
+
+@task(name='jobs.tests.fail', max_attempts=2, backoff=10)
+def fail():
+    raise ValueError('сломалось')
+
+
+class JobTestCase(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def enqueue(self, registered, *args):
+        with self.captureOnCommitCallbacks(execute=True):
+            registered.delay(*args)
+        return Job.objects.latest('id')
+
+    def make_available(self, job):
+        Job.objects.filter(pk=job.pk).update(run_at=timezone.now() - timedelta(seconds=1))
+
+
+class EnqueueTests(JobTestCase):
+    def test_job_is_created_after_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            record.delay(1)
+            self.assertFalse(Job.objects.exists())
+        self.assertEqual(len(callbacks), 1)
+        callbacks[0]()
+        job = Job.objects.get()
+        self.assertEqual((job.task, job.args, job.status), ('jobs.tests.record', [1], 'queued'))
+
+    def test_rolled_back_transaction_creates_no_job(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            try:
+                with transaction.atomic():
+                    record.delay(1)
+                    raise ValueError
+            except ValueError:
+                pass
+        self.assertEqual(callbacks, [])
+        self.assertFalse(Job.objects.exists())
+
+    @override_settings(JOBS_EAGER=True)
+    def test_eager_runs_after_commit_without_job(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            record.delay(1)
+            self.assertEqual(calls, [])
+        self.assertEqual(calls, [1])
+        self.assertFalse(Job.objects.exists())
+
+
+class ClaimTests(JobTestCase):
+    def test_claimed_job_is_leased(self):
+        job = self.enqueue(record, 1)
+        claimed = claim('a')
+        self.assertEqual(claimed.pk, job.pk)
+        self.assertEqual((claimed.status, claimed.locked_by, claimed.attempts), ('running', 'a', 1))
+        self.assertAlmostEqual(claimed.locked_until, timezone.now() + timedelta(seconds=60), delta=timedelta(seconds=5))
+        self.assertIsNone(claim('b'))
+
+    def test_contended_claim_moves_to_next_candidate(self):
+        first = self.enqueue(record, 1)
+        second = self.enqueue(record, 2)
+        raced = []
+
+        def racing_get_task(name):
+            # Между чтением кандидатов и UPDATE обработчика b задачу забирает обработчик a
+            if not raced:
+                raced.append(True)
+                self.assertEqual(claim('a').pk, first.pk)
+            return get_task(name)
+
+        with mock.patch('jobs.worker.get_task', side_effect=racing_get_task):
+            claimed = claim('b')
+        self.assertEqual(claimed.pk, second.pk)
+        first.refresh_from_db()
+        self.assertEqual((first.locked_by, first.attempts), ('a', 1))
+
+    def test_future_job_is_not_claimed(self):
+        job = self.enqueue(record, 1)
+        Job.objects.filter(pk=job.pk).update(run_at=timezone.now() + timedelta(minutes=1))
+        self.assertIsNone(claim('a'))
+
+    def test_expired_lease_is_reclaimed(self):
+        job = self.enqueue(record, 1)
+        stale = claim('a')
+        Job.objects.filter(pk=job.pk).update(locked_until=timezone.now() - timedelta(seconds=1))
+        reclaimed = claim('b')
+        self.assertEqual((reclaimed.pk, reclaimed.locked_by, reclaimed.attempts), (job.pk, 'b', 2))
+
+        # Опоздавший обработчик выполняет задачу, но не трогает чужую аренду
+        self.assertTrue(execute(stale, 'a'))
+        self.assertTrue(Job.objects.filter(pk=job.pk, locked_by='b').exists())
+        self.assertTrue(execute(reclaimed, 'b'))
+        self.assertFalse(Job.objects.exists())
+        self.assertEqual(calls, [1, 1])
+
+    def test_expired_lease_after_last_attempt_fails(self):
+        job = self.enqueue(fail)
+        for worker in ('a', 'b'):
+            claim(worker)
+            Job.objects.filter(pk=job.pk).update(locked_until=timezone.now() - timedelta(seconds=1))
+        last = claim('c')
+        self.assertEqual(last.attempts, 3)
+        self.assertFalse(execute(last, 'c'))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.last_error), ('failed', 'Истекла аренда'))
+
+
+class ExecuteTests(JobTestCase):
+    def test_success_deletes_job(self):
+        self.enqueue(record, 1)
+        self.assertTrue(execute(claim('a'), 'a'))
+        self.assertEqual(calls, [1])
+        self.assertFalse(Job.objects.exists())
+
+    def test_failure_is_retried_with_backoff(self):
+        job = self.enqueue(fail)
+        started = timezone.now()
+        with self.assertLogs('jobs.worker', 'ERROR'):
+            self.assertFalse(execute(claim('a'), 'a'))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, job.locked_by, job.locked_until), ('queued', 1, '', None))
+        self.assertEqual(job.last_error, 'ValueError: сломалось')
+        self.assertGreaterEqual(job.run_at, started + timedelta(seconds=10))
+        self.assertIsNone(claim('a'))
+
+    def test_retry_delay_doubles_up_to_limit(self):
+        self.assertEqual([fail.retry_delay(attempt).total_seconds() for attempt in (1, 2, 3)], [10, 20, 40])
+        self.assertEqual(fail.retry_delay(30), timedelta(seconds=MAX_BACKOFF))
+
+    def test_max_attempts_marks_job_failed(self):
+        job = self.enqueue(fail)
+        with self.assertLogs('jobs.worker', 'ERROR') as logs:
+            execute(claim('a'), 'a')
+            self.make_available(job)
+            execute(claim('a'), 'a')
+        self.assertEqual(len(logs.records), 2)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('failed', 2))
+        self.assertIsNotNone(job.finished_at)
+        self.make_available(job)
+        self.assertIsNone(claim('a'))
+
+    def test_unknown_task_fails(self):
+        job = Job.objects.create(task='jobs.tests.missing')
+        self.assertFalse(execute(claim('a'), 'a'))
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'failed')
+
+    def test_burst_worker_drains_queue(self):
+        for value in range(3):
+            self.enqueue(record, value)
+        self.assertEqual(run_worker('a', burst=True), 3)
+        self.assertEqual(calls, [0, 1, 2])
+        self.assertFalse(Job.objects.exists())
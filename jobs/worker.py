@@ -0,0 +1,111 @@
+"""Обработчик очереди задач.
+
+Задача захватывается одним UPDATE с условием на статус и срок аренды, поэтому
+несколько процессов не выполнят её одновременно и не нужен SELECT ... FOR
+UPDATE SKIP LOCKED, которого нет в SQLite. Аренда (locked_until) действует
+timeout секунд задачи; если обработчик за это время не завершил задачу,
+её может забрать другой. Захват засчитывается как попытка, так что задача,
+роняющая обработчик, не будет перезапускаться бесконечно.
+"""
+import logging
+import os
+import socket
+import time
+from datetime import timedelta
+
+from django.db import OperationalError, close_old_connections
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Job
+from .queue import DEFAULT_TIMEOUT, get_task
+
+CLAIM_CANDIDATES = 10
+
+logger = logging.getLogger(__name__)
+
+
+def worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def _available(now):
+    return Q(status='queued', run_at__lte=now) | Q(status='running', locked_until__lt=now)
+
+
+def claim(worker):
+    """Захватить следующую доступную задачу; None, если очередь пуста"""
+    now = timezone.now()
+    candidates = Job.objects.filter(_available(now)).order_by('run_at', 'id').values_list('pk', 'task')
+    for pk, task_name in candidates[:CLAIM_CANDIDATES]:
+        task = get_task(task_name)
+        timeout = task.timeout if task else DEFAULT_TIMEOUT
+        claimed = Job.objects.filter(_available(now), pk=pk).update(
+            status='running',
+            locked_by=worker,
+            locked_until=now + timedelta(seconds=timeout),
+            attempts=F('attempts') + 1,
+        )
+        if claimed:
+            return Job.objects.get(pk=pk)
+    return None
+
+
+def _finish(job, worker, **fields):
+    # Если аренда истекла и задачу забрал другой обработчик, результат не записываем
+    return Job.objects.filter(pk=job.pk, locked_by=worker).update(**fields)
+
+
+def execute(job, worker):
+    """Выполнить захваченную задачу и записать результат"""
+    task = get_task(job.task)
+    now = timezone.now()
+    if task is None:
+        _finish(job, worker, status='failed', last_error=f'Неизвестная задача {job.task}', finished_at=now)
+        return False
+    if job.attempts > job.max_attempts:
+        _finish(job, worker, status='failed', last_error=job.last_error or 'Истекла аренда', finished_at=now)
+        return False
+
+    try:
+        task.func(*job.args, **job.kwargs)
+    except Exception as exc:
+        logger.exception('Задача %s #%s: ошибка (попытка %s из %s)', job.task, job.pk, job.attempts, job.max_attempts)
+        error = f'{type(exc).__name__}: {exc}'
+        if job.attempts >= job.max_attempts:
+            _finish(job, worker, status='failed', last_error=error, finished_at=timezone.now())
+        else:
+            _finish(
+                job, worker, status='queued', last_error=error, locked_by='', locked_until=None,
+                run_at=timezone.now() + task.retry_delay(job.attempts),
+            )
+        return False
+
+    Job.objects.filter(pk=job.pk, locked_by=worker).delete()
+    return True
+
+
+def run_worker(worker=None, sleep=1.0, burst=False, should_stop=lambda: False):
+    """Выполнять задачи, пока should_stop() не вернёт True.
+
+    burst — выйти, как только очередь опустеет. Возвращает число выполненных задач.
+    """
+    worker = worker or worker_name()
+    processed = 0
+    while not should_stop():
+        close_old_connections()
+        try:
+            job = claim(worker)
+        except OperationalError:
+            # База занята другим процессом (SQLite) — попробуем позже
+            logger.warning('Обработчик %s: не удалось захватить задачу', worker, exc_info=True)
+            job = None
+        if job is None:
+            if burst:
+                break
+            time.sleep(sleep)
+            continue
+        execute(job, worker)
+        processed += 1
+    close_old_connections()
+    return processed
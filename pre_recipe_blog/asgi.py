@@ -1,5 +1,10 @@
 """
 ASGI config for pre_recipe_blog project.
+
+Поток уведомлений (users.views.notifications_stream) держит соединение
+открытым и работает только под ASGI-сервером, например:
+
+    uvicorn pre_recipe_blog.asgi:application
 """
 
 import os
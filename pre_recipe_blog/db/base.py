@@ -0,0 +1,79 @@
+"""SQLite с настройками для одновременной записи.
+
+Стандартный бэкенд открывает транзакцию командой BEGIN (DEFERRED): блокировка
+на запись берётся только при первой записи, и если к этому моменту пишет
+другое соединение, SQLite сразу отвечает «database is locked» — busy_timeout
+в этом случае не помогает. Поэтому транзакции здесь открываются через
+BEGIN IMMEDIATE: очередь за блокировкой возникает на входе в transaction.atomic,
+где её обслуживает busy_timeout, а если и его не хватило, BEGIN повторяется
+несколько раз с растущей паузой. Ничего ещё не выполнено, так что повтор
+безопасен.
+
+Каждое новое соединение получает PRAGMA из OPTIONS['pragmas']: WAL позволяет
+читать во время записи, synchronous = NORMAL в режиме WAL не теряет
+целостность, mmap_size и cache_size уменьшают число системных вызовов.
+
+Настройки в DATABASES[...]['OPTIONS']:
+    pragmas           — словарь PRAGMA, дополняющий DEFAULT_PRAGMAS;
+    transaction_mode  — DEFERRED, IMMEDIATE (по умолчанию) или EXCLUSIVE;
+    begin_retries     — сколько раз повторить BEGIN после «database is locked».
+"""
+import logging
+import random
+import time
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.sqlite3 import base
+from django.db.utils import OperationalError
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'mmap_size': 256 * 1024 * 1024,
+    # Отрицательное значение — размер в КиБ, а не в страницах
+    'cache_size': -20000,
+    'temp_store': 'MEMORY',
+}
+TRANSACTION_MODES = ('DEFERRED', 'IMMEDIATE', 'EXCLUSIVE')
+BEGIN_RETRY_DELAY = 0.05
+
+
+def _is_busy(exc):
+    message = str(exc).lower()
+    return 'database is locked' in message or 'database is busy' in message
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_connection_params(self):
+        kwargs = super().get_connection_params()
+        # Собственные настройки не передаются в sqlite3.connect()
+        self.pragmas = {**DEFAULT_PRAGMAS, **kwargs.pop('pragmas', {})}
+        self.transaction_mode = kwargs.pop('transaction_mode', 'IMMEDIATE').upper()
+        self.begin_retries = kwargs.pop('begin_retries', 3)
+        if self.transaction_mode not in TRANSACTION_MODES:
+            raise ImproperlyConfigured(
+                f'transaction_mode должен быть одним из {", ".join(TRANSACTION_MODES)}'
+            )
+        return kwargs
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for name, value in self.pragmas.items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        statement = f'BEGIN {self.transaction_mode}'
+        for attempt in range(self.begin_retries + 1):
+            try:
+                self.cursor().execute(statement)
+                return
+            except OperationalError as exc:
+                if attempt == self.begin_retries or not _is_busy(exc):
+                    raise
+                delay = BEGIN_RETRY_DELAY * 2 ** attempt * (0.5 + random.random())
+                logger.warning('SQLite занята, повтор %s через %.2f с', statement, delay)
+                time.sleep(delay)
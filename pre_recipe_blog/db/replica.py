@@ -0,0 +1,149 @@
+"""Чтение с реплики для страниц, которые только читают.
+
+Реплика — отдельная база с псевдонимом 'replica' (для SQLite — копия файла,
+которую обновляет manage.py snapshot_replica). Если её нет в DATABASES,
+роутер всегда отвечает 'default', а middleware отключается.
+
+Представления, отмеченные @read_from_replica, выполняют GET-запросы на
+реплике. Сессия и пользователь при этом загружаются с основной базы до
+переключения: только что созданной сессии в реплике ещё может не быть.
+Любая запись идёт в основную базу и до конца запроса возвращает туда же и
+чтение. После первой записи посетитель получает в сессии отметку и до
+конца сессии читает только с основной базы, поэтому всегда видит свои
+изменения, даже если реплика отстаёт.
+
+Ответ, собранный по данным реплики, отражает базу на момент снимка, а не
+на момент запроса; replica_read_at() сообщает этот момент кэшу страниц
+(recipes.pagecache). snapshot_replica ставит время начала снимка как
+время изменения файла реплики.
+"""
+import os
+from contextvars import ContextVar
+from dataclasses import dataclass
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS, connections
+
+PRIMARY = DEFAULT_DB_ALIAS
+REPLICA = 'replica'
+STICKY_SESSION_KEY = '_db_read_primary'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+WRITE_STATEMENTS = ('INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+
+
+@dataclass
+class RoutingState:
+    use_replica: bool = False
+    wrote: bool = False
+    read_replica: bool = False
+
+    def __call__(self, execute, sql, params, many, context):
+        if not self.wrote and sql.lstrip()[:7].upper().startswith(WRITE_STATEMENTS):
+            self.wrote = True
+        return execute(sql, params, many, context)
+
+
+_state = ContextVar('db_routing_state', default=None)
+
+
+def replica_configured():
+    return REPLICA in settings.DATABASES
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if state is not None and state.use_replica and not state.wrote and replica_configured():
+            state.read_replica = True
+            return REPLICA
+        return PRIMARY
+
+    def db_for_write(self, model, **hints):
+        # Django спрашивает базу для записи и без записи (например, при
+        # присваивании связанного объекта), поэтому запись отмечает
+        # ReplicaRoutingMiddleware по фактическим запросам
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплика — копия основной базы, связи между их объектами допустимы
+        if {obj1._state.db, obj2._state.db} <= {PRIMARY, REPLICA}:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Схема попадает на реплику вместе с данными при снимке
+        if db == REPLICA:
+            return False
+        return None
+
+
+def snapshot_time():
+    """Момент, по состоянию на который реплика содержит данные (0, если неизвестно)"""
+    connection = connections[REPLICA]
+    if connection.vendor != 'sqlite':
+        return 0.0
+    try:
+        return os.path.getmtime(connection.settings_dict['NAME'])
+    except OSError:
+        return 0.0
+
+
+def replica_read_at():
+    """Момент снимка реплики, если текущий запрос читал с неё, иначе None"""
+    state = _state.get()
+    if state is None or not state.read_replica:
+        return None
+    return snapshot_time()
+
+
+def read_from_replica(view):
+    """Декоратор представления: GET-запросы читают с реплики"""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        state = _state.get()
+        if state is None or request.method not in SAFE_METHODS or request.session.get(STICKY_SESSION_KEY):
+            return view(request, *args, **kwargs)
+        # Пользователь загружается с основной базы до переключения
+        request.user.is_authenticated
+        state.use_replica = True
+        try:
+            return view(request, *args, **kwargs)
+        finally:
+            state.use_replica = False
+
+    return wrapper
+
+
+class ReplicaRoutingMiddleware:
+    """Состояние маршрутизации на время запроса и отметка о записи в сессии"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not replica_configured():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            # Асинхронные представления (поток уведомлений) читают с основной базы
+            return self.get_response(request)
+
+        state = RoutingState()
+        token = _state.set(state)
+        try:
+            with connections[PRIMARY].execute_wrapper(state):
+                response = self.get_response(request)
+        finally:
+            _state.reset(token)
+        session = getattr(request, 'session', None)
+        if (state.wrote or request.method not in SAFE_METHODS) and session is not None:
+            if not session.get(STICKY_SESSION_KEY):
+                session[STICKY_SESSION_KEY] = True
+        return response
@@ -36,9 +36,11 @@ INSTALLED_APPS = [
     # Local apps
     'recipes.apps.RecipesConfig',
     'users.apps.UsersConfig',
+    'jobs.apps.JobsConfig',
 ]
 
 MIDDLEWARE = [
+    'recipes.querybudget.QueryBudgetMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -46,6 +48,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'pre_recipe_blog.db.replica.ReplicaRoutingMiddleware',
 ]
 
 ROOT_URLCONF = 'pre_recipe_blog.urls'
@@ -61,6 +64,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'recipes.context_processors.categories_processor',
             ],
         },
     },
@@ -69,12 +73,35 @@ TEMPLATES = [
 WSGI_APPLICATION = 'pre_recipe_blog.wsgi.application'
 
 # Database
+# SQLite в режиме WAL, транзакции на запись через BEGIN IMMEDIATE с повтором
+# при занятой базе (pre_recipe_blog/db/base.py)
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'pre_recipe_blog.db',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            'transaction_mode': os.environ.get('SQLITE_TRANSACTION_MODE', 'IMMEDIATE'),
+            'begin_retries': int(os.environ.get('SQLITE_BEGIN_RETRIES', 3)),
+            'pragmas': {
+                'busy_timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT', 5000)),
+            },
+        },
     }
 }
+# Реплика для чтения (pre_recipe_blog/db/replica.py): копия базы, которую
+# обновляет manage.py snapshot_replica. Без REPLICA_DATABASE_NAME всё читается
+# с основной базы
+if os.environ.get('REPLICA_DATABASE_NAME'):
+    DATABASES['replica'] = {
+        'ENGINE': 'pre_recipe_blog.db',
+        'NAME': os.environ['REPLICA_DATABASE_NAME'],
+        'OPTIONS': {
+            'transaction_mode': 'DEFERRED',
+            'pragmas': {'journal_mode': 'DELETE', 'query_only': 1},
+        },
+        'TEST': {'MIRROR': 'default'},
+    }
+DATABASE_ROUTERS = ['pre_recipe_blog.db.replica.PrimaryReplicaRouter']
 
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
@@ -107,6 +134,9 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Индекс похожих рецептов (команда build_similarity_index)
+SIMILARITY_INDEX_DIR = BASE_DIR / 'var' / 'similarity'
+
 # Crispy Forms
 CRISPY_ALLOWED_TEMPLATE_PACKS = "bootstrap5"
 CRISPY_TEMPLATE_PACK = "bootstrap5"
@@ -117,4 +147,67 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # Login/Logout URLs
 LOGIN_URL = 'login'
 LOGIN_REDIRECT_URL = 'home'
-LOGOUT_REDIRECT_URL = 'home'
\ No newline at end of file
+LOGOUT_REDIRECT_URL = 'home'
+
+# Personal feed
+# Максимальная длина материализованной ленты пользователя
+FEED_MAX_LENGTH = int(os.environ.get('FEED_MAX_LENGTH', 500))
+# Авторы с таким числом подписчиков и больше не рассылают рецепты по лентам,
+# их рецепты подмешиваются в ленту при чтении
+FEED_CELEBRITY_FOLLOWERS = int(os.environ.get('FEED_CELEBRITY_FOLLOWERS', 10000))
+
+# Background jobs
+# При True задачи выполняются сразу после коммита в процессе запроса,
+# без очереди и обработчиков (manage.py runworker)
+JOBS_EAGER = os.environ.get('JOBS_EAGER', 'False') == 'True'
+
+# Notifications
+# Как часто поток уведомлений проверяет новые строки и шлёт heartbeat, в секундах
+NOTIFICATIONS_POLL_INTERVAL = float(os.environ.get('NOTIFICATIONS_POLL_INTERVAL', 1.0))
+NOTIFICATIONS_HEARTBEAT = int(os.environ.get('NOTIFICATIONS_HEARTBEAT', 15))
+# Однотипные уведомления (лайки рецепта, подписки) за это время сводятся в одно
+NOTIFICATION_COALESCE_HOURS = int(os.environ.get('NOTIFICATION_COALESCE_HOURS', 24))
+
+# Cache
+# По умолчанию кэш в памяти процесса; для нескольких процессов задайте общий
+# (например, CACHE_BACKEND=django.core.cache.backends.redis.RedisCache)
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', ''),
+    }
+}
+# Как долго процесс может не замечать изменений категорий и тегов, если кэш
+# не общий для процессов (recipes.refdata), в секундах
+REFERENCE_DATA_MAX_AGE = int(os.environ.get('REFERENCE_DATA_MAX_AGE', 60))
+# Сколько хранятся HTML-карточки рецептов (recipes.cards), в секундах
+RECIPE_CARD_CACHE_TIMEOUT = int(os.environ.get('RECIPE_CARD_CACHE_TIMEOUT', 24 * 60 * 60))
+# Кэш страниц для анонимных посетителей (recipes.pagecache): сколько страница
+# считается свежей и сколько ещё может отдаваться устаревшей, пока обновляется.
+# PAGE_CACHE_TIMEOUT=0 отключает кэш
+PAGE_CACHE_TIMEOUT = int(os.environ.get('PAGE_CACHE_TIMEOUT', 300))
+PAGE_CACHE_STALE = int(os.environ.get('PAGE_CACHE_STALE', 3600))
+
+# Query budgets
+# Допустимое число SQL-запросов по имени URL (recipes.querybudget). Превышение
+# пишется в лог, а при QUERY_BUDGET_ACTION=raise — роняет запрос (для тестов)
+QUERY_BUDGETS = {
+    'home': 10,
+    'recipe-detail': 18,
+    'category-posts': 8,
+    'user-recipes': 14,
+    'search-recipes': 8,
+    'feed': 10,
+    'favorites': 10,
+    'cookbook-list': 10,
+    'shopping-list': 15,
+    'notifications': 10,
+    'profile': 15,
+    'followers': 8,
+    'following': 12,
+}
+QUERY_BUDGET_ACTION = os.environ.get('QUERY_BUDGET_ACTION', 'warn')
+# Одинаковый запрос, повторённый столько раз за один ответ, считается N+1
+QUERY_N_PLUS_ONE_THRESHOLD = int(os.environ.get('QUERY_N_PLUS_ONE_THRESHOLD', 5))
+# Заголовок Server-Timing с числом и временем запросов (раскрывает детали, поэтому по умолчанию только в DEBUG)
+QUERY_TIMING_HEADER = os.environ.get('QUERY_TIMING_HEADER', str(DEBUG)) == 'True'
@@ -1,6 +1,8 @@
 from django.contrib import admin
 from .models import (Category, Tag, Recipe, Like, Favorite, Comment, 
-                     Rating, RecipeStep, Cookbook, ShoppingList, ShoppingItem)
+                     Rating, RecipeStep, Cookbook, ShoppingList, ShoppingItem,
+                     FeedEntry, RecipeNeighbors, UserRecommendations,
+                     RecipeIngredient, RecipeFanout)
 
 
 class RecipeStepInline(admin.TabularInline):
@@ -9,6 +11,17 @@ class RecipeStepInline(admin.TabularInline):
     ordering = ['step_number']
 
 
+class RecipeIngredientInline(admin.TabularInline):
+    model = RecipeIngredient
+    extra = 0
+    fields = ['position', 'raw_line', 'quantity', 'unit', 'name']
+    readonly_fields = fields
+    can_delete = False
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
     list_display = ['name', 'slug']
@@ -29,7 +42,7 @@ class RecipeAdmin(admin.ModelAdmin):
     list_filter = ['category', 'difficulty', 'is_published', 'created_at']
     search_fields = ['title', 'description', 'ingredients']
     prepopulated_fields = {'slug': ('title',)}
-    inlines = [RecipeStepInline]
+    inlines = [RecipeStepInline, RecipeIngredientInline]
     raw_id_fields = ['author']
     date_hierarchy = 'created_at'
     ordering = ['-created_at']
@@ -50,6 +63,21 @@ class RecipeAdmin(admin.ModelAdmin):
     )
 
 
+@admin.register(FeedEntry)
+class FeedEntryAdmin(admin.ModelAdmin):
+    list_display = ['user', 'recipe', 'author', 'created_at']
+    raw_id_fields = ['user', 'recipe', 'author']
+    date_hierarchy = 'created_at'
+
+
+@admin.register(RecipeFanout)
+class RecipeFanoutAdmin(admin.ModelAdmin):
+    list_display = ['recipe', 'status', 'delivered', 'total', 'progress', 'created_at', 'finished_at']
+    list_filter = ['status']
+    raw_id_fields = ['recipe']
+    readonly_fields = ['status', 'total', 'delivered', 'last_follower_id', 'error', 'finished_at']
+
+
 @admin.register(Like)
 class LikeAdmin(admin.ModelAdmin):
     list_display = ['user', 'recipe', 'created_at']
@@ -131,3 +159,15 @@ class ShoppingItemAdmin(admin.ModelAdmin):
     search_fields = ['name', 'shopping_list__name']
     raw_id_fields = ['shopping_list', 'recipe']
     date_hierarchy = 'created_at'
+
+
+@admin.register(RecipeNeighbors)
+class RecipeNeighborsAdmin(admin.ModelAdmin):
+    list_display = ['recipe', 'updated_at']
+    raw_id_fields = ['recipe']
+
+
+@admin.register(UserRecommendations)
+class UserRecommendationsAdmin(admin.ModelAdmin):
+    list_display = ['user', 'updated_at']
+    raw_id_fields = ['user']
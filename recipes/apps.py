@@ -2,4 +2,7 @@ from django.apps import AppConfig
 
 class RecipesConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
-    name = "recipes"
\ No newline at end of file
+    name = "recipes"
+
+    def ready(self):
+        import recipes.signals
\ No newline at end of file
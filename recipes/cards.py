@@ -0,0 +1,74 @@
+"""Кэш HTML-карточек рецептов в списках.
+
+Карточка кэшируется по ключу recipe-card:<вид>:<id>:<версия>. Версия — хэш
+полей, которые видны в карточке и меняются без пересохранения рецепта:
+updated_at, счётчиков, имени автора и названия категории. Поэтому явной
+инвалидации нет: изменившийся рецепт просто получает новый ключ, а старые
+записи вытесняются по таймауту. Все карточки страницы читаются одним
+cache.get_many, недостающие рендерятся и записываются одним set_many.
+
+При изменении шаблонов карточек нужно увеличить CARDS_VERSION.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from .models import Recipe
+
+CARDS_VERSION = 1
+CARD_TEMPLATES = {
+    'featured': 'recipes/cards/featured.html',
+    'recommended': 'recipes/cards/recommended.html',
+    'recent': 'recipes/cards/recent.html',
+    'category': 'recipes/cards/category.html',
+    'search': 'recipes/cards/search.html',
+    'user': 'recipes/cards/user.html',
+}
+
+
+def cache_timeout():
+    return getattr(settings, 'RECIPE_CARD_CACHE_TIMEOUT', 24 * 60 * 60)
+
+
+def card_version(recipe):
+    """Хэш всего, что отображается в карточке рецепта"""
+    parts = [
+        recipe.updated_at.isoformat(),
+        recipe.author.username,
+        recipe.category.name if recipe.category_id else '',
+        # Фрагмент текста из полнотекстового поиска зависит от запроса
+        getattr(recipe, 'search_snippet', ''),
+    ]
+    parts.extend(str(getattr(recipe, field)) for field in Recipe.COUNTER_FIELDS)
+    return hashlib.md5('\x1f'.join(parts).encode()).hexdigest()[:16]
+
+
+def card_key(variant, recipe):
+    return f'recipe-card:{CARDS_VERSION}:{variant}:{recipe.pk}:{card_version(recipe)}'
+
+
+def render_cards(recipes, variant):
+    """HTML карточек рецептов в том же порядке; один запрос к кэшу на страницу"""
+    recipes = list(recipes)
+    if not recipes:
+        return []
+    template_name = CARD_TEMPLATES[variant]
+    keys = [card_key(variant, recipe) for recipe in recipes]
+    cached = cache.get_many(keys)
+
+    cards = []
+    rendered = {}
+    for recipe, key in zip(recipes, keys):
+        html = cached.get(key)
+        if html is None:
+            html = render_to_string(template_name, {'recipe': recipe})
+            # Пока копии изображения не созданы, карточка ссылается на оригинал — такую не кэшируем
+            if not recipe.image or recipe.card_image.ready:
+                rendered[key] = html
+        cards.append(mark_safe(html))
+    if rendered:
+        cache.set_many(rendered, cache_timeout())
+    return cards
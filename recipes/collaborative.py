@@ -0,0 +1,218 @@
+"""Item-item коллаборативная фильтрация по лайкам, избранному и оценкам.
+
+Взаимодействия собираются в разреженную матрицу пользователь × рецепт,
+по ней считается косинусная близость рецептов (блоками, чтобы не держать
+в памяти полную матрицу рецепт × рецепт), а затем — персональные
+рекомендации. Результаты пишутся в RecipeNeighbors и UserRecommendations,
+по одной строке со списком id на рецепт и на пользователя. Соседи рецепта
+дополняют похожие по содержанию рецепты (recipes.similarity) на его странице,
+рекомендации пользователя показываются на главной.
+"""
+from django.db import transaction
+
+try:
+    import numpy as np
+    from scipy import sparse
+except ImportError:  # pragma: no cover - без scipy блок рекомендаций не строится
+    np = sparse = None
+
+LIKE_WEIGHT = 1.0
+FAVORITE_WEIGHT = 2.0
+# Оценки 1–2 не считаются положительным сигналом
+RATING_BASELINE = 2
+RATING_WEIGHT = 0.75
+
+TOP_N = 20
+MIN_SUPPORT = 2
+MIN_SIMILARITY = 0.01
+MAX_USER_ITEMS = 500
+BLOCK_SIZE = 5000
+WRITE_BATCH_SIZE = 1000
+
+
+def available():
+    return sparse is not None
+
+
+def _interactions(chunk_size=100000):
+    """Массивы (user_ids, recipe_ids, weights) по всем источникам"""
+    from .models import Favorite, Like, Rating
+
+    users, recipes, weights = [], [], []
+
+    def collect(queryset, weight_of):
+        for row in queryset.order_by().iterator(chunk_size=chunk_size):
+            weight = weight_of(row)
+            if weight > 0:
+                users.append(row[0])
+                recipes.append(row[1])
+                weights.append(weight)
+
+    collect(Like.objects.values_list('user_id', 'recipe_id'), lambda row: LIKE_WEIGHT)
+    collect(Favorite.objects.values_list('user_id', 'recipe_id'), lambda row: FAVORITE_WEIGHT)
+    collect(
+        Rating.objects.values_list('user_id', 'recipe_id', 'score'),
+        lambda row: (row[2] - RATING_BASELINE) * RATING_WEIGHT,
+    )
+    return (
+        np.asarray(users, dtype=np.int64),
+        np.asarray(recipes, dtype=np.int64),
+        np.asarray(weights, dtype=np.float32),
+    )
+
+
+def _prune_users(matrix, max_items):
+    """Оставить у каждого пользователя не больше max_items самых сильных взаимодействий"""
+    matrix = matrix.tocsr()
+    counts = np.diff(matrix.indptr)
+    for row in np.nonzero(counts > max_items)[0]:
+        start, end = matrix.indptr[row], matrix.indptr[row + 1]
+        data = matrix.data[start:end]
+        weakest = np.argsort(data)[:-max_items]
+        data[weakest] = 0
+    matrix.eliminate_zeros()
+    return matrix
+
+
+def _top_rows(matrix, top_n, exclude=None):
+    """Для каждой строки разреженной матрицы — (столбцы, значения) top_n наибольших"""
+    matrix = matrix.tocsr()
+    result = []
+    for row in range(matrix.shape[0]):
+        start, end = matrix.indptr[row], matrix.indptr[row + 1]
+        columns = matrix.indices[start:end]
+        values = matrix.data[start:end]
+        if exclude is not None:
+            ex_start, ex_end = exclude.indptr[row], exclude.indptr[row + 1]
+            keep = ~np.isin(columns, exclude.indices[ex_start:ex_end])
+            columns, values = columns[keep], values[keep]
+        if len(values) > top_n:
+            best = np.argpartition(-values, top_n - 1)[:top_n]
+            columns, values = columns[best], values[best]
+        order = np.argsort(-values, kind='stable')
+        result.append((columns[order], values[order]))
+    return result
+
+
+def build(top_n=TOP_N, min_support=MIN_SUPPORT, max_user_items=MAX_USER_ITEMS,
+          block_size=BLOCK_SIZE, stdout=None):
+    """Посчитать соседей рецептов и рекомендации пользователей; возвращает (рецептов, пользователей)"""
+    def log(message):
+        if stdout:
+            stdout.write(message)
+
+    user_ids, recipe_ids, weights = _interactions()
+    log(f'Взаимодействий: {len(weights)}')
+    if not len(weights):
+        _save([], [], [], [])
+        return 0, 0
+
+    users, user_index = np.unique(user_ids, return_inverse=True)
+    items, item_index = np.unique(recipe_ids, return_inverse=True)
+    # Повторяющиеся пары (лайк + избранное + оценка) суммируются
+    matrix = sparse.csr_matrix(
+        (weights, (user_index, item_index)), shape=(len(users), len(items)), dtype=np.float32
+    )
+    matrix.sum_duplicates()
+    matrix = _prune_users(matrix, max_user_items)
+
+    # Редкие рецепты не дают надёжной близости
+    support = np.diff(matrix.tocsc().indptr)
+    matrix = matrix @ sparse.diags((support >= min_support).astype(np.float32))
+    matrix.eliminate_zeros()
+
+    # Активные пользователи вносят меньший вклад в близость
+    activity = np.diff(matrix.indptr)
+    damping = 1.0 / np.log2(2 + activity).astype(np.float32)
+    weighted = sparse.diags(damping) @ matrix
+    norms = np.sqrt(np.asarray(weighted.multiply(weighted).sum(axis=0)).ravel())
+    normalized = (weighted @ sparse.diags(1.0 / np.maximum(norms, 1e-12))).tocsc()
+    log(f'Матрица: {len(users)} пользователей × {len(items)} рецептов, ненулевых: {matrix.nnz}')
+
+    neighbor_rows, neighbor_cols, neighbor_vals = [], [], []
+    item_neighbors = []
+    transposed = normalized.T.tocsr()
+    for start in range(0, len(items), block_size):
+        stop = min(start + block_size, len(items))
+        block = (transposed[start:stop] @ normalized).tocoo()
+        # Убираем близость рецепта к самому себе и слабые связи
+        keep = (block.col != block.row + start) & (block.data >= MIN_SIMILARITY)
+        block = sparse.csr_matrix(
+            (block.data[keep], (block.row[keep], block.col[keep])), shape=block.shape
+        )
+        for offset, (columns, scores) in enumerate(_top_rows(block, top_n)):
+            item_neighbors.append(columns)
+            neighbor_rows.extend([start + offset] * len(columns))
+            neighbor_cols.extend(columns.tolist())
+            neighbor_vals.extend(scores.tolist())
+        log(f'Соседи посчитаны для {stop} из {len(items)} рецептов')
+
+    # Оценка рецепта для пользователя — сумма близостей к тому, с чем он взаимодействовал
+    neighbors = sparse.csr_matrix(
+        (np.asarray(neighbor_vals, dtype=np.float32), (neighbor_rows, neighbor_cols)),
+        shape=(len(items), len(items)),
+    )
+    user_recommendations = []
+    for start in range(0, len(users), block_size):
+        stop = min(start + block_size, len(users))
+        seen = matrix[start:stop]
+        scores = (seen @ neighbors).tocsr()
+        user_recommendations.extend(columns for columns, _ in _top_rows(scores, top_n, exclude=seen))
+        log(f'Рекомендации посчитаны для {stop} из {len(users)} пользователей')
+
+    return _save(items, item_neighbors, users, user_recommendations)
+
+
+def _save(items, item_neighbors, users, user_recommendations):
+    from .models import RecipeNeighbors, UserRecommendations
+
+    recipe_rows = [
+        RecipeNeighbors(recipe_id=int(items[row]), recipe_ids=items[columns].tolist())
+        for row, columns in enumerate(item_neighbors) if len(columns)
+    ]
+    user_rows = [
+        UserRecommendations(user_id=int(users[row]), recipe_ids=items[columns].tolist())
+        for row, columns in enumerate(user_recommendations) if len(columns)
+    ]
+    with transaction.atomic():
+        RecipeNeighbors.objects.all().delete()
+        UserRecommendations.objects.all().delete()
+        RecipeNeighbors.objects.bulk_create(recipe_rows, batch_size=WRITE_BATCH_SIZE)
+        UserRecommendations.objects.bulk_create(user_rows, batch_size=WRITE_BATCH_SIZE)
+    return len(recipe_rows), len(user_rows)
+
+
+def recommended_for_user(user, limit=4):
+    """Опубликованные рецепты из персональных рекомендаций, в порядке убывания оценки"""
+    from .models import Recipe, UserRecommendations
+
+    recipe_ids = (
+        UserRecommendations.objects.filter(user=user)
+        .values_list('recipe_ids', flat=True).first()
+    )
+    if not recipe_ids:
+        return []
+    candidates = recipe_ids[:limit * 3]
+    found = (
+        Recipe.objects.filter(id__in=candidates, is_published=True)
+        .exclude(author=user).select_related('author', 'category').order_by().in_bulk()
+    )
+    return [found[pk] for pk in candidates if pk in found][:limit]
+
+
+def similar_recipe_ids(recipe_id, limit=TOP_N):
+    """id рецептов, с которыми взаимодействовали те же пользователи, по убыванию близости"""
+    from .models import RecipeNeighbors
+
+    recipe_ids = RecipeNeighbors.objects.filter(recipe_id=recipe_id).values_list('recipe_ids', flat=True).first()
+    return (recipe_ids or [])[:limit]
+
+
+def blend(*id_lists):
+    """Списки id, перемешанные по очереди без повторов: [a1, b1, a2, b2, ...]"""
+    blended = {}
+    for position in range(max(map(len, id_lists), default=0)):
+        for ids in id_lists:
+            if position < len(ids):
+                blended.setdefault(ids[position], None)
+    return list(blended)
@@ -0,0 +1,114 @@
+"""Загрузка дерева комментариев одним запросом.
+
+Страница корневых комментариев рецепта вместе с ответами читается одним
+рекурсивным CTE (WITH RECURSIVE поддерживают и SQLite, и PostgreSQL):
+сначала выбираются корни страницы, затем их потомки до глубины depth.
+Пользователь и профиль присоединяются в том же запросе, а число ответов
+каждого комментария считается подзапросом, так что шаблону больше не нужно
+обращаться к базе.
+
+Для каждого комментария сразу загружаются только последние replies ответов;
+остальные ответы и более глубокие уровни подгружаются по запросу через
+JSON (views.comment_replies). Корни и ответы листаются по id (keyset):
+новые комментарии имеют больший id.
+"""
+from django.contrib.auth.models import User
+
+from users.models import Profile
+from .models import Comment
+
+ROOTS_PER_PAGE = 20
+REPLIES_INLINE = 3
+REPLIES_PER_PAGE = 20
+INLINE_DEPTH = 1
+
+_TREE_SQL = '''
+WITH RECURSIVE base AS (
+    SELECT id FROM {comment} WHERE {where} ORDER BY id DESC LIMIT %s
+), tree(id, depth) AS (
+    SELECT id, 0 FROM base
+    UNION ALL
+    SELECT child.id, tree.depth + 1
+    FROM {comment} child JOIN tree ON child.parent_id = tree.id
+    WHERE tree.depth < %s
+), ranked AS (
+    SELECT comment.*, tree.depth,
+           ROW_NUMBER() OVER (PARTITION BY comment.parent_id ORDER BY comment.id DESC) AS position,
+           (SELECT COUNT(*) FROM {comment} reply WHERE reply.parent_id = comment.id) AS replies_total
+    FROM tree JOIN {comment} comment ON comment.id = tree.id
+)
+SELECT ranked.*, author.username AS author_username,
+       profile.id AS profile_id, profile.profile_image AS profile_image
+FROM ranked
+JOIN {user} author ON author.id = ranked.user_id
+LEFT JOIN {profile} profile ON profile.user_id = author.id
+WHERE ranked.depth = 0 OR ranked.position <= %s
+ORDER BY ranked.depth, ranked.id DESC
+'''
+
+
+def _attach_user(comment):
+    user = User(id=comment.user_id, username=comment.author_username)
+    if comment.profile_id is not None:
+        user.profile = Profile(id=comment.profile_id, user_id=user.id, profile_image=comment.profile_image)
+    comment.user = user
+
+
+def _fetch(where, params, limit, before, depth, replies):
+    if before:
+        where += ' AND id < %s'
+        params = [*params, before]
+    sql = _TREE_SQL.format(
+        comment=Comment._meta.db_table,
+        user=User._meta.db_table,
+        profile=Profile._meta.db_table,
+        where=where,
+    )
+    # Берём на один корень больше, чтобы узнать, есть ли следующая страница
+    rows = list(Comment.objects.raw(sql, [*params, limit + 1, depth, replies]))
+
+    by_id = {}
+    roots = []
+    for comment in rows:
+        comment.loaded_replies = []
+        if comment.depth == 0:
+            roots.append(comment)
+        elif comment.parent_id not in by_id:
+            # Родитель не попал в выборку (за пределами replies) — ответ подгрузят отдельно
+            continue
+        else:
+            by_id[comment.parent_id].loaded_replies.append(comment)
+        _attach_user(comment)
+        by_id[comment.pk] = comment
+
+    next_before = None
+    if len(roots) > limit:
+        roots = roots[:limit]
+        next_before = roots[-1].pk
+    for comment in by_id.values():
+        comment.more_replies = comment.replies_total - len(comment.loaded_replies)
+    return roots, next_before
+
+
+def recipe_comments(recipe, before=None, limit=ROOTS_PER_PAGE, depth=INLINE_DEPTH, replies=REPLIES_INLINE):
+    """Страница корневых комментариев рецепта с ответами; возвращает (корни, курсор следующей страницы)"""
+    return _fetch('recipe_id = %s AND parent_id IS NULL', [recipe.pk], limit, before, depth, replies)
+
+
+def comment_replies(comment, before=None, limit=REPLIES_PER_PAGE, depth=0, replies=REPLIES_INLINE):
+    """Страница ответов на комментарий; возвращает (ответы, курсор следующей страницы)"""
+    return _fetch('parent_id = %s', [comment.pk], limit, before, depth, replies)
+
+
+def serialize(comment):
+    profile = getattr(comment.user, 'profile', None) if comment.profile_id else None
+    return {
+        'id': comment.pk,
+        'user': comment.user.username,
+        'avatar': profile.avatar.src if profile and profile.profile_image else None,
+        'content': comment.content,
+        'created_at': comment.created_at.isoformat(),
+        'replies_count': comment.replies_total,
+        'more_replies': comment.more_replies,
+        'replies': [serialize(reply) for reply in comment.loaded_replies],
+    }
@@ -1,6 +1,8 @@
-from .models import Category
+from . import refdata
+
 
 def categories_processor(request):
+    # Категории для меню берутся из справочника процесса, без запроса к базе
     return {
-        'categories': Category.objects.all()
-    }
\ No newline at end of file
+        'categories': refdata.categories()
+    }
@@ -0,0 +1,72 @@
+"""Рассылка нового рецепта подписчикам автора вне обработки запроса.
+
+create_recipe только создаёт RecipeFanout и ставит задачу run_fanout
+в очередь (jobs), рассылку выполняет обработчик. Подписчики читаются пачками
+по возрастанию id (keyset), для каждой пачки одним bulk_create создаются
+уведомления и записи ленты, а в RecipeFanout сохраняется прогресс. Повторная попытка задачи (или команда
+process_fanouts) продолжает рассылку с последнего обработанного подписчика.
+"""
+from django.db import transaction
+from django.utils import timezone
+
+from users.models import Follow, Notification
+from . import feed
+from .models import RecipeFanout
+
+BATCH_SIZE = 1000
+
+
+def schedule(recipe):
+    """Создать рассылку рецепта и поставить её в очередь после коммита транзакции"""
+    from .tasks import run_fanout
+
+    fanout, created = RecipeFanout.objects.get_or_create(recipe=recipe)
+    if created:
+        run_fanout.delay(fanout.pk)
+    return fanout
+
+
+def _follower_batches(author_id, after_id, batch_size):
+    while True:
+        ids = list(
+            Follow.objects.filter(following_id=author_id, follower_id__gt=after_id)
+            .order_by('follower_id').values_list('follower_id', flat=True)[:batch_size]
+        )
+        if not ids:
+            return
+        yield ids
+        after_id = ids[-1]
+
+
+def run(fanout_id, batch_size=BATCH_SIZE):
+    """Выполнить (или продолжить) рассылку; возвращает RecipeFanout"""
+    fanout = RecipeFanout.objects.select_related('recipe__author').get(pk=fanout_id)
+    if fanout.status == 'done':
+        return fanout
+    recipe = fanout.recipe
+    fanout.status = 'running'
+    fanout.error = ''
+    if fanout.total is None:
+        fanout.total = Follow.objects.filter(following_id=recipe.author_id).count()
+    fanout.save(update_fields=['status', 'error', 'total', 'updated_at'])
+
+    to_feeds = recipe.is_published and not feed.is_celebrity(recipe.author)
+    try:
+        for follower_ids in _follower_batches(recipe.author_id, fanout.last_follower_id, batch_size):
+            with transaction.atomic():
+                Notification.create_recipe_notifications(recipe, follower_ids)
+                if to_feeds:
+                    feed.publish_to(recipe, follower_ids)
+                fanout.delivered += len(follower_ids)
+                fanout.last_follower_id = follower_ids[-1]
+                fanout.save(update_fields=['delivered', 'last_follower_id', 'updated_at'])
+    except Exception as exc:
+        fanout.status = 'failed'
+        fanout.error = repr(exc)
+        fanout.save(update_fields=['status', 'error', 'updated_at'])
+        raise
+
+    fanout.status = 'done'
+    fanout.finished_at = timezone.now()
+    fanout.save(update_fields=['status', 'finished_at', 'updated_at'])
+    return fanout
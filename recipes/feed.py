@@ -0,0 +1,124 @@
+"""Персональная лента рецептов от авторов, на которых подписан пользователь.
+
+Рецепты обычных авторов раскладываются по лентам подписчиков при публикации
+(fan-out on write, в фоне — см. recipes.fanout). Авторы с числом подписчиков
+от FEED_CELEBRITY_FOLLOWERS по лентам не рассылаются — их рецепты
+подмешиваются при чтении.
+"""
+from operator import attrgetter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q
+
+from users.models import Follow
+from .models import FeedEntry, Recipe
+
+FOLLOW_BACKFILL_SIZE = 20
+CELEBRITIES_CACHE_KEY = 'feed:celebrity-authors'
+CELEBRITIES_CACHE_TIMEOUT = 300
+
+
+def max_length():
+    return getattr(settings, 'FEED_MAX_LENGTH', 500)
+
+
+def celebrity_threshold():
+    return getattr(settings, 'FEED_CELEBRITY_FOLLOWERS', 10000)
+
+
+def is_celebrity(author):
+    threshold = celebrity_threshold()
+    return Follow.objects.filter(following=author)[:threshold].count() >= threshold
+
+
+def celebrity_author_ids():
+    """Авторы, рецепты которых читаются из ленты без рассылки (кэшируется)"""
+    ids = cache.get(CELEBRITIES_CACHE_KEY)
+    if ids is None:
+        ids = list(
+            Follow.objects.order_by().values('following')
+            .annotate(followers=Count('id'))
+            .filter(followers__gte=celebrity_threshold())
+            .values_list('following', flat=True)
+        )
+        cache.set(CELEBRITIES_CACHE_KEY, ids, CELEBRITIES_CACHE_TIMEOUT)
+    return set(ids)
+
+
+def trim_feeds(user_ids):
+    """Обрезать ленты пользователей до FEED_MAX_LENGTH последних записей"""
+    limit = max_length()
+    overflowing = (
+        FeedEntry.objects.filter(user_id__in=user_ids).order_by()
+        .values('user').annotate(entries=Count('id'))
+        .filter(entries__gt=limit).values_list('user', flat=True)
+    )
+    for user_id in overflowing:
+        boundary = (
+            FeedEntry.objects.filter(user_id=user_id)
+            .order_by('-created_at', '-id')
+            .values('created_at', 'id')[limit - 1]
+        )
+        FeedEntry.objects.filter(user_id=user_id).filter(
+            Q(created_at__lt=boundary['created_at']) |
+            Q(created_at=boundary['created_at'], id__lt=boundary['id'])
+        ).delete()
+
+
+def publish_to(recipe, user_ids):
+    """Разложить рецепт по лентам пачки подписчиков (вызывается из recipes.fanout)"""
+    FeedEntry.objects.bulk_create(
+        [
+            FeedEntry(user_id=user_id, recipe=recipe, author_id=recipe.author_id, created_at=recipe.created_at)
+            for user_id in user_ids
+        ],
+        ignore_conflicts=True,
+    )
+    trim_feeds(user_ids)
+
+
+def follow_author(user, author):
+    """Добавить в ленту последние рецепты автора после подписки"""
+    if is_celebrity(author):
+        return
+    recipes = (
+        Recipe.objects.filter(author=author, is_published=True)
+        .order_by('-created_at', '-id')[:FOLLOW_BACKFILL_SIZE]
+    )
+    FeedEntry.objects.bulk_create(
+        [
+            FeedEntry(user=user, recipe=recipe, author=author, created_at=recipe.created_at)
+            for recipe in recipes
+        ],
+        ignore_conflicts=True,
+    )
+    trim_feeds([user.pk])
+
+
+def unfollow_author(user, author):
+    FeedEntry.objects.filter(user=user, author=author).delete()
+
+
+def feed_streams(user):
+    """Выборки ленты для MergedCursorPaginator: материализованные записи и рецепты каждого популярного автора.
+
+    Каждая выборка читается по своему индексу уже в нужном порядке
+    (feed_user_created_idx и recipe_author_idx), поэтому сортировки на
+    стороне базы нет; слияние — в Python.
+    """
+    entries = (
+        FeedEntry.objects.filter(user=user, recipe__is_published=True)
+        .select_related('recipe__author', 'recipe__category')
+    )
+    streams = [(entries, attrgetter('recipe'))]
+    celebrities = celebrity_author_ids()
+    if celebrities:
+        followed = sorted(
+            Follow.objects.filter(follower=user, following_id__in=celebrities).values_list('following_id', flat=True)
+        )
+        streams.extend(
+            (Recipe.objects.filter(author_id=author_id, is_published=True).select_related('author', 'category'), None)
+            for author_id in followed
+        )
+    return streams
@@ -1,5 +1,6 @@
 from django import forms
 from .models import Recipe, Comment, Rating, RecipeStep, Cookbook, ShoppingItem
+from . import ingredients
 
 
 class RecipeForm(forms.ModelForm):
@@ -124,6 +125,8 @@ class AddRecipeToShoppingListForm(forms.Form):
         recipe = kwargs.pop('recipe', None)
         super().__init__(*args, **kwargs)
         if recipe:
-            # Парсим ингредиенты из рецепта
-            ingredient_lines = [line.strip() for line in recipe.ingredients.split('\n') if line.strip()]
-            self.fields['ingredients'].choices = [(i, line) for i, line in enumerate(ingredient_lines)]
+            # Разобранные ингредиенты рецепта (RecipeIngredient)
+            self.recipe_ingredients = ingredients.for_recipe(recipe)
+            self.fields['ingredients'].choices = [
+                (item.position, item.raw_line) for item in self.recipe_ingredients
+            ]
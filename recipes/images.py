@@ -0,0 +1,199 @@
+"""Уменьшенные копии загруженных изображений (WebP и JPEG).
+
+Для каждого размера из SIZES рядом с оригиналом сохраняются файлы
+с детерминированными именами:
+
+    recipe_images/borsch.jpg -> recipe_images/borsch.card-400.webp
+                                recipe_images/borsch.card-400.jpg
+                                recipe_images/borsch.card-800.webp ...
+
+Копии создаются фоновой задачей (recipes.tasks.generate_image_derivatives)
+после сохранения модели и командой generate_image_derivatives для уже
+загруженных файлов. Пока копий нет, шаблоны показывают оригинал.
+
+Готовность копий (is_ready) запоминается в кэше, чтобы шаблоны не
+обращались к хранилищу при каждом рендере: готовые — надолго, ещё не
+созданные — на READY_RECHECK секунд.
+"""
+import hashlib
+import os
+from dataclasses import dataclass
+from io import BytesIO
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # pragma: no cover - Pillow нужен и для ImageField
+    Image = ImageOps = None
+
+
+@dataclass(frozen=True)
+class Size:
+    widths: tuple
+    # Соотношение сторон (ширина, высота) для обрезки; None — сохранить пропорции
+    aspect: tuple | None
+    sizes: str
+
+
+SIZES = {
+    'card': Size(widths=(400, 800), aspect=(3, 2), sizes='(max-width: 768px) 100vw, 400px'),
+    'detail': Size(widths=(800, 1600), aspect=None, sizes='(max-width: 1200px) 100vw, 1200px'),
+    'avatar': Size(widths=(96, 192), aspect=(1, 1), sizes='96px'),
+}
+# Поля с изображениями и нужные им размеры
+FIELDS = {
+    'recipes.Recipe': ('image', ('card', 'detail', 'avatar')),
+    'recipes.RecipeStep': ('image', ('card',)),
+    'recipes.Cookbook': ('cover_image', ('card',)),
+    'users.Profile': ('profile_image', ('avatar',)),
+}
+READY_TIMEOUT = 24 * 60 * 60
+READY_RECHECK = 60
+FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+
+def derivative_name(name, kind, width, extension):
+    stem, _ = os.path.splitext(name)
+    return f'{stem}.{kind}-{width}.{extension}'
+
+
+def _marker_name(name, kind):
+    # Самый большой JPEG пишется последним: если он есть, готовы все копии размера
+    return derivative_name(name, kind, SIZES[kind].widths[-1], 'jpg')
+
+
+def _ready_key(name, kind):
+    digest = hashlib.md5(_marker_name(name, kind).encode()).hexdigest()
+    return f'image-ready:{digest}'
+
+
+def is_ready(name, kind, storage=None):
+    """Созданы ли копии размера kind; ответ хранилища кэшируется"""
+    key = _ready_key(name, kind)
+    ready = cache.get(key)
+    if ready is None:
+        storage = storage or default_storage
+        ready = storage.exists(_marker_name(name, kind))
+        cache.set(key, ready, READY_TIMEOUT if ready else READY_RECHECK)
+    return ready
+
+
+def _resize(image, width, aspect):
+    if aspect is None:
+        if image.width <= width:
+            return image.copy()
+        height = round(image.height * width / image.width)
+        return image.resize((width, height), Image.LANCZOS)
+    # Не увеличиваем маленькие изображения: обрезаем по пропорциям в пределах исходника
+    width = min(width, image.width, round(image.height * aspect[0] / aspect[1]))
+    height = round(width * aspect[1] / aspect[0])
+    return ImageOps.fit(image, (width, height), Image.LANCZOS)
+
+
+def _open(storage, name):
+    with storage.open(name, 'rb') as source:
+        image = Image.open(source)
+        image = ImageOps.exif_transpose(image)
+        image.load()
+    if image.mode in ('RGBA', 'LA', 'P'):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def generate(name, kinds=None, storage=None, force=False):
+    """Создать копии изображения name; возвращает количество записанных файлов"""
+    storage = storage or default_storage
+    kinds = kinds or list(SIZES)
+    if not name or not storage.exists(name):
+        return 0
+    pending = [kind for kind in kinds if force or not storage.exists(_marker_name(name, kind))]
+    if not pending:
+        return 0
+
+    image = _open(storage, name)
+    written = 0
+    for kind in pending:
+        size = SIZES[kind]
+        for width in size.widths:
+            resized = _resize(image, width, size.aspect)
+            for extension, (image_format, options) in FORMATS.items():
+                target = derivative_name(name, kind, width, extension)
+                buffer = BytesIO()
+                resized.save(buffer, image_format, **options)
+                if storage.exists(target):
+                    storage.delete(target)
+                storage.save(target, ContentFile(buffer.getvalue()))
+                written += 1
+        cache.set(_ready_key(name, kind), True, READY_TIMEOUT)
+    return written
+
+
+def needs_generation(name, kinds, storage=None):
+    storage = storage or default_storage
+    if not name or not storage.exists(name):
+        return False
+    return any(not storage.exists(_marker_name(name, kind)) for kind in kinds)
+
+
+def schedule(instance):
+    """Поставить создание копий изображения модели в очередь, если их ещё нет"""
+    from .tasks import generate_image_derivatives
+
+    field, kinds = FIELDS[instance._meta.label]
+    field_file = getattr(instance, field)
+    if field_file and needs_generation(field_file.name, kinds, field_file.storage):
+        generate_image_derivatives.delay(field_file.name, list(kinds))
+
+
+class Variants:
+    """Копии изображения одного размера для шаблонов: src, srcset, sizes"""
+
+    def __init__(self, field_file, kind):
+        self.field_file = field_file
+        self.kind = kind
+        self.size = SIZES[kind]
+
+    def __bool__(self):
+        return bool(self.field_file)
+
+    @property
+    def ready(self):
+        if not self.field_file:
+            return False
+        if not hasattr(self, '_ready'):
+            self._ready = is_ready(self.field_file.name, self.kind, self.field_file.storage)
+        return self._ready
+
+    def url(self, width, extension='jpg'):
+        return self.field_file.storage.url(derivative_name(self.field_file.name, self.kind, width, extension))
+
+    def srcset(self, extension='jpg'):
+        return ', '.join(f'{self.url(width, extension)} {width}w' for width in self.size.widths)
+
+    @property
+    def src(self):
+        """URL для атрибута src: наименьшая копия JPEG или оригинал, пока копий нет"""
+        if not self.ready:
+            return self.field_file.url
+        return self.url(self.size.widths[0])
+
+    @property
+    def webp_srcset(self):
+        return self.srcset('webp')
+
+    @property
+    def jpeg_srcset(self):
+        return self.srcset('jpg')
+
+    @property
+    def sizes(self):
+        return self.size.sizes
@@ -0,0 +1,191 @@
+"""Разбор текстового списка ингредиентов в структурированные строки.
+
+parse_line("200 г муки") -> ParsedIngredient(quantity=Decimal('200'), unit='g', name='муки', raw='200 г муки')
+"""
+import re
+from dataclasses import dataclass
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+
+# Каноническая единица -> варианты написания
+UNIT_ALIASES = {
+    'g': ('г', 'гр', 'грамм', 'грамма', 'граммов', 'g', 'gr', 'gram', 'grams'),
+    'kg': ('кг', 'килограмм', 'килограмма', 'kg', 'kilogram', 'kilograms'),
+    'mg': ('мг', 'mg'),
+    'ml': ('мл', 'миллилитр', 'миллилитров', 'ml', 'milliliter', 'milliliters', 'millilitre'),
+    'l': ('л', 'литр', 'литра', 'литров', 'l', 'liter', 'liters', 'litre', 'litres'),
+    'tsp': ('ч. л.', 'ч.л.', 'ч л', 'чл', 'чайная ложка', 'чайные ложки', 'чайных ложек',
+            'tsp', 'teaspoon', 'teaspoons'),
+    'tbsp': ('ст. л.', 'ст.л.', 'ст л', 'стл', 'столовая ложка', 'столовые ложки', 'столовых ложек',
+             'tbsp', 'tablespoon', 'tablespoons'),
+    'cup': ('стакан', 'стакана', 'стаканов', 'cup', 'cups'),
+    'pcs': ('шт', 'штука', 'штуки', 'штук', 'pcs', 'pc', 'piece', 'pieces'),
+    'pinch': ('щепотка', 'щепотки', 'щепоток', 'pinch', 'pinches'),
+    'clove': ('зубчик', 'зубчика', 'зубчиков', 'clove', 'cloves'),
+}
+UNIT_LABELS = {
+    'g': 'г', 'kg': 'кг', 'mg': 'мг', 'ml': 'мл', 'l': 'л', 'tsp': 'ч. л.', 'tbsp': 'ст. л.',
+    'cup': 'стакан', 'pcs': 'шт.', 'pinch': 'щепотка', 'clove': 'зубчик',
+}
+
+# Единица -> (базовая единица группы, множитель перевода в неё)
+UNIT_CONVERSIONS = {
+    'mg': ('g', Decimal('0.001')),
+    'g': ('g', Decimal('1')),
+    'kg': ('g', Decimal('1000')),
+    'ml': ('ml', Decimal('1')),
+    'l': ('ml', Decimal('1000')),
+    'tsp': ('tsp', Decimal('1')),
+    'tbsp': ('tsp', Decimal('3')),
+}
+
+_ALIAS_TO_UNIT = {alias: unit for unit, aliases in UNIT_ALIASES.items() for alias in aliases}
+_UNIT_PATTERN = '|'.join(
+    re.escape(alias).replace(r'\ ', r'\s*')
+    for alias in sorted(_ALIAS_TO_UNIT, key=len, reverse=True)
+)
+_FRACTIONS = {'½': '1/2', '¼': '1/4', '¾': '3/4', '⅓': '1/3', '⅔': '2/3'}
+_QUANTITY = r'\d+\s+\d+/\d+|\d+(?:[.,]\d+)?(?:\s*/\s*\d+)?'
+_RANGE = rf'(?:{_QUANTITY})(?:\s*[-–]\s*(?:{_QUANTITY}))?'
+
+_LEADING = re.compile(
+    rf'^(?P<quantity>{_RANGE})\s*(?:(?P<unit>{_UNIT_PATTERN})(?=[\s.,)]|$)\.?)?\s*(?P<name>.*)$',
+    re.IGNORECASE,
+)
+_TRAILING = re.compile(
+    rf'^(?P<name>.+?)\s*(?:[—–:-]\s*|\s)(?P<quantity>{_RANGE})\s*'
+    rf'(?:(?P<unit>{_UNIT_PATTERN})(?=[\s.,)]|$)\.?)?\s*$',
+    re.IGNORECASE,
+)
+_NOISE = re.compile(r'\b(?:по вкусу|to taste|optional|по желанию)\b', re.IGNORECASE)
+_BULLET = re.compile(r'^\s*(?:[-–—•*·]|\d+[.)](?=\s))\s*')
+
+
+@dataclass
+class ParsedIngredient:
+    quantity: Decimal | None
+    unit: str
+    name: str
+    raw: str
+
+
+def _parse_quantity(text):
+    text = text.replace(',', '.')
+    text = re.split(r'\s*[-–]\s*(?=\d)', text)[0].strip()
+    try:
+        if ' ' in text and '/' in text:
+            whole, fraction = text.split(None, 1)
+            return Decimal(whole) + _parse_quantity(fraction)
+        if '/' in text:
+            numerator, denominator = (part.strip() for part in text.split('/', 1))
+            return (Decimal(numerator) / Decimal(denominator)).quantize(Decimal('0.001'))
+        return Decimal(text)
+    except (InvalidOperation, ZeroDivisionError):
+        return None
+
+
+def normalize_name(name):
+    """Нормализованное название: нижний регистр, без пунктуации и пометок «по вкусу»"""
+    name = _NOISE.sub(' ', name.lower().replace('ё', 'е'))
+    name = re.sub(r'[^\w\s-]', ' ', name)
+    return re.sub(r'\s+', ' ', name).strip(' -')
+
+
+def parse_line(line):
+    raw = line.strip()
+    text = _BULLET.sub('', raw)
+    for symbol, fraction in _FRACTIONS.items():
+        text = text.replace(symbol, f' {fraction}')
+    text = text.strip()
+
+    for pattern in (_LEADING, _TRAILING):
+        match = pattern.match(text)
+        if match and match.group('name').strip():
+            unit = match.group('unit')
+            return ParsedIngredient(
+                quantity=_parse_quantity(match.group('quantity')),
+                unit=_ALIAS_TO_UNIT.get(re.sub(r'\s+', ' ', unit.lower()), '') if unit else '',
+                name=normalize_name(match.group('name'))[:200],
+                raw=raw,
+            )
+    return ParsedIngredient(quantity=None, unit='', name=normalize_name(text)[:200], raw=raw)
+
+
+def parse_quantity(text):
+    """Разобрать строку количества («1,5 кг», «2 ст. л.») в (количество, единица).
+
+    Возвращает None, если в строке есть что-то кроме числа и известной единицы.
+    """
+    text = text.strip()
+    for symbol, fraction in _FRACTIONS.items():
+        text = text.replace(symbol, f' {fraction}')
+    match = _LEADING.match(text.strip())
+    if not match or match.group('name').strip():
+        return None
+    unit = match.group('unit')
+    return (
+        _parse_quantity(match.group('quantity')),
+        _ALIAS_TO_UNIT.get(re.sub(r'\s+', ' ', unit.lower()), '') if unit else '',
+    )
+
+
+def to_base(quantity, unit):
+    """Перевести количество в базовую единицу группы; несовместимые единицы не меняются"""
+    base_unit, factor = UNIT_CONVERSIONS.get(unit, (unit, Decimal('1')))
+    if quantity is None:
+        return None, base_unit
+    return quantity * factor, base_unit
+
+
+def parse_text(text):
+    """Разобрать многострочный список ингредиентов, пропуская пустые строки"""
+    return [parse_line(line) for line in text.splitlines() if line.strip()]
+
+
+def format_quantity(quantity, unit):
+    if quantity is None:
+        return UNIT_LABELS.get(unit, unit)
+    value = f'{quantity.normalize():f}'
+    label = UNIT_LABELS.get(unit, unit)
+    return f'{value} {label}'.strip()
+
+
+def build_rows(recipe, parsed):
+    from .models import RecipeIngredient
+
+    return [
+        RecipeIngredient(
+            recipe=recipe,
+            position=position,
+            raw_line=item.raw[:500],
+            quantity=item.quantity,
+            unit=item.unit,
+            name=item.name,
+        )
+        for position, item in enumerate(parsed)
+    ]
+
+
+def sync_recipe(recipe):
+    """Перезаписать структурированные ингредиенты рецепта, если текст изменился"""
+    from .models import RecipeIngredient
+
+    lines = [line.strip()[:500] for line in recipe.ingredients.splitlines() if line.strip()]
+    existing = list(
+        RecipeIngredient.objects.filter(recipe=recipe).order_by('position').values_list('raw_line', flat=True)
+    )
+    if existing == lines:
+        return False
+    with transaction.atomic():
+        RecipeIngredient.objects.filter(recipe=recipe).delete()
+        RecipeIngredient.objects.bulk_create(build_rows(recipe, parse_text(recipe.ingredients)))
+    return True
+
+
+def for_recipe(recipe):
+    """Структурированные ингредиенты; для ещё не разобранных рецептов — разбор на лету"""
+    items = list(recipe.ingredient_items.all())
+    if items or not recipe.ingredients.strip():
+        return items
+    return build_rows(recipe, parse_text(recipe.ingredients))
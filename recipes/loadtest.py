@@ -0,0 +1,362 @@
+"""Нагрузочное тестирование горячих страниц по HTTP.
+
+Несколько потоков-воркеров в течение заданного времени отправляют запросы
+к запущенному серверу, выбирая сценарий по весам из смеси (MIX). Каждый
+воркер держит своё keep-alive соединение и свою сессию, поэтому сценарии
+для вошедших пользователей (лайк, счётчик уведомлений) работают так же,
+как у посетителей.
+
+Задержки пишутся в гистограммы в духе HDR Histogram: значения в
+микросекундах раскладываются по логарифмическим корзинам с линейным
+делением внутри каждой, так что относительная погрешность перцентилей не
+больше 1/2**(SUB_BUCKET_BITS - 1) при любой величине задержки, а размер
+гистограммы не зависит от числа запросов. Гистограммы сериализуются в JSON
+и складываются, поэтому результат прогона можно сохранить как базовый и
+сравнивать с ним следующие прогоны (compare).
+"""
+import http.client
+import json
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+from http.cookies import SimpleCookie
+from urllib.parse import urlencode, urlsplit
+
+from django.urls import reverse
+
+SUB_BUCKET_BITS = 8
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+HALF_BUCKETS = SUB_BUCKETS // 2
+
+PERCENTILES = (50, 90, 95, 99, 99.9)
+
+# Сценарий: имя → (метод, нужен ли вход, функция, строящая путь по данным прогона)
+SCENARIOS = {
+    'home': ('GET', False, lambda data, rng: reverse('home')),
+    'recipe_detail': ('GET', False, lambda data, rng: reverse('recipe-detail', args=[rng.choice(data['slugs'])])),
+    'search_recipes': ('GET', False, lambda data, rng: (
+        reverse('search-recipes') + '?' + urlencode({'q': rng.choice(data['queries'])})
+    )),
+    'like_recipe': ('POST', True, lambda data, rng: reverse('like-recipe', args=[rng.choice(data['slugs'])])),
+    'notifications_count': ('GET', True, lambda data, rng: reverse('notifications-count')),
+}
+
+DEFAULT_MIX = {
+    'home': 30,
+    'recipe_detail': 35,
+    'search_recipes': 15,
+    'like_recipe': 5,
+    'notifications_count': 15,
+}
+
+
+class LoadTestError(Exception):
+    pass
+
+
+def parse_mix(value):
+    """'home=30,recipe_detail=50' → {'home': 30, 'recipe_detail': 50}"""
+    mix = {}
+    for part in filter(None, (item.strip() for item in value.split(','))):
+        name, _, weight = part.partition('=')
+        if name not in SCENARIOS:
+            raise LoadTestError(f'Неизвестный сценарий: {name}. Доступны: {", ".join(SCENARIOS)}')
+        try:
+            mix[name] = float(weight)
+        except ValueError:
+            raise LoadTestError(f'Некорректный вес сценария {name}: {weight!r}')
+    if not mix or sum(mix.values()) <= 0:
+        raise LoadTestError('Смесь сценариев пуста')
+    return mix
+
+
+def _bucket_index(value):
+    if value < SUB_BUCKETS:
+        return value
+    shift = value.bit_length() - SUB_BUCKET_BITS
+    return SUB_BUCKETS + (shift - 1) * HALF_BUCKETS + (value >> shift) - HALF_BUCKETS
+
+
+def _bucket_high(index):
+    """Наибольшее значение, попадающее в корзину"""
+    if index < SUB_BUCKETS:
+        return index
+    shift, offset = divmod(index - SUB_BUCKETS, HALF_BUCKETS)
+    shift += 1
+    return ((offset + HALF_BUCKETS + 1) << shift) - 1
+
+
+@dataclass
+class Histogram:
+    """Гистограмма задержек в микросекундах"""
+    counts: dict = field(default_factory=dict)
+    total: int = 0
+    min: int = 0
+    max: int = 0
+    sum: int = 0
+
+    def record(self, seconds):
+        value = max(0, int(seconds * 1_000_000))
+        index = _bucket_index(value)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.min = value if not self.total else min(self.min, value)
+        self.max = max(self.max, value)
+        self.total += 1
+        self.sum += value
+
+    def merge(self, other):
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        if other.total:
+            self.min = other.min if not self.total else min(self.min, other.min)
+            self.max = max(self.max, other.max)
+        self.total += other.total
+        self.sum += other.sum
+
+    def percentile(self, percent):
+        """Задержка (мс), которую не превышают percent процентов запросов"""
+        if not self.total:
+            return 0.0
+        rank = max(1, round(self.total * percent / 100))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                return min(_bucket_high(index), self.max) / 1000
+        return self.max / 1000
+
+    @property
+    def mean(self):
+        return self.sum / self.total / 1000 if self.total else 0.0
+
+    def to_dict(self):
+        return {
+            'sub_bucket_bits': SUB_BUCKET_BITS,
+            'counts': {str(index): count for index, count in sorted(self.counts.items())},
+            'total': self.total, 'min': self.min, 'max': self.max, 'sum': self.sum,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        if data.get('sub_bucket_bits', SUB_BUCKET_BITS) != SUB_BUCKET_BITS:
+            raise LoadTestError('Гистограмма записана с другой точностью')
+        return cls(
+            counts={int(index): count for index, count in data['counts'].items()},
+            total=data['total'], min=data['min'], max=data['max'], sum=data['sum'],
+        )
+
+
+@dataclass
+class ScenarioStats:
+    histogram: Histogram = field(default_factory=Histogram)
+    errors: int = 0
+    statuses: dict = field(default_factory=dict)
+
+    def merge(self, other):
+        self.histogram.merge(other.histogram)
+        self.errors += other.errors
+        for status, count in other.statuses.items():
+            self.statuses[status] = self.statuses.get(status, 0) + count
+
+
+class Client:
+    """HTTP-клиент одного воркера: keep-alive соединение, cookies и CSRF-токен"""
+
+    def __init__(self, base_url, timeout):
+        parts = urlsplit(base_url)
+        connection_class = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+        self.host = parts.netloc
+        self.origin = f'{parts.scheme}://{parts.netloc}'
+        self.prefix = parts.path.rstrip('/')
+        self._connect = lambda: connection_class(parts.hostname, parts.port, timeout=timeout)
+        self.connection = self._connect()
+        self.cookies = {}
+
+    def request(self, method, path, body=None, headers=None):
+        headers = {'Host': self.host, 'Connection': 'keep-alive', **(headers or {})}
+        if self.cookies:
+            headers['Cookie'] = '; '.join(f'{name}={value}' for name, value in self.cookies.items())
+        if method == 'POST':
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+            headers['Referer'] = f'{self.origin}{self.prefix}{path}'
+            if 'csrftoken' in self.cookies:
+                headers['X-CSRFToken'] = self.cookies['csrftoken']
+        try:
+            self.connection.request(method, self.prefix + path, body=body, headers=headers)
+            response = self.connection.getresponse()
+            response.read()
+        except (http.client.HTTPException, OSError):
+            # Сервер закрыл соединение: следующий запрос откроет новое
+            self.connection.close()
+            self.connection = self._connect()
+            raise
+        for header in response.headers.get_all('Set-Cookie') or ():
+            for name, morsel in SimpleCookie(header).items():
+                self.cookies[name] = morsel.value
+        return response.status
+
+    def login(self, username, password):
+        self.request('GET', reverse('login'))
+        status = self.request('POST', reverse('login'), urlencode({
+            'username': username,
+            'password': password,
+            'csrfmiddlewaretoken': self.cookies.get('csrftoken', ''),
+        }))
+        if status != 302 or 'sessionid' not in self.cookies:
+            raise LoadTestError(f'Не удалось войти как {username} (HTTP {status})')
+
+    def close(self):
+        self.connection.close()
+
+
+@dataclass
+class Result:
+    started_at: float
+    duration: float
+    concurrency: int
+    mix: dict
+    scenarios: dict
+
+    def to_dict(self):
+        return {
+            'started_at': self.started_at,
+            'duration': round(self.duration, 3),
+            'concurrency': self.concurrency,
+            'mix': self.mix,
+            'scenarios': {name: summarize(stats, self.duration) for name, stats in self.scenarios.items()},
+        }
+
+
+def summarize(stats, duration):
+    histogram = stats.histogram
+    return {
+        'requests': histogram.total,
+        'errors': stats.errors,
+        'error_rate': round(stats.errors / histogram.total, 4) if histogram.total else 0.0,
+        'throughput': round(histogram.total / duration, 2) if duration else 0.0,
+        'mean_ms': round(histogram.mean, 2),
+        'max_ms': round(histogram.max / 1000, 2),
+        **{f'p{percent:g}_ms': round(histogram.percentile(percent), 2) for percent in PERCENTILES},
+        'statuses': {str(status): count for status, count in sorted(stats.statuses.items())},
+        'histogram': histogram.to_dict(),
+    }
+
+
+def run(base_url, data, mix, concurrency, duration, warmup=0.0, credentials=(), seed=None, timeout=30.0):
+    """Прогнать смесь сценариев; data — {'slugs': [...], 'queries': [...]}"""
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    needs_login = any(SCENARIOS[name][1] for name in names)
+    if needs_login and not credentials:
+        raise LoadTestError('Для сценариев с входом нужны учётные записи')
+    if any(not data.get(key) for key in ('slugs', 'queries')):
+        raise LoadTestError('Нет рецептов для запросов: заполните базу (seed_scale)')
+
+    results = [dict() for _ in range(concurrency)]
+    failures = []
+    timing = {}
+
+    def start_clock():
+        # Выполняется один раз, когда все воркеры вошли: вход не попадает в замер
+        now = time.monotonic()
+        timing.update(started_at=time.time(), measure_from=now + warmup, end=now + warmup + duration)
+
+    start_barrier = threading.Barrier(concurrency, action=start_clock)
+
+    def worker(number):
+        rng = random.Random(None if seed is None else seed + number)
+        client = Client(base_url, timeout)
+        stats = results[number]
+        try:
+            if needs_login:
+                client.login(*credentials[number % len(credentials)])
+        except Exception as exc:
+            failures.append(exc)
+        start_barrier.wait()
+        if failures:
+            client.close()
+            return
+        try:
+            while time.monotonic() < timing['end']:
+                name = rng.choices(names, weights)[0]
+                method, _, build_path = SCENARIOS[name]
+                path = build_path(data, rng)
+                headers = {'X-Requested-With': 'XMLHttpRequest'} if method == 'POST' else None
+                started = time.perf_counter()
+                try:
+                    status = client.request(method, path, body='' if method == 'POST' else None, headers=headers)
+                except (http.client.HTTPException, OSError):
+                    status = 0
+                elapsed = time.perf_counter() - started
+                if time.monotonic() < timing['measure_from']:
+                    continue
+                scenario = stats.setdefault(name, ScenarioStats())
+                scenario.histogram.record(elapsed)
+                scenario.statuses[status] = scenario.statuses.get(status, 0) + 1
+                if not 200 <= status < 400:
+                    scenario.errors += 1
+        finally:
+            client.close()
+
+    threads = [threading.Thread(target=worker, args=(number,), daemon=True) for number in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if failures:
+        raise LoadTestError(str(failures[0]))
+
+    scenarios = {name: ScenarioStats() for name in names}
+    for stats in results:
+        for name, scenario in stats.items():
+            scenarios[name].merge(scenario)
+    return Result(started_at=timing['started_at'], duration=duration, concurrency=concurrency, mix=mix, scenarios=scenarios)
+
+
+@dataclass
+class Regression:
+    scenario: str
+    metric: str
+    baseline: float
+    current: float
+
+    def __str__(self):
+        return f'{self.scenario}.{self.metric}: {self.baseline:g} → {self.current:g}'
+
+
+def compare(current, baseline, metrics=('p95_ms', 'p99_ms'), tolerance=0.2, min_delta_ms=1.0,
+            max_error_rate=0.01):
+    """Ухудшения текущего результата относительно базового (оба — словари Result.to_dict()).
+
+    Задержка считается ухудшением, если выросла больше чем на tolerance и при
+    этом больше чем на min_delta_ms (шум на субмиллисекундных страницах);
+    пропускная способность — если упала больше чем на tolerance.
+    """
+    regressions = []
+    for name, scenario in current['scenarios'].items():
+        base = baseline['scenarios'].get(name)
+        if base is None or not base['requests']:
+            continue
+        for metric in metrics:
+            before, after = base[metric], scenario[metric]
+            if after > before * (1 + tolerance) and after - before > min_delta_ms:
+                regressions.append(Regression(name, metric, before, after))
+        if scenario['throughput'] < base['throughput'] * (1 - tolerance):
+            regressions.append(Regression(name, 'throughput', base['throughput'], scenario['throughput']))
+        if scenario['error_rate'] > max(base['error_rate'], max_error_rate):
+            regressions.append(Regression(name, 'error_rate', base['error_rate'], scenario['error_rate']))
+    return regressions
+
+
+def load(path):
+    try:
+        with open(path, encoding='utf-8') as file:
+            return json.load(file)
+    except (OSError, ValueError) as exc:
+        raise LoadTestError(f'Не удалось прочитать {path}: {exc}')
+
+
+def save(result, path):
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(result, file, ensure_ascii=False, indent=2)
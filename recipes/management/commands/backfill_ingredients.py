@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+
+from recipes.ingredients import build_rows, parse_text
+from recipes.models import Recipe, RecipeIngredient
+
+
+class Command(BaseCommand):
+    help = ('Разбирает текстовые ингредиенты существующих рецептов в RecipeIngredient. '
+            'Рецепты, у которых уже есть разобранные ингредиенты, пропускаются, '
+            'поэтому прерванный запуск можно просто повторить')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500,
+                            help='Количество рецептов, обрабатываемых за одну транзакцию')
+        parser.add_argument('--start-after', type=int, default=0,
+                            help='Начать с рецептов, id которых больше указанного')
+        parser.add_argument('--force', action='store_true',
+                            help='Разобрать заново и рецепты, у которых ингредиенты уже есть')
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        force = options['force']
+        last_pk = options['start_after']
+        processed = created = 0
+
+        recipes = Recipe.objects.order_by('pk').only('pk', 'ingredients')
+        if not force:
+            recipes = recipes.exclude(Exists(RecipeIngredient.objects.filter(recipe=OuterRef('pk'))))
+
+        while True:
+            chunk = list(recipes.filter(pk__gt=last_pk)[:chunk_size])
+            if not chunk:
+                break
+            rows = []
+            for recipe in chunk:
+                rows.extend(build_rows(recipe, parse_text(recipe.ingredients)))
+            with transaction.atomic():
+                if force:
+                    RecipeIngredient.objects.filter(recipe__in=chunk).delete()
+                RecipeIngredient.objects.bulk_create(rows, batch_size=1000)
+
+            processed += len(chunk)
+            created += len(rows)
+            last_pk = chunk[-1].pk
+            self.stdout.write(f'Обработано рецептов: {processed} (последний id: {last_pk}), строк: {created}')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово. Рецептов: {processed}, ингредиентов: {created}'
+        ))
@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes import collaborative
+
+
+class Command(BaseCommand):
+    help = 'Строит рекомендации «Вам может понравиться» по лайкам, избранному и оценкам (item-item CF)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top-n', type=int, default=collaborative.TOP_N,
+                            help='Длина списков похожих рецептов и рекомендаций')
+        parser.add_argument('--min-support', type=int, default=collaborative.MIN_SUPPORT,
+                            help='Минимальное число пользователей, взаимодействовавших с рецептом')
+        parser.add_argument('--max-user-items', type=int, default=collaborative.MAX_USER_ITEMS,
+                            help='Сколько самых сильных взаимодействий учитывать у одного пользователя')
+        parser.add_argument('--block-size', type=int, default=collaborative.BLOCK_SIZE,
+                            help='Количество строк матрицы, обрабатываемых за раз')
+
+    def handle(self, *args, **options):
+        if not collaborative.available():
+            raise CommandError('Для построения рекомендаций нужны пакеты numpy и scipy')
+        started = time.monotonic()
+        recipes, users = collaborative.build(
+            top_n=options['top_n'],
+            min_support=options['min_support'],
+            max_user_items=options['max_user_items'],
+            block_size=options['block_size'],
+            stdout=self.stdout,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово за {time.monotonic() - started:.1f} с. '
+            f'Рецептов с соседями: {recipes}, пользователей с рекомендациями: {users}'
+        ))
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes import similarity
+
+
+class Command(BaseCommand):
+    help = 'Строит индекс похожих рецептов (TF-IDF + косинусная близость) для блока рекомендаций'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dim', type=int, default=similarity.DIM,
+                            help='Размерность хешированного пространства признаков')
+        parser.add_argument('--top-k', type=int, default=similarity.TOP_K,
+                            help='Количество похожих рецептов, сохраняемых для каждого рецепта')
+        parser.add_argument('--block-size', type=int, default=similarity.BLOCK_SIZE,
+                            help='Количество строк матрицы близости, считаемых за раз')
+
+    def handle(self, *args, **options):
+        if not similarity.available():
+            raise CommandError('Для построения индекса нужен пакет numpy')
+        count = similarity.build(
+            dim=options['dim'],
+            top_k=options['top_k'],
+            block_size=options['block_size'],
+            stdout=self.stdout,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово. Рецептов в индексе: {count}, каталог: {similarity.index_dir()}'
+        ))
@@ -0,0 +1,71 @@
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.test import Client
+
+from recipes import queryplans
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = ('Проверяет планы запросов горячих страниц (EXPLAIN QUERY PLAN): полные просмотры '
+            'таблиц и сортировки во временном B-дереве. Запускать на заполненной базе, '
+            'например после seed_scale; изменения, сделанные страницами, откатываются')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verbose-plans', action='store_true',
+                            help='Печатать планы всех запросов, а не только проблемных')
+
+    def handle(self, *args, **options):
+        if connections[DEFAULT_DB_ALIAS].vendor != 'sqlite':
+            raise CommandError('Проверка планов поддерживается только для SQLite')
+
+        failed = 0
+        try:
+            with transaction.atomic():
+                client = self.client()
+                paths = queryplans.hot_paths()
+                if not paths:
+                    raise CommandError('В базе нет опубликованных рецептов: заполните её командой seed_scale')
+                for path in paths:
+                    failed += self.check_page(client, path, options['verbose_plans'])
+                raise _Rollback
+        except _Rollback:
+            pass
+
+        if failed:
+            raise CommandError(f'Проблемных запросов: {failed}')
+        self.stdout.write(self.style.SUCCESS('Планы запросов горячих страниц в порядке'))
+
+    def client(self):
+        user = (
+            User.objects.filter(is_active=True, notifications__isnull=False)
+            .order_by('pk').first()
+            or User.objects.filter(is_active=True).order_by('pk').first()
+        )
+        if user is None:
+            raise CommandError('В базе нет пользователей: заполните её командой seed_scale')
+        host = next((host for host in settings.ALLOWED_HOSTS if host and '*' not in host and not host.startswith('.')),
+                    'localhost')
+        client = Client(HTTP_HOST=host)
+        client.force_login(user)
+        return client
+
+    def check_page(self, client, path, verbose):
+        response, planned = queryplans.check(client, path)
+        if response.status_code != 200:
+            raise CommandError(f'{path}: ответ {response.status_code}')
+        problems = [query for query in planned if query.problems]
+        style = self.style.ERROR if problems else self.style.SUCCESS
+        self.stdout.write(style(f'{path}: запросов {len(planned)}, проблемных {len(problems)}'))
+        for query in planned if verbose else problems:
+            self.stdout.write(f'  [{query.alias}] {query.sql}')
+            for problem in query.problems:
+                self.stdout.write(self.style.WARNING(f'    ! {problem}'))
+            for node_id, parent, detail in query.plan:
+                self.stdout.write(f'    {detail}')
+        return len(problems)
@@ -0,0 +1,41 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand
+
+from recipes import images
+from recipes.tasks import generate_image_derivatives
+
+
+class Command(BaseCommand):
+    help = ('Создаёт уменьшенные копии (WebP и JPEG) уже загруженных изображений рецептов, '
+            'шагов, обложек и фото профилей. Изображения, у которых копии уже есть, пропускаются')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true',
+                            help='Пересоздать копии, даже если они уже есть')
+        parser.add_argument('--queue', action='store_true',
+                            help='Поставить задачи в очередь вместо создания копий в этом процессе')
+
+    def handle(self, *args, **options):
+        force = options['force']
+        seen = set()
+        total = written = 0
+
+        for label, (field, kinds) in images.FIELDS.items():
+            model = apps.get_model(label)
+            names = (
+                model.objects.exclude(**{field: ''}).exclude(**{f'{field}__isnull': True})
+                .order_by().values_list(field, flat=True).distinct().iterator()
+            )
+            for name in names:
+                if (name, kinds) in seen:
+                    continue
+                seen.add((name, kinds))
+                total += 1
+                if options['queue']:
+                    if force or images.needs_generation(name, kinds):
+                        generate_image_derivatives.delay(name, list(kinds), force=force)
+                else:
+                    written += images.generate(name, kinds, force=force)
+            self.stdout.write(f'{label}: обработано изображений {total}')
+
+        self.stdout.write(self.style.SUCCESS(f'Готово. Изображений: {total}, записано файлов: {written}'))
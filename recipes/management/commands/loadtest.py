@@ -0,0 +1,104 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes import loadtest
+from recipes.models import Recipe, RecipeIngredient
+
+
+class Command(BaseCommand):
+    help = ('Нагрузочный прогон по запущенному серверу: взвешенная смесь запросов к горячим страницам, '
+            'перцентили задержек и пропускная способность по сценариям, сравнение с базовым прогоном')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default='http://127.0.0.1:8000', help='Адрес запущенного сервера')
+        parser.add_argument('--duration', type=float, default=30, help='Длительность замера в секундах')
+        parser.add_argument('--warmup', type=float, default=5,
+                            help='Сколько секунд в начале прогона не учитывать')
+        parser.add_argument('--concurrency', type=int, default=8, help='Количество параллельных воркеров')
+        parser.add_argument('--mix', default=','.join(f'{name}={weight}' for name, weight in loadtest.DEFAULT_MIX.items()),
+                            help=f'Веса сценариев, например home=30,recipe_detail=70. '
+                                 f'Сценарии: {", ".join(loadtest.SCENARIOS)}')
+        parser.add_argument('--username', action='append', default=[],
+                            help='Пользователь для сценариев с входом (можно указать несколько раз). '
+                                 'По умолчанию берутся первые активные пользователи из базы')
+        parser.add_argument('--password', default='password', help='Пароль пользователей (как в seed_scale)')
+        parser.add_argument('--recipes', type=int, default=1000,
+                            help='Из скольких самых популярных рецептов выбирать страницы')
+        parser.add_argument('--seed', type=int, help='Зерно выбора запросов (по умолчанию случайное)')
+        parser.add_argument('--timeout', type=float, default=30, help='Таймаут одного запроса в секундах')
+        parser.add_argument('--output', help='Записать результат в JSON-файл')
+        parser.add_argument('--baseline', help='JSON базового прогона для сравнения')
+        parser.add_argument('--tolerance', type=float, default=0.2,
+                            help='Допустимое относительное ухудшение метрик (0.2 — на 20%%)')
+        parser.add_argument('--metrics', default='p95_ms,p99_ms', help='Сравниваемые перцентили задержки')
+
+    def handle(self, *args, **options):
+        if options['concurrency'] < 1 or options['duration'] <= 0:
+            raise CommandError('Нужны хотя бы один воркер и положительная длительность')
+        try:
+            mix = loadtest.parse_mix(options['mix'])
+            baseline = loadtest.load(options['baseline']) if options['baseline'] else None
+        except loadtest.LoadTestError as exc:
+            raise CommandError(exc)
+
+        data = self.request_data(options['recipes'])
+        credentials = ()
+        if any(loadtest.SCENARIOS[name][1] for name in mix):
+            usernames = options['username'] or list(
+                User.objects.filter(is_active=True, is_staff=False)
+                .order_by('pk').values_list('username', flat=True)[:options['concurrency']]
+            )
+            credentials = [(username, options['password']) for username in usernames]
+
+        self.stdout.write(
+            f'{options["base_url"]}: {options["concurrency"]} воркеров, '
+            f'{options["warmup"]:g} с прогрева + {options["duration"]:g} с замера'
+        )
+        try:
+            result = loadtest.run(
+                options['base_url'], data, mix,
+                concurrency=options['concurrency'],
+                duration=options['duration'],
+                warmup=options['warmup'],
+                credentials=credentials,
+                seed=options['seed'],
+                timeout=options['timeout'],
+            ).to_dict()
+        except loadtest.LoadTestError as exc:
+            raise CommandError(exc)
+
+        self.print_table(result)
+        if options['output']:
+            loadtest.save(result, options['output'])
+            self.stdout.write(f'Результат записан в {options["output"]}')
+
+        if baseline is not None:
+            regressions = loadtest.compare(
+                result, baseline,
+                metrics=[metric.strip() for metric in options['metrics'].split(',') if metric.strip()],
+                tolerance=options['tolerance'],
+            )
+            if regressions:
+                raise CommandError('Ухудшение относительно базового прогона:\n' + '\n'.join(
+                    f'  {regression}' for regression in regressions
+                ))
+            self.stdout.write(self.style.SUCCESS('Ухудшений относительно базового прогона нет'))
+
+    def request_data(self, limit):
+        """Страницы рецептов и поисковые запросы, на которые пойдёт нагрузка"""
+        recipes = Recipe.objects.filter(is_published=True).order_by('-likes_count')[:limit]
+        slugs = list(recipes.values_list('slug', flat=True))
+        words = {word for title in recipes.values_list('title', flat=True) for word in title.lower().split()}
+        names = RecipeIngredient.objects.filter(recipe__in=recipes.values('pk')).values_list('name', flat=True)
+        queries = sorted(words | set(names.distinct()[:limit]))
+        return {'slugs': slugs, 'queries': queries}
+
+    def print_table(self, result):
+        header = f'{"сценарий":<22}{"запросов":>9}{"ошибок":>8}{"rps":>9}{"p50":>9}{"p95":>9}{"p99":>9}{"max":>9}'
+        self.stdout.write(header)
+        for name, stats in result['scenarios'].items():
+            self.stdout.write(
+                f'{name:<22}{stats["requests"]:>9}{stats["errors"]:>8}{stats["throughput"]:>9.1f}'
+                f'{stats["p50_ms"]:>9.1f}{stats["p95_ms"]:>9.1f}{stats["p99_ms"]:>9.1f}{stats["max_ms"]:>9.1f}'
+            )
+        self.stdout.write('Задержки в миллисекундах')
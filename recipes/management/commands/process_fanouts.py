@@ -0,0 +1,42 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from recipes import fanout
+from recipes.models import RecipeFanout
+
+
+class Command(BaseCommand):
+    help = ('Выполняет незавершённые рассылки новых рецептов подписчикам: '
+            'оставшиеся в очереди и прерванные (например, при перезапуске сервера)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--stale-after', type=int, default=10,
+                            help='Через сколько минут без прогресса рассылка считается прерванной')
+        parser.add_argument('--retry-failed', action='store_true',
+                            help='Повторить и рассылки, завершившиеся с ошибкой')
+        parser.add_argument('--batch-size', type=int, default=fanout.BATCH_SIZE,
+                            help='Количество подписчиков в одной пачке')
+
+    def handle(self, *args, **options):
+        statuses = ['pending', 'running']
+        if options['retry_failed']:
+            statuses.append('failed')
+        stale_before = timezone.now() - timedelta(minutes=options['stale_after'])
+        fanouts = (
+            RecipeFanout.objects.filter(status__in=statuses, updated_at__lt=stale_before)
+            .order_by('created_at').values_list('pk', flat=True)
+        )
+
+        processed = 0
+        for fanout_id in list(fanouts):
+            try:
+                result = fanout.run(fanout_id, batch_size=options['batch_size'])
+            except Exception as exc:
+                self.stderr.write(f'Рассылка {fanout_id}: ошибка {exc!r}')
+                continue
+            processed += 1
+            self.stdout.write(f'{result.recipe.title}: доставлено {result.delivered} из {result.total}')
+
+        self.stdout.write(self.style.SUCCESS(f'Готово. Выполнено рассылок: {processed}'))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes import search
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает полнотекстовый индекс рецептов (SQLite FTS5) с нуля'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000,
+                            help='Количество рецептов, индексируемых за один проход')
+
+    def handle(self, *args, **options):
+        if not search.fts_available():
+            raise CommandError('Полнотекстовый индекс доступен только для SQLite с FTS5')
+        indexed = search.rebuild_index(chunk_size=options['chunk_size'], stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS(f'Готово. Проиндексировано рецептов: {indexed}'))
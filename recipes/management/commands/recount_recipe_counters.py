@@ -0,0 +1,83 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from recipes.models import Comment, Favorite, Like, Rating, Recipe
+
+
+def _aggregate(model, aggregate):
+    """Подзапрос с агрегатом по рецепту без размножения строк в JOIN"""
+    return Coalesce(
+        Subquery(
+            model.objects.filter(recipe=OuterRef('pk'))
+            .order_by()
+            .values('recipe')
+            .annotate(value=aggregate)
+            .values('value'),
+            output_field=IntegerField(),
+        ),
+        Value(0),
+    )
+
+
+def counter_expressions():
+    """Выражения, вычисляющие счётчики рецепта по исходным таблицам"""
+    return {
+        'likes_count': _aggregate(Like, Count('id')),
+        'favorites_count': _aggregate(Favorite, Count('id')),
+        'comments_count': _aggregate(Comment, Count('id')),
+        'rating_sum': _aggregate(Rating, Sum('score')),
+        'rating_count': _aggregate(Rating, Count('id')),
+    }
+
+
+class Command(BaseCommand):
+    help = 'Сверяет денормализованные счётчики рецептов с таблицами лайков, избранного, комментариев и оценок'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000,
+                            help='Количество рецептов, обрабатываемых за одну транзакцию')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Только показать расхождения, ничего не записывая')
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        dry_run = options['dry_run']
+        fields = list(Recipe.COUNTER_FIELDS)
+        expected = {f'expected_{field}': expr for field, expr in counter_expressions().items()}
+
+        last_pk = 0
+        checked = fixed = 0
+        while True:
+            with transaction.atomic():
+                chunk = list(
+                    Recipe.objects.filter(pk__gt=last_pk)
+                    .order_by('pk')
+                    .only('pk', *fields)
+                    .annotate(**expected)[:chunk_size]
+                )
+                if not chunk:
+                    break
+
+                stale = []
+                for recipe in chunk:
+                    changed = False
+                    for field in fields:
+                        value = getattr(recipe, f'expected_{field}')
+                        if getattr(recipe, field) != value:
+                            setattr(recipe, field, value)
+                            changed = True
+                    if changed:
+                        stale.append(recipe)
+
+                if stale and not dry_run:
+                    Recipe.objects.bulk_update(stale, fields)
+
+            checked += len(chunk)
+            fixed += len(stale)
+            last_pk = chunk[-1].pk
+            self.stdout.write(f'Проверено рецептов: {checked}, расхождений: {fixed}')
+
+        verb = 'Найдено' if dry_run else 'Исправлено'
+        self.stdout.write(self.style.SUCCESS(f'Готово. {verb} рецептов с расхождениями: {fixed} из {checked}'))
@@ -0,0 +1,435 @@
+import time
+from datetime import datetime, timezone as dt_timezone
+
+import numpy as np
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+
+from recipes.models import Category, Comment, Favorite, Like, Rating, Recipe, RecipeStep, Tag
+from users.models import Follow, Notification, Profile
+
+# Поля, значения которых нужно привести к формату базы; остальные передаются как есть.
+# Даты передаются готовыми строками в UTC (см. Command.db_times): поштучное
+# преобразование datetime занимало большую часть времени вставки
+CONVERTED_FIELDS = {'DecimalField', 'JSONField'}
+
+ADJECTIVES = ['Домашний', 'Быстрый', 'Бабушкин', 'Летний', 'Пряный', 'Нежный', 'Сытный', 'Лёгкий',
+              'Праздничный', 'Деревенский', 'Острый', 'Сливочный', 'Постный', 'Осенний', 'Классический']
+DISHES = ['борщ', 'плов', 'пирог', 'салат', 'суп', 'омлет', 'рагу', 'гуляш', 'кекс', 'пудинг',
+          'шашлык', 'рулет', 'соус', 'хлеб', 'ризотто', 'жульен', 'киш', 'штрудель', 'харчо', 'лагман']
+INGREDIENT_LINES = ['500 г муки', '2 яйца', '200 мл молока', '1 ч. л. соли', '2 ст. л. сахара',
+                    '300 г курицы', '1 луковица', '2 зубчика чеснока', '100 г сливочного масла',
+                    '400 г картофеля', '1 морковь', '200 г сыра', '1 л воды', '150 г риса',
+                    '250 г сметаны', '1 ст. л. растительного масла', '3 помидора', 'перец по вкусу']
+TAG_WORDS = ['быстро', 'вегетарианское', 'на ужин', 'выпечка', 'детям', 'праздник', 'без глютена',
+             'острое', 'суп', 'десерт', 'завтрак', 'постное', 'гриль', 'в мультиварке', 'на обед']
+CATEGORIES = [('Первые блюда', 'soups'), ('Вторые блюда', 'mains'), ('Салаты', 'salads'),
+              ('Выпечка', 'bakery'), ('Десерты', 'desserts'), ('Закуски', 'snacks'),
+              ('Напитки', 'drinks'), ('Соусы', 'sauces')]
+COMMENT_TEXTS = ['Очень вкусно, спасибо!', 'Готовлю уже третий раз.', 'А можно заменить сметану?',
+                 'Добавила больше чеснока — отлично.', 'Дети в восторге!', 'Получилось суховато.',
+                 'Отличный рецепт на каждый день.', 'Сколько по времени запекать?']
+
+
+def power_law(rng, n, size, skew):
+    """size индексов из [0, n) с распределением Ципфа по случайной перестановке"""
+    if n == 0 or size == 0:
+        return np.zeros(0, dtype=np.int64)
+    weights = np.arange(1, n + 1, dtype=np.float64) ** -skew
+    weights /= weights.sum()
+    ranks = rng.choice(n, size=size, p=weights)
+    return rng.permutation(n)[ranks]
+
+
+def unique_pairs(rng, draw, n_right, count, exclude_equal=False, rounds=5):
+    """До count уникальных пар; draw(size) возвращает массивы (левые, правые).
+
+    Из-за перекоса популярности часть пар повторяется, поэтому выборка
+    добирается в несколько раундов.
+    """
+    keys = np.zeros(0, dtype=np.int64)
+    for _ in range(rounds):
+        missing = count - len(keys)
+        if missing <= 0:
+            break
+        left, right = draw(int(missing * 1.3) + 10)
+        if exclude_equal:
+            keep = left != right
+            left, right = left[keep], right[keep]
+        keys = np.union1d(keys, left.astype(np.int64) * n_right + right)
+    if len(keys) > count:
+        keys = np.sort(rng.choice(keys, size=count, replace=False))
+    return keys // n_right, keys % n_right
+
+
+def next_id(model):
+    return (model.objects.aggregate(last=Max('pk'))['last'] or 0) + 1
+
+
+class Command(BaseCommand):
+    help = ('Заполняет базу синтетическими данными большого объёма для нагрузочного тестирования: '
+            'пользователи, рецепты с тегами и шагами, подписки, лайки, избранное, оценки, '
+            'ветки комментариев и уведомления. Популярность авторов и рецептов распределена по '
+            'степенному закону; при одинаковых --seed и --end-date данные совпадают. Записи создаются '
+            'пачками INSERT в обход моделей и сигналов, счётчики рецептов заполняются сразу')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000, help='Количество пользователей')
+        parser.add_argument('--recipes', type=int, default=10000, help='Количество рецептов')
+        parser.add_argument('--tags', type=int, default=200, help='Количество новых тегов')
+        parser.add_argument('--max-steps', type=int, default=5, help='Максимум шагов у рецепта (0 — без шагов)')
+        parser.add_argument('--follows', type=int, default=20000, help='Количество подписок')
+        parser.add_argument('--likes', type=int, default=100000, help='Количество лайков')
+        parser.add_argument('--favorites', type=int, default=30000, help='Количество добавлений в избранное')
+        parser.add_argument('--ratings', type=int, default=50000, help='Количество оценок')
+        parser.add_argument('--comments', type=int, default=30000, help='Количество комментариев (с ответами)')
+        parser.add_argument('--notifications', type=int, default=50000, help='Количество уведомлений')
+        parser.add_argument('--skew', type=float, default=1.1,
+                            help='Показатель степенного закона популярности (больше — сильнее перекос)')
+        parser.add_argument('--days', type=int, default=730, help='За сколько дней распределить даты')
+        parser.add_argument('--end-date', help='Дата самой поздней записи (ГГГГ-ММ-ДД), по умолчанию сегодня')
+        parser.add_argument('--seed', type=int, default=42, help='Зерно генератора случайных чисел')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Количество строк в одной пачке INSERT')
+        parser.add_argument('--password', default='password', help='Пароль всех созданных пользователей')
+
+    def handle(self, *args, **options):
+        if options['users'] < 2 or options['recipes'] < 1:
+            raise CommandError('Нужно хотя бы 2 пользователя и 1 рецепт')
+        if options['end_date']:
+            end = datetime.strptime(options['end_date'], '%Y-%m-%d').replace(tzinfo=dt_timezone.utc)
+        else:
+            end = datetime.now(dt_timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+        self.rng = np.random.default_rng(options['seed'])
+        self.batch_size = options['batch_size']
+        self.skew = options['skew']
+        self.end_ts = end.timestamp()
+        self.start_ts = self.end_ts - options['days'] * 86400
+        started = time.monotonic()
+
+        self.plan(options)
+        self.create_users(options['password'])
+        self.create_reference(options['tags'])
+        self.create_recipes()
+        self.create_recipe_tags()
+        self.create_steps(options['max_steps'])
+        self.create_pairs(Follow, 'follower', 'following', self.follows)
+        self.create_pairs(Like, 'user', 'recipe', self.likes)
+        self.create_pairs(Favorite, 'user', 'recipe', self.favorites)
+        self.create_ratings()
+        self.create_comments()
+        self.create_notifications(options['notifications'])
+        self.reset_sequences()
+
+        self.stdout.write(self.style.SUCCESS(f'Готово за {time.monotonic() - started:.0f} с'))
+        self.stdout.write('Производные данные не заполнялись; при необходимости выполните '
+                          'backfill_ingredients, rebuild_search_index, build_similarity_index '
+                          'и build_recommendations')
+
+    # Генерация в памяти
+
+    def timestamps(self, size, after=None):
+        """Случайные моменты времени (секунды), не раньше after"""
+        low = np.full(size, self.start_ts) if after is None else after
+        return low + self.rng.random(size) * (self.end_ts - low)
+
+    def plan(self, options):
+        rng = self.rng
+        n_users, n_recipes = options['users'], options['recipes']
+        self.n_users, self.n_recipes = n_users, n_recipes
+        self.user_base, self.recipe_base = next_id(User), next_id(Recipe)
+
+        self.user_joined = self.timestamps(n_users)
+        # Несколько авторов пишут большую часть рецептов
+        self.recipe_author = power_law(rng, n_users, n_recipes, self.skew)
+        self.recipe_created = self.timestamps(n_recipes, after=self.user_joined[self.recipe_author])
+
+        def interactions(count):
+            return unique_pairs(rng, lambda size: (
+                rng.integers(0, n_users, size), power_law(rng, n_recipes, size, self.skew),
+            ), n_recipes, min(count, n_users * n_recipes))
+
+        # На популярных авторов подписываются чаще
+        self.follows = unique_pairs(rng, lambda size: (
+            rng.integers(0, n_users, size), power_law(rng, n_users, size, self.skew),
+        ), n_users, min(options['follows'], n_users * (n_users - 1)), exclude_equal=True)
+        self.likes = interactions(options['likes'])
+        self.favorites = interactions(options['favorites'])
+        self.ratings = interactions(options['ratings'])
+        # Оценки смещены к 4–5
+        self.rating_scores = rng.choice([1, 2, 3, 4, 5], size=len(self.ratings[0]), p=[0.05, 0.07, 0.18, 0.35, 0.35])
+
+        # Комментарии: 70% корневых, остальные — ответы на корневые или на другие ответы
+        n_comments = options['comments']
+        n_roots = max(1, int(n_comments * 0.7)) if n_comments else 0
+        n_replies = n_comments - n_roots
+        n_deep = n_replies // 5
+        root_recipe = power_law(rng, n_recipes, n_roots, self.skew)
+        reply_parent = rng.integers(0, n_roots, n_replies - n_deep) if n_roots else np.zeros(0, dtype=np.int64)
+        deep_parent = n_roots + rng.integers(0, max(1, n_replies - n_deep), n_deep)
+        parents = np.concatenate([np.full(n_roots, -1), reply_parent, deep_parent])
+        recipes = np.empty(n_comments, dtype=np.int64)
+        recipes[:n_roots] = root_recipe
+        created = np.empty(n_comments)
+        created[:n_roots] = self.timestamps(n_roots, after=self.recipe_created[root_recipe])
+        for start, stop in ((n_roots, n_replies - n_deep + n_roots), (n_replies - n_deep + n_roots, n_comments)):
+            recipes[start:stop] = recipes[parents[start:stop]]
+            created[start:stop] = self.timestamps(stop - start, after=created[parents[start:stop]])
+        self.comments = (rng.integers(0, n_users, n_comments), recipes, parents, created)
+
+        def counts(recipe_idx, weights=None):
+            return np.bincount(recipe_idx, weights=weights, minlength=n_recipes).astype(np.int64)
+
+        self.counters = {
+            'likes_count': counts(self.likes[1]),
+            'favorites_count': counts(self.favorites[1]),
+            'comments_count': counts(recipes),
+            'rating_sum': counts(self.ratings[1], self.rating_scores),
+            'rating_count': counts(self.ratings[1]),
+        }
+
+    # Запись
+
+    def insert(self, model, names, rows, total):
+        """Вставить строки (кортежи значений полей names) пачками по batch_size"""
+        fields = [model._meta.get_field(name) for name in names]
+        converters = [
+            (index, field) for index, field in enumerate(fields)
+            if field.get_internal_type() in CONVERTED_FIELDS
+        ]
+        quote = connection.ops.quote_name
+        sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+            quote(model._meta.db_table),
+            ', '.join(quote(field.column) for field in fields),
+            ', '.join(['%s'] * len(fields)),
+        )
+
+        def flush(batch):
+            if converters:
+                batch = [list(row) for row in batch]
+                for row in batch:
+                    for index, field in converters:
+                        row[index] = field.get_db_prep_save(row[index], connection)
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.executemany(sql, batch)
+            return len(batch)
+
+        started = time.monotonic()
+        created = 0
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= self.batch_size:
+                created += flush(batch)
+                batch = []
+                if created % (self.batch_size * 20) == 0:
+                    self.stdout.write(f'  {model._meta.verbose_name_plural}: {created} из {total}')
+        if batch:
+            created += flush(batch)
+        self.stdout.write(f'{model._meta.verbose_name_plural}: {created} за {time.monotonic() - started:.1f} с')
+
+    def reset_sequences(self):
+        """Сдвинуть последовательности первичных ключей за вставленные явно id (PostgreSQL)"""
+        statements = connection.ops.sequence_reset_sql(no_style(), [
+            User, Profile, Tag, Recipe, Recipe.tags.through, RecipeStep, Follow, Like, Favorite,
+            Rating, Comment, Notification,
+        ])
+        if statements:
+            with connection.cursor() as cursor:
+                for statement in statements:
+                    cursor.execute(statement)
+
+    @staticmethod
+    def db_times(ts):
+        """Моменты времени (секунды) строками 'ГГГГ-ММ-ДД ЧЧ:ММ:СС.ffffff' в UTC"""
+        values = np.datetime_as_string((np.asarray(ts) * 1e6).astype('datetime64[us]'))
+        return np.char.replace(values, 'T', ' ').tolist()
+
+    def create_users(self, password):
+        password = make_password(password)
+        base = self.user_base
+        joined = self.db_times(self.user_joined)
+        self.insert(User, [
+            'id', 'username', 'email', 'password', 'first_name', 'last_name',
+            'is_superuser', 'is_staff', 'is_active', 'date_joined',
+        ], (
+            (base + i, f'user{base + i}', f'user{base + i}@example.com', password, '', '',
+             False, False, True, joined[i])
+            for i in range(self.n_users)
+        ), self.n_users)
+        default_image = Profile._meta.get_field('profile_image').default
+        self.insert(Profile, ['user', 'bio', 'profile_image', 'created_at', 'updated_at'], (
+            (base + i, '', default_image, joined[i], joined[i])
+            for i in range(self.n_users)
+        ), self.n_users)
+
+    def create_reference(self, n_tags):
+        existing = set(Category.objects.values_list('slug', flat=True))
+        Category.objects.bulk_create([
+            Category(name=name, slug=slug) for name, slug in CATEGORIES if slug not in existing
+        ])
+        self.category_ids = np.array(list(Category.objects.order_by('pk').values_list('pk', flat=True)))
+
+        existing = set(Tag.objects.values_list('name', flat=True))
+        names = []
+        for i in range(n_tags):
+            word = TAG_WORDS[i % len(TAG_WORDS)]
+            name = word if i < len(TAG_WORDS) else f'{word} {i // len(TAG_WORDS) + 1}'
+            if name not in existing:
+                names.append(name)
+        tag_base = next_id(Tag)
+        self.insert(Tag, ['id', 'name', 'slug'], (
+            (tag_base + i, name, f'tag-{tag_base + i}') for i, name in enumerate(names)
+        ), len(names))
+        self.tag_ids = np.array(list(Tag.objects.order_by('pk').values_list('pk', flat=True)))
+
+    def create_recipes(self):
+        rng = self.rng
+        n = self.n_recipes
+        base = self.recipe_base
+        adjective = rng.integers(0, len(ADJECTIVES), n)
+        dish = rng.integers(0, len(DISHES), n)
+        category = self.category_ids[power_law(rng, len(self.category_ids), n, 0.8)]
+        cooking_time = rng.integers(5, 180, n)
+        difficulty = rng.choice(['easy', 'medium', 'hard'], size=n, p=[0.5, 0.35, 0.15])
+        servings = rng.integers(1, 9, n)
+        calories = rng.integers(80, 1200, n)
+        # Строки ингредиентов: случайный сдвиг и длина в кольцевом списке, без повторов
+        first_line = rng.integers(0, len(INGREDIENT_LINES), n)
+        line_count = rng.integers(3, 9, n)
+        lines = INGREDIENT_LINES * 2
+        self.recipe_titles = [f'{ADJECTIVES[adjective[i]]} {DISHES[dish[i]]}' for i in range(n)]
+        counters = [self.counters[field] for field in Recipe.COUNTER_FIELDS]
+        default_image = Recipe._meta.get_field('image').default
+        created = self.db_times(self.recipe_created)
+        instructions = 'Подготовьте продукты.\nСмешайте ингредиенты.\nГотовьте до готовности.'
+
+        def rows():
+            for i in range(n):
+                yield (
+                    base + i, self.recipe_titles[i], f'recipe-{base + i}',
+                    self.user_base + int(self.recipe_author[i]), int(category[i]),
+                    f'{self.recipe_titles[i]} — проверенный рецепт на {servings[i]} порций.',
+                    '\n'.join(lines[first_line[i]:first_line[i] + line_count[i]]),
+                    instructions, int(cooking_time[i]), str(difficulty[i]), default_image,
+                    created[i], created[i], True, int(calories[i]), 0, 0, 0, int(servings[i]),
+                    *(int(values[i]) for values in counters),
+                )
+
+        self.insert(Recipe, [
+            'id', 'title', 'slug', 'author', 'category', 'description', 'ingredients',
+            'instructions', 'cooking_time', 'difficulty', 'image', 'created_at', 'updated_at',
+            'is_published', 'calories', 'proteins', 'fats', 'carbohydrates', 'servings',
+            *Recipe.COUNTER_FIELDS,
+        ], rows(), n)
+
+    def create_recipe_tags(self):
+        if not len(self.tag_ids):
+            return
+        rng = self.rng
+        per_recipe = rng.integers(0, 5, self.n_recipes)
+        recipes = np.repeat(np.arange(self.n_recipes), per_recipe)
+        tags = power_law(rng, len(self.tag_ids), len(recipes), self.skew)
+        keys = np.unique(recipes * len(self.tag_ids) + tags)
+        recipes, tags = keys // len(self.tag_ids), keys % len(self.tag_ids)
+        self.insert(Recipe.tags.through, ['recipe', 'tag'], (
+            (self.recipe_base + int(recipe), int(self.tag_ids[tag])) for recipe, tag in zip(recipes, tags)
+        ), len(recipes))
+
+    def create_steps(self, max_steps):
+        if max_steps < 1:
+            return
+        per_recipe = self.rng.integers(1, max_steps + 1, self.n_recipes)
+
+        def rows():
+            for i, count in enumerate(per_recipe):
+                for number in range(1, count + 1):
+                    yield (self.recipe_base + i, number, f'Шаг {number}', 'Следуйте инструкции.', 5 * number)
+
+        self.insert(RecipeStep, ['recipe', 'step_number', 'title', 'description', 'duration'],
+                    rows(), int(per_recipe.sum()))
+
+    def create_pairs(self, model, left_field, right_field, pairs):
+        left, right = pairs
+        if model is Follow:
+            right_base, after = self.user_base, self.user_joined[right]
+        else:
+            right_base, after = self.recipe_base, self.recipe_created[right]
+        created = self.db_times(self.timestamps(len(left), after=np.maximum(after, self.user_joined[left])))
+        self.insert(model, [left_field, right_field, 'created_at'], (
+            (self.user_base + int(left[i]), right_base + int(right[i]), created[i])
+            for i in range(len(left))
+        ), len(left))
+
+    def create_ratings(self):
+        users, recipes = self.ratings
+        created = self.db_times(
+            self.timestamps(len(users), after=np.maximum(self.recipe_created[recipes], self.user_joined[users]))
+        )
+        self.insert(Rating, ['user', 'recipe', 'score', 'created_at', 'updated_at'], (
+            (self.user_base + int(users[i]), self.recipe_base + int(recipes[i]), int(self.rating_scores[i]),
+             created[i], created[i])
+            for i in range(len(users))
+        ), len(users))
+
+    def create_comments(self):
+        users, recipes, parents, created = self.comments
+        created = self.db_times(created)
+        base = next_id(Comment)
+        texts = self.rng.integers(0, len(COMMENT_TEXTS), len(users))
+        # Родители стоят в выборке раньше ответов, поэтому внешние ключи не нарушаются
+        self.insert(Comment, ['id', 'user', 'recipe', 'parent', 'content', 'created_at', 'updated_at'], (
+            (base + i, self.user_base + int(users[i]), self.recipe_base + int(recipes[i]),
+             base + int(parents[i]) if parents[i] >= 0 else None, COMMENT_TEXTS[texts[i]],
+             created[i], created[i])
+            for i in range(len(users))
+        ), len(users))
+
+    def create_notifications(self, count):
+        rng = self.rng
+        sources = [('like', self.likes), ('comment', (self.comments[0], self.comments[1])), ('follow', self.follows)]
+        sources = [(kind, pairs) for kind, pairs in sources if len(pairs[0])]
+        if not count or not sources:
+            return
+        kinds = rng.integers(0, len(sources), count)
+        senders = np.empty(count, dtype=np.int64)
+        targets = np.empty(count, dtype=np.int64)
+        after = np.empty(count)
+        for index, (kind, (source_senders, source_targets)) in enumerate(sources):
+            mask = kinds == index
+            picks = rng.integers(0, len(source_senders), int(mask.sum()))
+            senders[mask] = source_senders[picks]
+            targets[mask] = source_targets[picks]
+            after[mask] = (self.user_joined if kind == 'follow' else self.recipe_created)[targets[mask]]
+        created = self.db_times(self.timestamps(count, after=after))
+        is_read = rng.random(count) < 0.6
+
+        def rows():
+            for i in range(count):
+                kind = sources[kinds[i]][0]
+                sender = self.user_base + int(senders[i])
+                target = int(targets[i])
+                username = f'user{sender}'
+                if kind == 'follow':
+                    recipient = self.user_base + target
+                    group_key, title = 'follow', 'Новый подписчик'
+                    message, link = f'{username} подписался на вас', f'/user/{username}/'
+                else:
+                    recipient = self.user_base + int(self.recipe_author[target])
+                    verb = 'оценил' if kind == 'like' else 'прокомментировал'
+                    group_key = f'{kind}:{self.recipe_base + target}'
+                    title = 'Новый лайк' if kind == 'like' else 'Новый комментарий'
+                    message = f'{username} {verb} ваш рецепт "{self.recipe_titles[target]}"'
+                    link = f'/recipe/recipe-{self.recipe_base + target}/'
+                if recipient == sender:
+                    continue
+                yield (recipient, sender, kind, title, message, link, bool(is_read[i]),
+                       group_key, [sender], 1, created[i])
+
+        self.insert(Notification, [
+            'recipient', 'sender', 'notification_type', 'title', 'message', 'link', 'is_read',
+            'group_key', 'actor_ids', 'actor_count', 'created_at',
+        ], rows(), count)
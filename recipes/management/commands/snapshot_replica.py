@@ -0,0 +1,62 @@
+import os
+import sqlite3
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from pre_recipe_blog.db.replica import PRIMARY, REPLICA, replica_configured
+
+
+class Command(BaseCommand):
+    help = ('Обновляет реплику для чтения копией основной SQLite-базы (online backup). '
+            'Копия пишется во временный файл и подменяет реплику целиком, так что читатели '
+            'видят либо старый, либо новый снимок')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=0,
+                            help='Повторять снимок каждые N секунд (0 — один раз)')
+        parser.add_argument('--pages', type=int, default=1024,
+                            help='Сколько страниц копировать за шаг, не блокируя запись надолго')
+
+    def handle(self, *args, **options):
+        if not replica_configured():
+            raise CommandError('Реплика не настроена: задайте REPLICA_DATABASE_NAME')
+        primary = connections[PRIMARY]
+        if primary.vendor != 'sqlite' or connections[REPLICA].vendor != 'sqlite':
+            raise CommandError('Снимок поддерживается только для SQLite; для других СУБД используйте репликацию сервера')
+        target = str(connections[REPLICA].settings_dict['NAME'])
+
+        while True:
+            started = time.monotonic()
+            self.snapshot(primary, target, options['pages'])
+            self.stdout.write(
+                f'Реплика {target} обновлена за {time.monotonic() - started:.2f} с, '
+                f'{os.path.getsize(target) // 1024} КиБ'
+            )
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
+
+    def snapshot(self, primary, target, pages):
+        temporary = f'{target}.tmp'
+        if os.path.exists(temporary):
+            os.remove(temporary)
+        primary.ensure_connection()
+        # Снимок содержит всё, что закоммичено до начала копирования
+        started = time.time()
+        copy = sqlite3.connect(temporary)
+        try:
+            primary.connection.backup(copy, pages=pages)
+            # Реплику открывают только на чтение, поэтому без WAL: файлы -wal и -shm
+            # некому было бы создавать и сбрасывать
+            copy.execute('PRAGMA journal_mode = DELETE')
+        finally:
+            copy.close()
+        # По времени изменения файла кэш страниц узнаёт, насколько свежи данные реплики
+        os.utime(temporary, (started, started))
+        for suffix in ('-wal', '-shm'):
+            if os.path.exists(target + suffix):
+                os.remove(target + suffix)
+        os.replace(temporary, target)
+        primary.close()
@@ -0,0 +1,64 @@
+# Generated by Django 5.0 on 2026-10-18 02:06
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def fill_counters(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+
+    def aggregate(model_name, expression):
+        model = apps.get_model('recipes', model_name)
+        return Coalesce(
+            Subquery(
+                model.objects.filter(recipe=OuterRef('pk')).order_by()
+                .values('recipe').annotate(value=expression).values('value'),
+                output_field=IntegerField(),
+            ),
+            Value(0),
+        )
+
+    Recipe.objects.update(
+        likes_count=aggregate('Like', Count('id')),
+        favorites_count=aggregate('Favorite', Count('id')),
+        comments_count=aggregate('Comment', Count('id')),
+        rating_sum=aggregate('Rating', Sum('score')),
+        rating_count=aggregate('Rating', Count('id')),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0004_comment_parent_recipe_calories_recipe_carbohydrates_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='comments_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Комментарии'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='В избранном'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='likes_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Лайки'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество оценок'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Сумма оценок'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
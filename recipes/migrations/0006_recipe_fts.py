@@ -0,0 +1,50 @@
+from django.db import migrations
+
+FTS_TABLE = 'recipes_recipe_fts'
+
+
+def create_fts_table(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        f'CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} '
+        f"USING fts5(title, description, ingredients, category, tags, tokenize='unicode61 remove_diacritics 2')"
+    )
+
+    Recipe = apps.get_model('recipes', 'Recipe')
+    recipes = (
+        Recipe.objects.using(schema_editor.connection.alias)
+        .filter(is_published=True)
+        .select_related('category')
+        .prefetch_related('tags')
+    )
+    for recipe in recipes.iterator(chunk_size=1000):
+        schema_editor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, title, description, ingredients, category, tags) '
+            f'VALUES (%s, %s, %s, %s, %s, %s)',
+            [
+                recipe.pk,
+                recipe.title,
+                recipe.description,
+                recipe.ingredients,
+                recipe.category.name if recipe.category else '',
+                ' '.join(tag.name for tag in recipe.tags.all()),
+            ],
+        )
+
+
+def drop_fts_table(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0005_recipe_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fts_table, drop_fts_table),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.0 on 2026-10-18 02:14
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('recipes', '0007_feedentry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeNeighbors',
+            fields=[
+                ('recipe', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='cf_neighbors', serialize=False, to='recipes.recipe', verbose_name='Рецепт')),
+                ('recipe_ids', models.JSONField(default=list, verbose_name='Похожие рецепты')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Дата обновления')),
+            ],
+            options={
+                'verbose_name': 'Похожие рецепты (CF)',
+                'verbose_name_plural': 'Похожие рецепты (CF)',
+            },
+        ),
+        migrations.CreateModel(
+            name='UserRecommendations',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='recommendations', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+                ('recipe_ids', models.JSONField(default=list, verbose_name='Рекомендованные рецепты')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Дата обновления')),
+            ],
+            options={
+                'verbose_name': 'Рекомендации пользователю',
+                'verbose_name_plural': 'Рекомендации пользователям',
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.0 on 2026-10-18 02:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0008_recommendations'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeIngredient',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.PositiveIntegerField(verbose_name='Позиция')),
+                ('raw_line', models.CharField(max_length=500, verbose_name='Исходная строка')),
+                ('quantity', models.DecimalField(blank=True, decimal_places=3, max_digits=10, null=True, verbose_name='Количество')),
+                ('unit', models.CharField(blank=True, max_length=20, verbose_name='Единица измерения')),
+                ('name', models.CharField(db_index=True, max_length=200, verbose_name='Название')),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ingredient_items', to='recipes.recipe', verbose_name='Рецепт')),
+            ],
+            options={
+                'verbose_name': 'Ингредиент',
+                'verbose_name_plural': 'Ингредиенты',
+                'ordering': ['recipe', 'position'],
+                'unique_together': {('recipe', 'position')},
+            },
+        ),
+    ]
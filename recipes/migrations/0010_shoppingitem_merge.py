@@ -0,0 +1,142 @@
+# Generated by Django 5.0 on 2026-10-18 02:19
+
+import re
+from decimal import Decimal, InvalidOperation
+
+from django.db import migrations, models
+
+# Копия разбора количества из recipes.ingredients на момент миграции:
+# миграция должна давать тот же результат, как бы ни менялся парсер дальше
+UNIT_ALIASES = {
+    'g': ('г', 'гр', 'грамм', 'грамма', 'граммов', 'g', 'gr', 'gram', 'grams'),
+    'kg': ('кг', 'килограмм', 'килограмма', 'kg', 'kilogram', 'kilograms'),
+    'mg': ('мг', 'mg'),
+    'ml': ('мл', 'миллилитр', 'миллилитров', 'ml', 'milliliter', 'milliliters', 'millilitre'),
+    'l': ('л', 'литр', 'литра', 'литров', 'l', 'liter', 'liters', 'litre', 'litres'),
+    'tsp': ('ч. л.', 'ч.л.', 'ч л', 'чл', 'чайная ложка', 'чайные ложки', 'чайных ложек',
+            'tsp', 'teaspoon', 'teaspoons'),
+    'tbsp': ('ст. л.', 'ст.л.', 'ст л', 'стл', 'столовая ложка', 'столовые ложки', 'столовых ложек',
+             'tbsp', 'tablespoon', 'tablespoons'),
+    'cup': ('стакан', 'стакана', 'стаканов', 'cup', 'cups'),
+    'pcs': ('шт', 'штука', 'штуки', 'штук', 'pcs', 'pc', 'piece', 'pieces'),
+    'pinch': ('щепотка', 'щепотки', 'щепоток', 'pinch', 'pinches'),
+    'clove': ('зубчик', 'зубчика', 'зубчиков', 'clove', 'cloves'),
+}
+
+UNIT_CONVERSIONS = {
+    'mg': ('g', Decimal('0.001')),
+    'g': ('g', Decimal('1')),
+    'kg': ('g', Decimal('1000')),
+    'ml': ('ml', Decimal('1')),
+    'l': ('ml', Decimal('1000')),
+    'tsp': ('tsp', Decimal('1')),
+    'tbsp': ('tsp', Decimal('3')),
+}
+
+_ALIAS_TO_UNIT = {alias: unit for unit, aliases in UNIT_ALIASES.items() for alias in aliases}
+_UNIT_PATTERN = '|'.join(
+    re.escape(alias).replace(r'\ ', r'\s*')
+    for alias in sorted(_ALIAS_TO_UNIT, key=len, reverse=True)
+)
+_FRACTIONS = {'½': '1/2', '¼': '1/4', '¾': '3/4', '⅓': '1/3', '⅔': '2/3'}
+_QUANTITY = r'\d+\s+\d+/\d+|\d+(?:[.,]\d+)?(?:\s*/\s*\d+)?'
+_RANGE = rf'(?:{_QUANTITY})(?:\s*[-–]\s*(?:{_QUANTITY}))?'
+
+_LEADING = re.compile(
+    rf'^(?P<quantity>{_RANGE})\s*(?:(?P<unit>{_UNIT_PATTERN})(?=[\s.,)]|$)\.?)?\s*(?P<name>.*)$',
+    re.IGNORECASE,
+)
+_NOISE = re.compile(r'\b(?:по вкусу|to taste|optional|по желанию)\b', re.IGNORECASE)
+
+
+def _parse_quantity(text):
+    text = text.replace(',', '.')
+    text = re.split(r'\s*[-–]\s*(?=\d)', text)[0].strip()
+    try:
+        if ' ' in text and '/' in text:
+            whole, fraction = text.split(None, 1)
+            return Decimal(whole) + _parse_quantity(fraction)
+        if '/' in text:
+            numerator, denominator = (part.strip() for part in text.split('/', 1))
+            return (Decimal(numerator) / Decimal(denominator)).quantize(Decimal('0.001'))
+        return Decimal(text)
+    except (InvalidOperation, ZeroDivisionError):
+        return None
+
+
+def normalize_name(name):
+    """Нормализованное название: нижний регистр, без пунктуации и пометок «по вкусу»"""
+    name = _NOISE.sub(' ', name.lower().replace('ё', 'е'))
+    name = re.sub(r'[^\w\s-]', ' ', name)
+    return re.sub(r'\s+', ' ', name).strip(' -')
+
+
+def parse_quantity(text):
+    """Разобрать строку количества («1,5 кг», «2 ст. л.») в (количество, единица).
+
+    Возвращает None, если в строке есть что-то кроме числа и известной единицы.
+    """
+    text = text.strip()
+    for symbol, fraction in _FRACTIONS.items():
+        text = text.replace(symbol, f' {fraction}')
+    match = _LEADING.match(text.strip())
+    if not match or match.group('name').strip():
+        return None
+    unit = match.group('unit')
+    return (
+        _parse_quantity(match.group('quantity')),
+        _ALIAS_TO_UNIT.get(re.sub(r'\s+', ' ', unit.lower()), '') if unit else '',
+    )
+
+
+def to_base(quantity, unit):
+    """Перевести количество в базовую единицу группы; несовместимые единицы не меняются"""
+    base_unit, factor = UNIT_CONVERSIONS.get(unit, (unit, Decimal('1')))
+    if quantity is None:
+        return None, base_unit
+    return quantity * factor, base_unit
+
+
+def fill_amounts(apps, schema_editor):
+    ShoppingItem = apps.get_model('recipes', 'ShoppingItem')
+    batch = []
+    for item in ShoppingItem.objects.order_by('pk').iterator(chunk_size=1000):
+        item.normalized_name = normalize_name(item.name)[:200]
+        parsed = parse_quantity(item.quantity) if item.quantity else None
+        if parsed is not None:
+            item.amount, item.unit = to_base(*parsed)
+        batch.append(item)
+        if len(batch) >= 1000:
+            ShoppingItem.objects.bulk_update(batch, ['normalized_name', 'amount', 'unit'])
+            batch = []
+    ShoppingItem.objects.bulk_update(batch, ['normalized_name', 'amount', 'unit'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0009_recipeingredient'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='shoppingitem',
+            name='amount',
+            field=models.DecimalField(blank=True, decimal_places=3, editable=False, max_digits=12, null=True, verbose_name='Количество в базовой единице'),
+        ),
+        migrations.AddField(
+            model_name='shoppingitem',
+            name='normalized_name',
+            field=models.CharField(blank=True, editable=False, max_length=200, verbose_name='Нормализованное название'),
+        ),
+        migrations.AddField(
+            model_name='shoppingitem',
+            name='unit',
+            field=models.CharField(blank=True, editable=False, max_length=20, verbose_name='Базовая единица'),
+        ),
+        migrations.AddIndex(
+            model_name='shoppingitem',
+            index=models.Index(fields=['shopping_list', 'normalized_name'], name='shopping_item_name_idx'),
+        ),
+        migrations.RunPython(fill_amounts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.0 on 2026-10-18 02:21
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0010_shoppingitem_merge'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeFanout',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('pending', 'В очереди'), ('running', 'Выполняется'), ('done', 'Завершена'), ('failed', 'Ошибка')], db_index=True, default='pending', max_length=10, verbose_name='Статус')),
+                ('total', models.PositiveIntegerField(blank=True, null=True, verbose_name='Подписчиков')),
+                ('delivered', models.PositiveIntegerField(default=0, verbose_name='Доставлено')),
+                ('last_follower_id', models.BigIntegerField(default=0, verbose_name='Последний обработанный подписчик')),
+                ('error', models.TextField(blank=True, verbose_name='Ошибка')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Дата обновления')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Дата завершения')),
+                ('recipe', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='fanout', to='recipes.recipe', verbose_name='Рецепт')),
+            ],
+            options={
+                'verbose_name': 'Рассылка рецепта',
+                'verbose_name_plural': 'Рассылки рецептов',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.0 on 2026-10-18 03:01
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0011_recipefanout'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['recipe', 'parent', 'created_at'], name='comment_thread_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(condition=models.Q(('is_published', True)), fields=['created_at'], name='recipe_published_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(condition=models.Q(('is_published', True)), fields=['category', 'created_at'], name='recipe_category_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(condition=models.Q(('is_published', True)), fields=['author', 'created_at'], name='recipe_author_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipestep',
+            index=models.Index(fields=['recipe', 'step_number'], name='recipe_step_order_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shoppingitem',
+            index=models.Index(fields=['shopping_list', 'is_checked', '-created_at'], name='shopping_item_list_idx'),
+        ),
+    ]
@@ -1,8 +1,11 @@
 from django.db import models
+from django.db.models import F, Q
 from django.contrib.auth.models import User
 from django.urls import reverse
 from django.core.validators import MinValueValidator, MaxValueValidator
 
+from .images import Variants
+
 
 class Category(models.Model):
     name = models.CharField(max_length=100, verbose_name='Название')
@@ -63,10 +66,31 @@ class Recipe(models.Model):
     carbohydrates = models.DecimalField(max_digits=5, decimal_places=1, default=0, verbose_name='Углеводы (г)')
     servings = models.PositiveIntegerField(default=1, verbose_name='Количество порций')
 
+    # Денормализованные счётчики (обновляются через bump_counters,
+    # сверяются командой recount_recipe_counters)
+    likes_count = models.PositiveIntegerField(default=0, editable=False, verbose_name='Лайки')
+    favorites_count = models.PositiveIntegerField(default=0, editable=False, verbose_name='В избранном')
+    comments_count = models.PositiveIntegerField(default=0, editable=False, verbose_name='Комментарии')
+    rating_sum = models.PositiveIntegerField(default=0, editable=False, verbose_name='Сумма оценок')
+    rating_count = models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество оценок')
+
+    COUNTER_FIELDS = ('likes_count', 'favorites_count', 'comments_count', 'rating_sum', 'rating_count')
+
     class Meta:
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
         ordering = ['-created_at']
+        # Списки опубликованных рецептов отсортированы по (created_at, id); id
+        # входит в любой индекс SQLite как rowid, поэтому сортировка идёт по
+        # индексу. Индексы частичные: Django записывает filter(is_published=True)
+        # как WHERE "is_published", и по такому условию SQLite использует только
+        # индекс с тем же условием
+        indexes = [
+            models.Index(fields=['created_at'], condition=Q(is_published=True), name='recipe_published_idx'),
+            models.Index(fields=['category', 'created_at'], condition=Q(is_published=True),
+                         name='recipe_category_idx'),
+            models.Index(fields=['author', 'created_at'], condition=Q(is_published=True), name='recipe_author_idx'),
+        ]
 
     def __str__(self):
         return self.title
@@ -80,23 +104,26 @@ class Recipe(models.Model):
             self.slug = slugify(self.title)
         super().save(*args, **kwargs)
 
-    @property
-    def favorites_count(self):
-        return self.favorites.count()
+    def bump_counters(self, **deltas):
+        """Атомарно изменить счётчики: bump_counters(likes_count=1, rating_sum=-2)"""
+        deltas = {field: delta for field, delta in deltas.items() if delta}
+        if not deltas:
+            return
+        unknown = set(deltas) - set(self.COUNTER_FIELDS)
+        if unknown:
+            raise ValueError(f'Неизвестные счётчики: {", ".join(sorted(unknown))}')
+        Recipe.objects.filter(pk=self.pk).update(
+            **{field: F(field) + delta for field, delta in deltas.items()}
+        )
+        self.refresh_from_db(fields=list(deltas))
 
     @property
     def average_rating(self):
         """Средний рейтинг рецепта"""
-        ratings = self.ratings.all()
-        if ratings:
-            return sum(r.score for r in ratings) / ratings.count()
+        if self.rating_count:
+            return self.rating_sum / self.rating_count
         return 0
 
-    @property
-    def rating_count(self):
-        """Количество оценок"""
-        return self.ratings.count()
-
     @property
     def calories_per_serving(self):
         """Калории на порцию"""
@@ -104,6 +131,100 @@ class Recipe(models.Model):
             return round(self.calories / self.servings)
         return self.calories
 
+    @property
+    def card_image(self):
+        return Variants(self.image, 'card')
+
+    @property
+    def detail_image(self):
+        return Variants(self.image, 'detail')
+
+    @property
+    def thumb_image(self):
+        return Variants(self.image, 'avatar')
+
+
+class RecipeIngredient(models.Model):
+    """Ингредиент рецепта, разобранный из текстового списка"""
+    recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE, related_name='ingredient_items', verbose_name='Рецепт')
+    position = models.PositiveIntegerField(verbose_name='Позиция')
+    raw_line = models.CharField(max_length=500, verbose_name='Исходная строка')
+    quantity = models.DecimalField(max_digits=10, decimal_places=3, null=True, blank=True, verbose_name='Количество')
+    unit = models.CharField(max_length=20, blank=True, verbose_name='Единица измерения')
+    name = models.CharField(max_length=200, db_index=True, verbose_name='Название')
+
+    class Meta:
+        ordering = ['recipe', 'position']
+        unique_together = ['recipe', 'position']
+        verbose_name = 'Ингредиент'
+        verbose_name_plural = 'Ингредиенты'
+
+    def __str__(self):
+        return self.raw_line
+
+    @property
+    def quantity_display(self):
+        """Количество с единицей измерения, например «200 г»"""
+        from .ingredients import format_quantity
+        if self.quantity is None and not self.unit:
+            return ''
+        return format_quantity(self.quantity, self.unit)
+
+
+class FeedEntry(models.Model):
+    """Запись персональной ленты: рецепт автора, на которого подписан пользователь"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='feed_entries', verbose_name='Пользователь')
+    recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE, related_name='feed_entries', verbose_name='Рецепт')
+    author = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+', verbose_name='Автор')
+    created_at = models.DateTimeField(verbose_name='Дата публикации')
+
+    class Meta:
+        unique_together = ['user', 'recipe']
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-id'], name='feed_user_created_idx'),
+            models.Index(fields=['user', 'author'], name='feed_user_author_idx'),
+        ]
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+
+    def __str__(self):
+        return f'{self.user.username}: {self.recipe.title}'
+
+
+class RecipeFanout(models.Model):
+    """Рассылка нового рецепта подписчикам автора: уведомления и записи ленты"""
+    STATUS_CHOICES = [
+        ('pending', 'В очереди'),
+        ('running', 'Выполняется'),
+        ('done', 'Завершена'),
+        ('failed', 'Ошибка'),
+    ]
+
+    recipe = models.OneToOneField(Recipe, on_delete=models.CASCADE, related_name='fanout', verbose_name='Рецепт')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending', db_index=True, verbose_name='Статус')
+    total = models.PositiveIntegerField(null=True, blank=True, verbose_name='Подписчиков')
+    delivered = models.PositiveIntegerField(default=0, verbose_name='Доставлено')
+    last_follower_id = models.BigIntegerField(default=0, verbose_name='Последний обработанный подписчик')
+    error = models.TextField(blank=True, verbose_name='Ошибка')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Дата обновления')
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name='Дата завершения')
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = 'Рассылка рецепта'
+        verbose_name_plural = 'Рассылки рецептов'
+
+    def __str__(self):
+        return f'{self.recipe.title}: {self.get_status_display()}'
+
+    @property
+    def progress(self):
+        """Процент доставленных уведомлений"""
+        if not self.total:
+            return 100 if self.status == 'done' else 0
+        return min(100, round(self.delivered * 100 / self.total))
+
 
 class Like(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name='Пользователь')
@@ -127,6 +248,8 @@ class Favorite(models.Model):
 
     class Meta:
         unique_together = ['user', 'recipe']
+        # Порядок страницы избранного (CursorPaginator)
+        indexes = [models.Index(fields=['user', '-created_at', '-id'], name='favorite_user_created_idx')]
         verbose_name = 'Избранное'
         verbose_name_plural = 'Избранные'
 
@@ -144,6 +267,9 @@ class Comment(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['recipe', 'parent', 'created_at'], name='comment_thread_idx'),
+        ]
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
 
@@ -192,12 +318,19 @@ class RecipeStep(models.Model):
 
     class Meta:
         ordering = ['step_number']
+        indexes = [
+            models.Index(fields=['recipe', 'step_number'], name='recipe_step_order_idx'),
+        ]
         verbose_name = 'Шаг приготовления'
         verbose_name_plural = 'Шаги приготовления'
 
     def __str__(self):
         return f'Шаг {self.step_number}: {self.recipe.title}'
 
+    @property
+    def card_image(self):
+        return Variants(self.image, 'card')
+
 
 class Cookbook(models.Model):
     """Кулинарная книга - коллекция рецептов пользователя"""
@@ -221,6 +354,10 @@ class Cookbook(models.Model):
     def recipes_count(self):
         return self.recipes.count()
 
+    @property
+    def cover_card(self):
+        return Variants(self.cover_image, 'card')
+
 
 class ShoppingList(models.Model):
     """Список покупок пользователя"""
@@ -250,14 +387,57 @@ class ShoppingItem(models.Model):
     shopping_list = models.ForeignKey(ShoppingList, on_delete=models.CASCADE, related_name='items', verbose_name='Список покупок')
     name = models.CharField(max_length=200, verbose_name='Название')
     quantity = models.CharField(max_length=50, blank=True, verbose_name='Количество')
+    normalized_name = models.CharField(max_length=200, blank=True, editable=False, verbose_name='Нормализованное название')
+    amount = models.DecimalField(max_digits=12, decimal_places=3, null=True, blank=True, editable=False, verbose_name='Количество в базовой единице')
+    unit = models.CharField(max_length=20, blank=True, editable=False, verbose_name='Базовая единица')
     is_checked = models.BooleanField(default=False, verbose_name='Куплено')
     recipe = models.ForeignKey(Recipe, on_delete=models.SET_NULL, null=True, blank=True, verbose_name='Из рецепта')
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата добавления')
 
     class Meta:
         ordering = ['is_checked', '-created_at']
+        indexes = [
+            models.Index(fields=['shopping_list', 'normalized_name'], name='shopping_item_name_idx'),
+            # Совпадает с ordering: сначала некупленное, новые выше
+            models.Index(fields=['shopping_list', 'is_checked', '-created_at'], name='shopping_item_list_idx'),
+        ]
         verbose_name = 'Элемент списка'
         verbose_name_plural = 'Элементы списка'
 
     def __str__(self):
         return f'{self.name} ({self.quantity})' if self.quantity else self.name
+
+    def save(self, *args, **kwargs):
+        from .ingredients import normalize_name
+        self.normalized_name = normalize_name(self.name)[:200]
+        super().save(*args, **kwargs)
+
+
+class RecipeNeighbors(models.Model):
+    """Похожие рецепты по взаимодействиям пользователей (item-item CF)"""
+    recipe = models.OneToOneField(Recipe, on_delete=models.CASCADE, primary_key=True,
+                                  related_name='cf_neighbors', verbose_name='Рецепт')
+    recipe_ids = models.JSONField(default=list, verbose_name='Похожие рецепты')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Дата обновления')
+
+    class Meta:
+        verbose_name = 'Похожие рецепты (CF)'
+        verbose_name_plural = 'Похожие рецепты (CF)'
+
+    def __str__(self):
+        return f'{self.recipe.title}: {len(self.recipe_ids)}'
+
+
+class UserRecommendations(models.Model):
+    """Персональные рекомендации пользователю (item-item CF)"""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True,
+                                related_name='recommendations', verbose_name='Пользователь')
+    recipe_ids = models.JSONField(default=list, verbose_name='Рекомендованные рецепты')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Дата обновления')
+
+    class Meta:
+        verbose_name = 'Рекомендации пользователю'
+        verbose_name_plural = 'Рекомендации пользователям'
+
+    def __str__(self):
+        return f'{self.user.username}: {len(self.recipe_ids)}'
@@ -0,0 +1,163 @@
+"""Кэш целых страниц для анонимных посетителей.
+
+Ответ кэшируется по пути и отсортированной строке запроса. Во время
+обработки представление отмечает, от каких объектов зависит страница
+(tag/tag_recipes): recipe:<id>, author:<id>, category:<id>, а также
+recipes и categories для списков. Сигналы вызывают purge_on_commit() для
+изменённых объектов, и после коммита purge записывает для каждого тега время
+сброса. Страница, отрендеренная раньше сброса любого своего тега, считается
+устаревшей. Сброс до коммита не годится: страница, отрендеренная между ним
+и коммитом, содержала бы старые данные и считалась бы свежей. По той же
+причине страница, собранная по данным реплики, считается отрендеренной в
+момент снимка реплики, а не в момент запроса.
+
+Устаревшая страница не удаляется (stale-while-revalidate): первый запрос
+берёт короткую блокировку (cache.add) и рендерит страницу заново, остальные
+в это время получают устаревшую копию. Поэтому сброс популярной страницы
+не приводит к лавине одинаковых запросов к базе.
+
+Не кэшируются ответы, в которых выдан CSRF-токен или показаны сообщения,
+а также всё, кроме 200 на GET.
+"""
+import hashlib
+import time
+from functools import partial, wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse
+from django.utils.http import urlencode
+
+from pre_recipe_blog.db.replica import replica_read_at
+
+KEY_PREFIX = 'pagecache'
+LOCK_TIMEOUT = 30
+# Имя cookie, в которой django.contrib.messages хранит сообщения
+MESSAGES_COOKIE = 'messages'
+
+
+def fresh_timeout():
+    return getattr(settings, 'PAGE_CACHE_TIMEOUT', 300)
+
+
+def stale_timeout():
+    return getattr(settings, 'PAGE_CACHE_STALE', 3600)
+
+
+def _tag_key(tag):
+    return f'{KEY_PREFIX}:tag:{tag}'
+
+
+def _page_key(request):
+    query = urlencode(sorted(request.GET.lists()), doseq=True)
+    digest = hashlib.md5(f'{request.path}?{query}'.encode()).hexdigest()
+    return f'{KEY_PREFIX}:page:{digest}'
+
+
+def tag(request, *tags):
+    """Отметить, что страница зависит от объектов с этими тегами"""
+    tags_set = getattr(request, '_page_cache_tags', None)
+    if tags_set is not None:
+        tags_set.update(tags)
+
+
+def tag_recipes(request, recipes):
+    """Отметить зависимость от рецептов и их авторов"""
+    tags = []
+    for recipe in recipes:
+        tags.extend((f'recipe:{recipe.pk}', f'author:{recipe.author_id}'))
+    tag(request, *tags)
+
+
+def purge(*tags):
+    """Сбросить страницы, зависящие от тегов. Страницы не удаляются, а становятся устаревшими"""
+    if not tags or not fresh_timeout():
+        return
+    now = time.time()
+    # Тег хранится столько же, сколько может храниться страница, которая от него зависит
+    cache.set_many({_tag_key(name): now for name in tags}, fresh_timeout() + stale_timeout())
+
+
+def purge_on_commit(*tags):
+    """purge() после коммита текущей транзакции (сразу, если транзакции нет)"""
+    transaction.on_commit(partial(purge, *tags))
+
+
+def _is_fresh(entry):
+    if time.time() >= entry['fresh_until']:
+        return False
+    purged = cache.get_many([_tag_key(name) for name in entry['tags']])
+    return all(purged_at < entry['rendered_at'] for purged_at in purged.values())
+
+
+def _cacheable_request(request):
+    return (
+        fresh_timeout()
+        and request.method in ('GET', 'HEAD')
+        and not request.user.is_authenticated
+        and MESSAGES_COOKIE not in request.COOKIES
+    )
+
+
+def _cacheable_response(request, response):
+    if response.status_code != 200 or response.streaming or response.cookies:
+        return False
+    if response.has_header('Cache-Control') and 'private' in response['Cache-Control']:
+        return False
+    # CSRF-токен и сообщения индивидуальны для посетителя
+    if request.META.get('CSRF_COOKIE_NEEDS_UPDATE'):
+        return False
+    messages = getattr(request, '_messages', None)
+    return not (messages is not None and messages.used)
+
+
+def _from_entry(entry, status):
+    response = HttpResponse(entry['content'], content_type=entry['content_type'])
+    response['X-Page-Cache'] = status
+    return response
+
+
+def cache_anonymous(view):
+    """Декоратор представления: кэш страницы для анонимных посетителей"""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not _cacheable_request(request):
+            return view(request, *args, **kwargs)
+
+        key = _page_key(request)
+        lock_key = f'{key}:lock'
+        entry = cache.get(key)
+        locked = False
+        if entry is not None:
+            if _is_fresh(entry):
+                return _from_entry(entry, 'HIT')
+            locked = cache.add(lock_key, 1, LOCK_TIMEOUT)
+            if not locked:
+                # Страницу уже обновляет другой запрос
+                return _from_entry(entry, 'STALE')
+
+        rendered_at = time.time()
+        request._page_cache_tags = set()
+        try:
+            response = view(request, *args, **kwargs)
+            if request.method == 'GET' and _cacheable_response(request, response):
+                if hasattr(response, 'render') and callable(response.render):
+                    response.render()
+                # Сбросы, случившиеся после снимка реплики, в странице ещё не учтены
+                snapshot_at = replica_read_at()
+                data_at = rendered_at if snapshot_at is None else min(rendered_at, snapshot_at)
+                cache.set(key, {
+                    'content': response.content,
+                    'content_type': response['Content-Type'],
+                    'tags': sorted(request._page_cache_tags),
+                    'rendered_at': data_at,
+                    'fresh_until': rendered_at + fresh_timeout(),
+                }, fresh_timeout() + stale_timeout())
+                response['X-Page-Cache'] = 'MISS'
+        finally:
+            if locked:
+                cache.delete(lock_key)
+        return response
+
+    return wrapper
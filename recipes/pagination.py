@@ -0,0 +1,232 @@
+import base64
+import binascii
+import heapq
+import json
+import math
+from collections.abc import Sequence
+from itertools import islice
+from operator import itemgetter
+
+from django.db.models import DateTimeField, Q
+from django.utils.functional import cached_property
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+class CursorPaginator:
+    """Keyset-пагинация: страницы выбираются по (created_at, id), без COUNT(*) и OFFSET.
+
+    Курсоры непрозрачны для клиента (base64 от JSON). Общее количество
+    объектов считается только при with_count=True — там, где выборка
+    заведомо ограничена (рецепты одного автора, избранное пользователя).
+    """
+
+    def __init__(self, object_list, per_page, ordering=('-created_at', '-id'), with_count=False):
+        self.object_list = object_list
+        self.per_page = int(per_page)
+        self.ordering = tuple(ordering)
+        self.with_count = with_count
+        self.model = object_list.model
+
+    @cached_property
+    def count(self):
+        """Количество объектов или None, если подсчёт отключён"""
+        if not self.with_count:
+            return None
+        return self.object_list.order_by().count()
+
+    @cached_property
+    def num_pages(self):
+        if self.count is None:
+            return None
+        return max(1, math.ceil(self.count / self.per_page))
+
+    def encode_cursor(self, values, direction, number):
+        payload = {'v': values, 'd': direction, 'n': number}
+        raw = json.dumps(payload, separators=(',', ':'), default=str).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            payload = json.loads(raw)
+            direction = payload['d']
+            values = payload['v']
+            number = payload.get('n')
+        except (ValueError, TypeError, KeyError, binascii.Error):
+            raise InvalidCursor(cursor)
+        if direction not in ('n', 'p') or (values is not None and len(values) != len(self.ordering)):
+            raise InvalidCursor(cursor)
+        if number is not None and not isinstance(number, int):
+            raise InvalidCursor(cursor)
+        if values is not None:
+            try:
+                values = self._to_python(values)
+            except Exception:
+                raise InvalidCursor(cursor)
+        return values, direction, number
+
+    def _to_python(self, values):
+        return [
+            self.model._meta.get_field(name.lstrip('-')).to_python(value)
+            for name, value in zip(self.ordering, values)
+        ]
+
+    def _keyset_filter(self, values, reverse):
+        """Условие «строго после курсора» для лексикографического порядка"""
+        condition = Q()
+        equal = {}
+        for name, value in zip(self.ordering, values):
+            field = name.lstrip('-')
+            descending = name.startswith('-') != reverse
+            lookup = 'lt' if descending else 'gt'
+            condition |= Q(**equal, **{f'{field}__{lookup}': value})
+            equal[field] = value
+        return condition
+
+    def _key(self, obj):
+        return [getattr(obj, name.lstrip('-')) for name in self.ordering]
+
+    def get_page(self, cursor=None):
+        """Вернуть страницу по курсору; некорректный курсор даёт первую страницу"""
+        values, direction, number = None, 'n', 1
+        if cursor:
+            try:
+                values, direction, number = self.decode_cursor(cursor)
+            except InvalidCursor:
+                values, direction, number = None, 'n', 1
+
+        reverse = direction == 'p'
+        items = self._fetch(values, reverse)
+        has_more = len(items) > self.per_page
+        items = items[:self.per_page]
+
+        if reverse:
+            items.reverse()
+            has_previous, has_next = has_more, values is not None
+            if values is None and number is None and self.num_pages is not None:
+                number = self.num_pages
+        else:
+            has_previous, has_next = values is not None, has_more
+        return CursorPage(items, self, number, has_previous, has_next)
+
+    def _fetch(self, values, reverse):
+        """До per_page + 1 объектов после курсора (перед ним при reverse) в порядке обхода"""
+        if reverse:
+            ordering = [name[1:] if name.startswith('-') else f'-{name}' for name in self.ordering]
+        else:
+            ordering = list(self.ordering)
+
+        queryset = self.object_list.order_by(*ordering)
+        if values is not None:
+            queryset = queryset.filter(self._keyset_filter(values, reverse))
+        return list(queryset[:self.per_page + 1])
+
+
+class MergedCursorPaginator(CursorPaginator):
+    """Keyset-пагинация по нескольким выборкам, слитым в одну ленту по времени.
+
+    streams — список пар (queryset, item): каждая выборка страницы читается
+    по своему индексу в порядке (-created_at, -id), item(obj) превращает её
+    объект в объект страницы (None — сам объект). Выборки сливаются в Python;
+    при равном created_at раньше идёт выборка, стоящая в списке раньше.
+    Курсор хранит (created_at, номер выборки, id) последнего объекта страницы.
+    """
+
+    def __init__(self, streams, per_page):
+        self.streams = list(streams)
+        self.per_page = int(per_page)
+        self.ordering = ('-created_at', 'stream', '-id')
+        self.with_count = False
+
+    def _to_python(self, values):
+        created_at, stream, pk = values
+        created_at = DateTimeField().to_python(created_at)
+        if created_at is None or not isinstance(stream, int) or not isinstance(pk, int):
+            raise ValueError(values)
+        return [created_at, stream, pk]
+
+    def _key(self, obj):
+        return obj._cursor_key
+
+    def _stream_filter(self, index, values, reverse):
+        created_at, stream, pk = values
+        lookup = 'gt' if reverse else 'lt'
+        if index == stream:
+            return Q(**{f'created_at__{lookup}': created_at}) | Q(created_at=created_at, **{f'id__{lookup}': pk})
+        # Объекты с тем же created_at из выборки, которая идёт раньше (позже), уже показаны (ещё впереди)
+        if (index > stream) != reverse:
+            lookup += 'e'
+        return Q(**{f'created_at__{lookup}': created_at})
+
+    def _fetch(self, values, reverse):
+        ordering = ('created_at', 'id') if reverse else ('-created_at', '-id')
+        fetched = []
+        for index, (queryset, item) in enumerate(self.streams):
+            queryset = queryset.order_by(*ordering)
+            if values is not None:
+                queryset = queryset.filter(self._stream_filter(index, values, reverse))
+            rows = []
+            for obj in queryset[:self.per_page + 1]:
+                page_obj = item(obj) if item else obj
+                page_obj._cursor_key = [obj.created_at, index, obj.pk]
+                # В порядке (-created_at, stream, -id) сравнивается (created_at, -stream, id)
+                rows.append(((obj.created_at, -index, obj.pk), page_obj))
+            fetched.append(rows)
+        merged = heapq.merge(*fetched, key=itemgetter(0), reverse=not reverse)
+        return [page_obj for _, page_obj in islice(merged, self.per_page + 1)]
+
+
+class CursorPage(Sequence):
+    """Страница keyset-пагинации, совместимая по интерфейсу с django Page"""
+
+    def __init__(self, object_list, paginator, number, has_previous, has_next):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.number = number
+        self._has_previous = has_previous
+        self._has_next = has_next
+
+    def __repr__(self):
+        return f'<CursorPage {self.number or "?"}>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+    def _neighbour_number(self, step):
+        return self.number + step if self.number is not None else None
+
+    @cached_property
+    def next_cursor(self):
+        if not self._has_next:
+            return None
+        return self.paginator.encode_cursor(
+            self.paginator._key(self.object_list[-1]), 'n', self._neighbour_number(1)
+        )
+
+    @cached_property
+    def previous_cursor(self):
+        if not self._has_previous:
+            return None
+        return self.paginator.encode_cursor(
+            self.paginator._key(self.object_list[0]), 'p', self._neighbour_number(-1)
+        )
+
+    @cached_property
+    def last_cursor(self):
+        """Курсор последней страницы (выборка с конца, без OFFSET)"""
+        return self.paginator.encode_cursor(None, 'p', self.paginator.num_pages)
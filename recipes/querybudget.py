@@ -0,0 +1,157 @@
+"""Учёт SQL-запросов каждого запроса к сайту.
+
+QueryBudgetMiddleware считает запросы к базе и их суммарное время, группирует
+их по «отпечатку» (SQL без параметров, списки IN (...) свёрнуты) и находит
+повторяющиеся — типичный признак N+1. Итог пишется одной строкой JSON в лог
+recipes.querybudget, а при QUERY_TIMING_HEADER — ещё и в заголовок
+Server-Timing (его показывает вкладка Network в браузере).
+
+QUERY_BUDGETS задаёт допустимое число запросов по имени URL (view_name).
+Превышение по умолчанию только записывается в лог как предупреждение; при
+QUERY_BUDGET_ACTION = 'raise' выбрасывается QueryBudgetExceeded, что удобно
+в тестах. Проверить конкретный ответ в тесте можно через
+QueryBudgetTestMixin.assertWithinQueryBudget.
+
+Асинхронные представления (поток уведомлений) не учитываются: их запросы
+выполняются в других потоках через sync_to_async.
+"""
+import json
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack
+from dataclasses import dataclass, field
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+_IN_LIST = re.compile(r'IN \((?:%s, )*%s\)')
+_NUMBER = re.compile(r'\b\d+\b')
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def fingerprint(sql):
+    """SQL без конкретных значений: одинаковый для запросов, отличающихся только параметрами"""
+    sql = _IN_LIST.sub('IN (...)', sql)
+    return _NUMBER.sub('N', sql)
+
+
+@dataclass
+class QueryStats:
+    view_name: str = ''
+    count: int = 0
+    duration: float = 0.0
+    fingerprints: Counter = field(default_factory=Counter)
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+            self.fingerprints[fingerprint(sql)] += 1
+
+    def repeated(self, threshold=None):
+        """Запросы, повторившиеся не меньше threshold раз: [(отпечаток, число)]"""
+        threshold = threshold or n_plus_one_threshold()
+        return [(sql, count) for sql, count in self.fingerprints.most_common() if count >= threshold]
+
+    def report(self):
+        lines = [f'{self.view_name or "?"}: {self.count} запросов, {self.duration * 1000:.1f} мс']
+        lines.extend(f'  {count} × {sql}' for sql, count in self.fingerprints.most_common(5))
+        return '\n'.join(lines)
+
+
+def budgets():
+    return getattr(settings, 'QUERY_BUDGETS', {})
+
+
+def budget_for(view_name):
+    return budgets().get(view_name, getattr(settings, 'QUERY_BUDGET_DEFAULT', None))
+
+
+def n_plus_one_threshold():
+    return getattr(settings, 'QUERY_N_PLUS_ONE_THRESHOLD', 5)
+
+
+def _server_timing(stats, total):
+    return (f'db;dur={stats.duration * 1000:.1f};desc="{stats.count} queries", '
+            f'total;dur={total * 1000:.1f}')
+
+
+class QueryBudgetMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.get_response(request)
+
+        stats = QueryStats()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(stats))
+            response = self.get_response(request)
+        total = time.perf_counter() - started
+
+        match = getattr(request, 'resolver_match', None)
+        stats.view_name = match.view_name if match else ''
+        response.query_stats = stats
+        if getattr(settings, 'QUERY_TIMING_HEADER', settings.DEBUG):
+            response['Server-Timing'] = _server_timing(stats, total)
+        self._log(request, response, stats, total)
+        return response
+
+    def _log(self, request, response, stats, total):
+        budget = budget_for(stats.view_name)
+        repeated = stats.repeated()
+        over_budget = budget is not None and stats.count > budget
+        payload = {
+            'view': stats.view_name,
+            'path': request.path,
+            'status': response.status_code,
+            'queries': stats.count,
+            'db_ms': round(stats.duration * 1000, 1),
+            'total_ms': round(total * 1000, 1),
+            'budget': budget,
+            'repeated': [{'sql': sql, 'count': count} for sql, count in repeated[:3]],
+        }
+        level = logging.WARNING if over_budget or repeated else logging.INFO
+        logger.log(level, 'query_stats %s', json.dumps(payload, ensure_ascii=False))
+        if over_budget and getattr(settings, 'QUERY_BUDGET_ACTION', 'warn') == 'raise':
+            raise QueryBudgetExceeded(f'Превышен бюджет запросов ({budget}):\n{stats.report()}')
+
+
+class QueryBudgetTestMixin:
+    """Проверки для TestCase: self.assertWithinQueryBudget(self.client.get(url))"""
+
+    def assertWithinQueryBudget(self, response, budget=None):
+        stats = getattr(response, 'query_stats', None)
+        if stats is None:
+            self.fail('Ответ не прошёл через QueryBudgetMiddleware')
+        if budget is None:
+            budget = budget_for(stats.view_name)
+        if budget is None:
+            self.fail(f'Для {stats.view_name} не задан бюджет в QUERY_BUDGETS')
+        self.assertLessEqual(stats.count, budget, f'Превышен бюджет запросов:\n{stats.report()}')
+
+    def assertNoRepeatedQueries(self, response, threshold=None):
+        repeated = response.query_stats.repeated(threshold)
+        self.assertFalse(repeated, 'Повторяющиеся запросы (N+1):\n' + '\n'.join(
+            f'  {count} × {sql}' for sql, count in repeated
+        ))
@@ -0,0 +1,148 @@
+"""Проверка планов запросов горячих страниц (EXPLAIN QUERY PLAN, SQLite).
+
+Страница открывается тестовым клиентом, все её SELECT-запросы перехватываются
+и для каждого запрашивается план. Проблемой считается полный просмотр
+таблицы (SCAN без индекса) и сортировка во временном B-дереве для ORDER BY:
+на больших таблицах и то и другое растёт вместе с данными. Небольшие
+справочники, которые читаются целиком намеренно, перечислены в FULL_SCAN_ALLOWED.
+
+Список страниц даёт hot_paths. Проверяют их тесты recipes.tests на
+небольшом наборе данных и команда manage.py check_query_plans на
+заполненной базе (например, после seed_scale).
+"""
+import re
+from dataclasses import dataclass, field
+
+from django.db import connections
+from django.db.models import Count
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+# Справочники, которые recipes.refdata загружает целиком
+FULL_SCAN_ALLOWED = {'recipes_category', 'recipes_tag'}
+
+_ACCESS = re.compile(r'^(SCAN|SEARCH) (\w+)(.*)$')
+_TEMP_SORT = re.compile(r'USE TEMP B-TREE FOR (?:RIGHT PART OF |LAST TERM OF )?ORDER BY')
+_TABLE_ALIAS = re.compile(r'\b(?:FROM|JOIN)\s+"?(\w+)"?(?:\s+(?:AS\s+)?"?(\w+)"?)?', re.IGNORECASE)
+_NOT_ALIASES = {'on', 'where', 'inner', 'left', 'right', 'cross', 'outer', 'join', 'group', 'order', 'limit', 'using'}
+
+
+@dataclass
+class PlannedQuery:
+    alias: str
+    sql: str
+    plan: list
+    problems: list = field(default_factory=list)
+
+
+def explain(connection, sql, params=None):
+    """Строки плана: [(id, parent, detail)]"""
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+        return [(row[0], row[1], row[-1]) for row in cursor.fetchall()]
+
+
+def _aliases(sql):
+    """Псевдонимы таблиц в запросе: {'U0': 'recipes_feedentry', ...}"""
+    aliases = {}
+    for table, alias in _TABLE_ALIAS.findall(sql):
+        if alias and alias.lower() not in _NOT_ALIASES:
+            aliases[alias] = table
+    return aliases
+
+
+def plan_problems(plan, tables, sql=''):
+    """Полные просмотры таблиц и сортировки строк таблиц во временном B-дереве.
+
+    Сортировка считается проблемой, только если внешний цикл того же уровня
+    плана читает таблицу из tables. Сортировка результата CTE или подзапроса
+    (например, ветки комментариев в recipes.comment_tree) ограничена их LIMIT
+    и от размера таблиц не зависит. Полнотекстовый индекс (VIRTUAL TABLE)
+    сам отбирает совпадения, и сортировка по релевантности идёт только по ним.
+    """
+    aliases = _aliases(sql)
+    children = {}
+    for node_id, parent, detail in plan:
+        children.setdefault(parent, []).append(detail)
+
+    def table_of(detail):
+        match = _ACCESS.match(detail)
+        if not match:
+            return None, ''
+        name = match.group(2)
+        if 'VIRTUAL TABLE INDEX' in match.group(3):
+            return None, match.group(3)
+        return aliases.get(name, name), match.group(3)
+
+    problems = []
+    for node_id, parent, detail in plan:
+        table, rest = table_of(detail)
+        if detail.startswith('SCAN ') and table in tables and table not in FULL_SCAN_ALLOWED and 'USING' not in rest:
+            problems.append(f'полный просмотр {table}')
+        if _TEMP_SORT.search(detail):
+            outer = next((table_of(sibling)[0] for sibling in children[parent] if _ACCESS.match(sibling)), None)
+            if outer in tables:
+                problems.append(f'сортировка {outer} во временном B-дереве')
+    return problems
+
+
+def check(client, path, aliases=None):
+    """Открыть страницу и вернуть (ответ, [PlannedQuery]) для всех её SELECT"""
+    aliases = aliases or list(connections)
+    contexts = {alias: CaptureQueriesContext(connections[alias]) for alias in aliases}
+    for context in contexts.values():
+        context.__enter__()
+    try:
+        response = client.get(path)
+    finally:
+        for context in contexts.values():
+            context.__exit__(None, None, None)
+
+    planned = []
+    for alias, context in contexts.items():
+        connection = connections[alias]
+        if connection.vendor != 'sqlite':
+            continue
+        tables = set(connection.introspection.table_names())
+        # SQLite сохраняет в captured_queries текст с уже подставленными значениями
+        for captured in context.captured_queries:
+            sql = captured['sql'].strip()
+            if not re.match(r'(?is)^(SELECT|WITH)\b', sql):
+                continue
+            plan = explain(connection, sql)
+            planned.append(PlannedQuery(alias, sql, plan, plan_problems(plan, tables, sql)))
+    return response, planned
+
+
+def hot_paths():
+    """Горячие страницы для проверки; пустой список, если опубликованных рецептов нет"""
+    from .models import Comment, Recipe
+
+    recipe = (
+        Recipe.objects.filter(is_published=True)
+        .order_by('-comments_count', 'pk').select_related('category', 'author').first()
+    )
+    if recipe is None:
+        return []
+    paths = [
+        reverse('home'),
+        reverse('recipe-detail', args=[recipe.slug]),
+        reverse('user-recipes', args=[recipe.author.username]),
+        reverse('search-recipes'),
+        reverse('search-recipes') + '?q=' + recipe.title.split()[0],
+        reverse('feed'),
+        reverse('favorites'),
+        reverse('shopping-list'),
+        reverse('notifications'),
+        reverse('notifications-count'),
+    ]
+    if recipe.category_id:
+        paths.append(reverse('category-posts', args=[recipe.category.slug]))
+    thread = (
+        Comment.objects.filter(recipe=recipe, parent__isnull=True)
+        .annotate(reply_count=Count('replies')).filter(reply_count__gt=0)
+        .order_by('pk').first()
+    )
+    if thread is not None:
+        paths.append(reverse('comment-replies', args=[recipe.slug, thread.pk]))
+    return paths
@@ -0,0 +1,123 @@
+"""Справочники (категории и теги) в памяти процесса.
+
+Категории нужны почти на каждой странице (меню в base.html), а меняются
+редко, поэтому процесс держит их снимок вместе со всеми тегами. Снимок
+неизменяем и заменяется целиком одним присваиванием, так что потоки видят
+либо старый, либо новый снимок, но не их смесь.
+
+При изменении категории или тега сигналы после коммита записывают в общий
+кэш новую метку версии (bump_version). При каждом обращении процесс читает
+метку одним cache.get и перечитывает справочники, только если она
+изменилась. Если кэш не общий для процессов (LocMemCache), другие процессы
+узнают об изменении не позже чем через REFERENCE_DATA_MAX_AGE секунд.
+"""
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.text import slugify
+
+from .models import Category, Tag
+
+VERSION_KEY = 'refdata:version'
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    version: str
+    loaded_at: float
+    categories: tuple
+    categories_by_slug: dict
+    tags_by_name: dict
+
+
+_snapshot = None
+_lock = threading.Lock()
+
+
+def max_age():
+    return getattr(settings, 'REFERENCE_DATA_MAX_AGE', 60)
+
+
+def bump_version():
+    """Отметить, что справочники изменились; процессы перечитают их при следующем обращении"""
+    global _snapshot
+    cache.set(VERSION_KEY, uuid.uuid4().hex, None)
+    _snapshot = None
+
+
+def _current_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # Метку вытеснили из кэша или её ещё не было: заводим новую
+        version = uuid.uuid4().hex
+        if not cache.add(VERSION_KEY, version, None):
+            version = cache.get(VERSION_KEY, version)
+    return version
+
+
+def _load(version):
+    categories = tuple(Category.objects.order_by('pk'))
+    return Snapshot(
+        version=version,
+        loaded_at=time.monotonic(),
+        categories=categories,
+        categories_by_slug={category.slug: category for category in categories},
+        tags_by_name={tag.name: tag for tag in Tag.objects.all()},
+    )
+
+
+def snapshot():
+    global _snapshot
+    current = _snapshot
+    version = _current_version()
+    if current is not None and current.version == version and time.monotonic() - current.loaded_at < max_age():
+        return current
+    # Перечитывает один поток; остальные тем временем пользуются прежним снимком
+    if not _lock.acquire(blocking=current is None):
+        return current
+    try:
+        if _snapshot is not None and _snapshot is not current:
+            return _snapshot
+        _snapshot = _load(version)
+        return _snapshot
+    finally:
+        _lock.release()
+
+
+def categories():
+    return snapshot().categories
+
+
+def category_by_slug(slug):
+    return snapshot().categories_by_slug.get(slug)
+
+
+def get_or_create_tags(names):
+    """Теги по именам в порядке names.
+
+    Известные справочнику теги берутся из снимка. Остальные читаются одним
+    запросом IN, недостающие создаются одним bulk_create; тег, который
+    одновременно создал другой запрос, пропускается и дочитывается повторным
+    запросом IN.
+    """
+    tags_by_name = snapshot().tags_by_name
+    found = {name: tags_by_name[name] for name in names if name in tags_by_name}
+    missing = [name for name in dict.fromkeys(names) if name not in found]
+    if missing:
+        found.update((tag.name, tag) for tag in Tag.objects.filter(name__in=missing))
+        new = [Tag(name=name, slug=slugify(name)) for name in missing if name not in found]
+        if new:
+            Tag.objects.bulk_create(new, ignore_conflicts=True)
+            found.update((tag.name, tag) for tag in Tag.objects.filter(name__in=[tag.name for tag in new]))
+            # bulk_create не отправляет post_save, поэтому версию справочника обновляем сами
+            transaction.on_commit(bump_version)
+        for name in missing:
+            if name not in found:
+                # Не создался из-за совпадения slug с другим тегом: как и раньше, решает get_or_create
+                found[name], _ = Tag.objects.get_or_create(name=name)
+    return [found[name] for name in names]
@@ -0,0 +1,187 @@
+"""Полнотекстовый поиск рецептов на SQLite FTS5.
+
+Индекс хранится в виртуальной таблице recipes_recipe_fts (rowid = id рецепта)
+и содержит только опубликованные рецепты: заголовок, описание, ингредиенты,
+название категории и теги. Синхронизация — в recipes.signals, полная
+перестройка — команда rebuild_search_index.
+
+Перестройка собирает новый индекс в теневой таблице recipes_recipe_fts_rebuild
+и подменяет им старый одной транзакцией (DROP + ALTER TABLE ... RENAME), так
+что поиск всё это время работает по полному старому индексу. Пока теневая
+таблица существует, index_recipes и remove_recipes пишут в обе таблицы;
+каждая порция перестройки читает рецепты и пишет в теневую таблицу в одной
+транзакции на запись, поэтому правка рецепта не перетирается старой копией.
+"""
+import re
+from dataclasses import dataclass
+
+from django.db import connections, router, transaction
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+FTS_TABLE = 'recipes_recipe_fts'
+FTS_REBUILD_TABLE = f'{FTS_TABLE}_rebuild'
+FTS_COLUMNS = ('title', 'description', 'ingredients', 'category', 'tags')
+# Веса колонок для bm25 в порядке FTS_COLUMNS
+FTS_WEIGHTS = (10.0, 3.0, 2.0, 4.0, 5.0)
+MAX_RESULTS = 500
+MAX_QUERY_TERMS = 10
+
+_HIGHLIGHT_START = '\x02'
+_HIGHLIGHT_END = '\x03'
+_available = set()
+
+
+@dataclass
+class SearchHit:
+    recipe_id: int
+    rank: float
+    snippet: str
+
+
+def create_table_sql(table=FTS_TABLE):
+    columns = ', '.join(FTS_COLUMNS)
+    return (
+        f'CREATE VIRTUAL TABLE IF NOT EXISTS {table} '
+        f"USING fts5({columns}, tokenize='unicode61 remove_diacritics 2')"
+    )
+
+
+def _connection(read=False):
+    from .models import Recipe
+    return connections[router.db_for_read(Recipe) if read else router.db_for_write(Recipe)]
+
+
+def fts_available(connection=None):
+    """Доступен ли FTS-индекс (SQLite с собранным FTS5 и применённой миграцией)"""
+    connection = connection or _connection()
+    if connection.vendor != 'sqlite':
+        return False
+    if connection.alias in _available:
+        return True
+    if FTS_TABLE in connection.introspection.table_names():
+        _available.add(connection.alias)
+        return True
+    return False
+
+
+def build_match_query(text):
+    """Превратить пользовательский ввод в безопасное FTS5-выражение с поиском по префиксу"""
+    terms = re.findall(r'\w+', text.lower())[:MAX_QUERY_TERMS]
+    if not terms:
+        return None
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def _render_snippet(raw):
+    html = escape(raw)
+    html = html.replace(_HIGHLIGHT_START, '<mark>').replace(_HIGHLIGHT_END, '</mark>')
+    return mark_safe(html)
+
+
+def search(text, limit=MAX_RESULTS):
+    """Найти рецепты; результат отсортирован по BM25 (лучшие первыми)"""
+    match = build_match_query(text)
+    connection = _connection(read=True)
+    if match is None or not fts_available(connection):
+        return []
+    weights = ', '.join(str(weight) for weight in FTS_WEIGHTS)
+    sql = (
+        f'SELECT rowid, bm25({FTS_TABLE}, {weights}) AS score, '
+        f"snippet({FTS_TABLE}, -1, %s, %s, '…', 16) "
+        f'FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s '
+        f'ORDER BY score LIMIT %s'
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [_HIGHLIGHT_START, _HIGHLIGHT_END, match, limit])
+        rows = cursor.fetchall()
+    return [SearchHit(recipe_id, score, _render_snippet(snippet)) for recipe_id, score, snippet in rows]
+
+
+def _documents(recipes):
+    for recipe in recipes:
+        yield (
+            recipe.pk,
+            recipe.title,
+            recipe.description,
+            ' '.join(item.name for item in recipe.ingredient_items.all()) or recipe.ingredients,
+            recipe.category.name if recipe.category else '',
+            ' '.join(tag.name for tag in recipe.tags.all()),
+        )
+
+
+def _index_tables(cursor):
+    """Таблицы, в которые пишутся изменения: основная и теневая, если идёт перестройка"""
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_REBUILD_TABLE])
+    return [FTS_TABLE, FTS_REBUILD_TABLE] if cursor.fetchone() else [FTS_TABLE]
+
+
+def index_recipes(recipe_ids, tables=None):
+    """Переиндексировать рецепты; неопубликованные и удалённые убираются из индекса"""
+    from .models import Recipe
+
+    recipe_ids = list(recipe_ids)
+    connection = _connection()
+    if not recipe_ids or not fts_available(connection):
+        return
+    recipes = (
+        Recipe.objects.filter(pk__in=recipe_ids, is_published=True)
+        .select_related('category')
+        .prefetch_related('tags', 'ingredient_items')
+    )
+    documents = list(_documents(recipes))
+    placeholders = ', '.join(['%s'] * (len(FTS_COLUMNS) + 1))
+    with connection.cursor() as cursor:
+        for table in tables or _index_tables(cursor):
+            cursor.executemany(f'DELETE FROM {table} WHERE rowid = %s', [(pk,) for pk in recipe_ids])
+            cursor.executemany(
+                f'INSERT INTO {table} (rowid, {", ".join(FTS_COLUMNS)}) VALUES ({placeholders})',
+                documents,
+            )
+
+
+def remove_recipes(recipe_ids):
+    recipe_ids = list(recipe_ids)
+    connection = _connection()
+    if not recipe_ids or not fts_available(connection):
+        return
+    with connection.cursor() as cursor:
+        for table in _index_tables(cursor):
+            cursor.executemany(f'DELETE FROM {table} WHERE rowid = %s', [(pk,) for pk in recipe_ids])
+
+
+def rebuild_index(chunk_size=1000, stdout=None):
+    """Пересобрать индекс с нуля в теневой таблице и подменить им основной;
+    возвращает количество проиндексированных рецептов"""
+    from .models import Recipe
+
+    connection = _connection()
+    if not fts_available(connection):
+        return 0
+    with connection.cursor() as cursor:
+        # Теневая таблица могла остаться от прерванной перестройки
+        cursor.execute(f'DROP TABLE IF EXISTS {FTS_REBUILD_TABLE}')
+        cursor.execute(create_table_sql(FTS_REBUILD_TABLE))
+
+    indexed = 0
+    last_pk = 0
+    while True:
+        with transaction.atomic(using=connection.alias):
+            ids = list(
+                Recipe.objects.filter(pk__gt=last_pk, is_published=True)
+                .order_by('pk').values_list('pk', flat=True)[:chunk_size]
+            )
+            if not ids:
+                break
+            index_recipes(ids, tables=[FTS_REBUILD_TABLE])
+        indexed += len(ids)
+        last_pk = ids[-1]
+        if stdout:
+            stdout.write(f'Проиндексировано рецептов: {indexed}')
+
+    with connection.cursor() as cursor:
+        cursor.execute(f"INSERT INTO {FTS_REBUILD_TABLE} ({FTS_REBUILD_TABLE}) VALUES ('optimize')")
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        cursor.execute(f'DROP TABLE {FTS_TABLE}')
+        cursor.execute(f'ALTER TABLE {FTS_REBUILD_TABLE} RENAME TO {FTS_TABLE}')
+    return indexed
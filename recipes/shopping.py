@@ -0,0 +1,102 @@
+"""Сведение ингредиентов в список покупок.
+
+Одинаковые продукты в совместимых единицах складываются в одну строку:
+«200 г муки» + «0,5 кг муки» дают «700 г» в уже существующем элементе
+списка. Количество хранится в базовой единице своей группы (г, мл, ч. л.),
+а для отображения переводится в наиболее удобную.
+"""
+from decimal import Decimal
+
+from django.db import transaction
+
+from .ingredients import UNIT_LABELS, normalize_name, parse_quantity, to_base
+from .models import ShoppingItem
+
+# Базовая единица -> (крупная единица, с какого количества в неё переводить)
+DISPLAY_UNITS = {
+    'g': ('kg', Decimal('1000')),
+    'ml': ('l', Decimal('1000')),
+    'tsp': ('tbsp', Decimal('3')),
+}
+
+
+def format_amount(amount, unit):
+    """Строка количества для отображения: 1500 g -> «1,5 кг», 6 tsp -> «2 ст. л.»"""
+    if amount is None:
+        return UNIT_LABELS.get(unit, unit)
+    if unit in DISPLAY_UNITS:
+        larger, factor = DISPLAY_UNITS[unit]
+        # Чайные ложки переводим в столовые только без остатка
+        if amount >= factor and (unit != 'tsp' or amount % factor == 0):
+            amount, unit = amount / factor, larger
+    value = f'{amount.quantize(Decimal("0.001")).normalize():f}'.replace('.', ',')
+    return f'{value} {UNIT_LABELS.get(unit, unit)}'.strip()
+
+
+def merge_items(shopping_list, entries):
+    """Добавить продукты в список, складывая их с уже имеющимися некупленными.
+
+    entries — итерируемое из (название, количество, единица, рецепт), где
+    количество — Decimal или None. Все изменения пишутся одним bulk_create
+    и одним bulk_update. Возвращает (создано, обновлено).
+    """
+    existing = {}
+    for item in shopping_list.items.filter(is_checked=False).order_by('created_at', 'id'):
+        # Количество, введённое вручную в свободной форме, сложить не с чем
+        if item.amount is None and item.quantity:
+            continue
+        existing.setdefault((item.normalized_name, item.unit), item)
+
+    new_items = {}
+    changed = {}
+    for name, quantity, unit, recipe in entries:
+        normalized = normalize_name(name)[:200]
+        if not normalized:
+            continue
+        amount, unit = to_base(quantity, unit)
+        key = (normalized, unit)
+
+        item = existing.get(key) or new_items.get(key)
+        if item is None:
+            new_items[key] = ShoppingItem(
+                shopping_list=shopping_list,
+                name=name[:200],
+                normalized_name=normalized,
+                amount=amount,
+                unit=unit,
+                recipe=recipe,
+            )
+        elif amount is not None:
+            item.amount = amount if item.amount is None else item.amount + amount
+            if item.pk:
+                changed[item.pk] = item
+
+    for item in (*new_items.values(), *changed.values()):
+        item.quantity = format_amount(item.amount, item.unit)[:50]
+
+    with transaction.atomic():
+        ShoppingItem.objects.bulk_create(new_items.values())
+        ShoppingItem.objects.bulk_update(changed.values(), ['amount', 'quantity'])
+    return len(new_items), len(changed)
+
+
+def recipe_entries(recipe, ingredient_items):
+    """Записи для merge_items из структурированных ингредиентов рецепта"""
+    return [
+        (item.name or item.raw_line, item.quantity, item.unit, recipe)
+        for item in ingredient_items
+    ]
+
+
+def manual_entry(name, quantity=''):
+    """Запись для merge_items из введённых вручную названия и количества.
+
+    Возвращает None, если количество не удалось разобрать — такой элемент
+    сохраняется как есть, без сложения.
+    """
+    if not quantity.strip():
+        return name, None, '', None
+    parsed = parse_quantity(quantity)
+    if parsed is None:
+        return None
+    return name, parsed[0], parsed[1], None
@@ -0,0 +1,114 @@
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from .models import Category, Comment, Cookbook, Favorite, Like, Rating, Recipe, RecipeStep, Tag
+from . import images, ingredients, pagecache, refdata, search, tasks
+
+
+@receiver(post_save, sender=Recipe)
+def sync_ingredients(sender, instance, raw=False, **kwargs):
+    # Должен выполняться до индексации: поиск и рекомендации читают разобранные ингредиенты
+    if not raw:
+        ingredients.sync_recipe(instance)
+
+
+@receiver(post_save, sender=Recipe)
+def index_recipe(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.index_recipes([instance.pk])
+        tasks.update_similarity.delay([instance.pk])
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=RecipeStep)
+@receiver(post_save, sender=Cookbook)
+def schedule_image_derivatives(sender, instance, raw=False, **kwargs):
+    if not raw:
+        images.schedule(instance)
+
+
+@receiver(post_delete, sender=Recipe)
+def unindex_recipe(sender, instance, **kwargs):
+    search.remove_recipes([instance.pk])
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def reindex_recipe_tags(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear' and reverse:
+        # После очистки связи со стороны тега список рецептов уже не получить
+        instance._search_recipe_ids = list(instance.recipe_set.values_list('pk', flat=True))
+    elif action in ('post_add', 'post_remove', 'post_clear'):
+        if not reverse:
+            search.index_recipes([instance.pk])
+            tasks.update_similarity.delay([instance.pk])
+        elif action == 'post_clear':
+            search.index_recipes(getattr(instance, '_search_recipe_ids', []))
+        else:
+            search.index_recipes(pk_set or [])
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=Tag)
+def reindex_related_recipes(sender, instance, created, raw=False, **kwargs):
+    if created or raw:
+        return
+    recipes = instance.recipe_set.values_list('pk', flat=True)
+    search.index_recipes(recipes)
+
+
+@receiver(pre_delete, sender=Category)
+@receiver(pre_delete, sender=Tag)
+def remember_related_recipes(sender, instance, **kwargs):
+    instance._search_recipe_ids = list(instance.recipe_set.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=Tag)
+def reindex_orphaned_recipes(sender, instance, **kwargs):
+    search.index_recipes(getattr(instance, '_search_recipe_ids', []))
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def purge_recipe_pages(sender, instance, raw=False, **kwargs):
+    if not raw:
+        pagecache.purge_on_commit('recipes', f'recipe:{instance.pk}', f'author:{instance.author_id}',
+                                  f'category:{instance.category_id}')
+
+
+@receiver(post_save, sender=RecipeStep)
+@receiver(post_delete, sender=RecipeStep)
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+@receiver(post_save, sender=Like)
+@receiver(post_delete, sender=Like)
+@receiver(post_save, sender=Favorite)
+@receiver(post_delete, sender=Favorite)
+@receiver(post_save, sender=Rating)
+@receiver(post_delete, sender=Rating)
+def purge_recipe_detail(sender, instance, raw=False, **kwargs):
+    # Счётчики рецепта меняются через update(), поэтому сбрасываем по связанным объектам
+    if not raw:
+        pagecache.purge_on_commit(f'recipe:{instance.recipe_id}')
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def purge_tagged_recipe(sender, instance, action, reverse, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear') and not reverse:
+        pagecache.purge_on_commit(f'recipe:{instance.pk}')
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def purge_category_pages(sender, instance, raw=False, **kwargs):
+    if not raw:
+        pagecache.purge_on_commit('categories', f'category:{instance.pk}')
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def refresh_reference_data(sender, raw=False, **kwargs):
+    if not raw:
+        transaction.on_commit(refdata.bump_version)
@@ -0,0 +1,384 @@
+"""Индекс похожих рецептов для блока «Рекомендации» на странице рецепта.
+
+Каждый рецепт описывается вектором: TF-IDF по тегам, категории и словам из
+ингредиентов (hashing trick в DIM корзин) плюс стандартизованная пищевая
+ценность. Для каждого рецепта заранее считаются TOP_K ближайших по косинусу.
+
+Индекс хранится в каталоге SIMILARITY_INDEX_DIR набором .npy-файлов, которые
+каждый процесс открывает через memory map; поиск соседей по id рецепта —
+O(1) обращение к массивам. Файлы создаются с запасом по числу строк, поэтому
+сохранение рецепта обновляет индекс на месте без полной перестройки. Когда
+запас исчерпан, обновление ставит в очередь одну полную перестройку
+(recipes.tasks.rebuild_similarity).
+"""
+import json
+import logging
+import math
+import os
+import re
+import shutil
+import zlib
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - без numpy рекомендации берутся из категории
+    np = None
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+DIM = 512
+TOP_K = 12
+NUTRITION_FIELDS = ('calories', 'proteins', 'fats', 'carbohydrates', 'cooking_time')
+NUTRITION_WEIGHT = 0.35
+BLOCK_SIZE = 2048
+GROWTH = 1.25
+
+UNIT_WORDS = {
+    'г', 'гр', 'кг', 'мг', 'мл', 'л', 'ст', 'ч', 'шт', 'уп', 'пуч', 'зуб', 'щеп',
+    'стакан', 'стакана', 'ложка', 'ложки', 'ложек', 'по', 'вкусу', 'для', 'или',
+    'g', 'kg', 'mg', 'ml', 'l', 'tsp', 'tbsp', 'cup', 'cups', 'pcs', 'oz', 'lb',
+    'pinch', 'to', 'taste', 'of', 'and', 'or',
+}
+
+
+def available():
+    return np is not None
+
+
+def index_dir():
+    return Path(getattr(settings, 'SIMILARITY_INDEX_DIR', Path(settings.BASE_DIR) / 'var' / 'similarity'))
+
+
+def ingredient_tokens(text):
+    """Слова из списка ингредиентов без чисел и единиц измерения"""
+    words = re.findall(r'[^\W\d_]+', text.lower())
+    return [word for word in words if len(word) > 2 and word not in UNIT_WORDS]
+
+
+def recipe_tokens(recipe):
+    tokens = [f'tag:{tag.name.lower()}' for tag in recipe.tags.all()]
+    if recipe.category_id:
+        tokens.append(f'cat:{recipe.category_id}')
+    names = [item.name for item in recipe.ingredient_items.all()]
+    text = ' '.join(names) if names else recipe.ingredients
+    tokens.extend(f'ing:{word}' for word in ingredient_tokens(text))
+    return tokens
+
+
+def _bucket(token, dim):
+    return zlib.crc32(token.encode()) % dim
+
+
+def _nutrition(recipe):
+    servings = recipe.servings or 1
+    values = [
+        recipe.calories / servings,
+        float(recipe.proteins) / servings,
+        float(recipe.fats) / servings,
+        float(recipe.carbohydrates) / servings,
+        recipe.cooking_time,
+    ]
+    return [math.log1p(max(value, 0)) for value in values]
+
+
+def _vectorize(token_lists, nutrition, idf, mean, std, dim):
+    """Матрица признаков (n, dim + len(NUTRITION_FIELDS)), строки нормированы"""
+    n = len(token_lists)
+    rows, cols = [], []
+    for row, tokens in enumerate(token_lists):
+        for token in tokens:
+            rows.append(row)
+            cols.append(_bucket(token, dim))
+    text = np.zeros((n, dim), dtype=np.float32)
+    if rows:
+        np.add.at(text, (np.array(rows), np.array(cols)), 1.0)
+    text = np.log1p(text) * idf
+    norms = np.linalg.norm(text, axis=1, keepdims=True)
+    text /= np.maximum(norms, 1e-12)
+
+    numeric = (np.asarray(nutrition, dtype=np.float32).reshape(n, len(NUTRITION_FIELDS)) - mean) / std
+    numeric *= NUTRITION_WEIGHT / math.sqrt(len(NUTRITION_FIELDS))
+    features = np.hstack([text, numeric]).astype(np.float32)
+    features /= np.maximum(np.linalg.norm(features, axis=1, keepdims=True), 1e-12)
+    return features
+
+
+def _top_k(scores, k):
+    """Индексы и значения k наибольших элементов в каждой строке (по убыванию)"""
+    k = min(k, scores.shape[1])
+    part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    values = np.take_along_axis(scores, part, axis=1)
+    order = np.argsort(-values, axis=1)
+    return np.take_along_axis(part, order, axis=1), np.take_along_axis(values, order, axis=1)
+
+
+def _open(path, mode, dtype=None, shape=None, fill=None):
+    if mode == 'w+':
+        array = np.lib.format.open_memmap(path, mode='w+', dtype=dtype, shape=shape)
+        if fill is not None:
+            array[:] = fill
+        return array
+    return np.load(path, mmap_mode=mode)
+
+
+def _read_meta(directory):
+    with open(directory / 'meta.json') as meta_file:
+        return json.load(meta_file)
+
+
+def _write_meta(directory, meta):
+    tmp = directory / 'meta.json.tmp'
+    with open(tmp, 'w') as meta_file:
+        json.dump(meta, meta_file)
+    os.replace(tmp, directory / 'meta.json')
+
+
+@contextmanager
+def _write_lock(directory):
+    directory.mkdir(parents=True, exist_ok=True)
+    with open(directory.parent / f'{directory.name}.lock', 'w') as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def build(dim=DIM, top_k=TOP_K, block_size=BLOCK_SIZE, stdout=None):
+    """Построить индекс по всем опубликованным рецептам и атомарно заменить текущий"""
+    from .models import Recipe
+
+    recipes = (
+        Recipe.objects.filter(is_published=True).order_by('pk')
+        .only('pk', 'category_id', 'ingredients', 'servings', *NUTRITION_FIELDS)
+        .prefetch_related('tags', 'ingredient_items')
+    )
+    ids, token_lists, nutrition = [], [], []
+    for recipe in recipes.iterator(chunk_size=2000):
+        ids.append(recipe.pk)
+        token_lists.append(recipe_tokens(recipe))
+        nutrition.append(_nutrition(recipe))
+    n = len(ids)
+
+    document_frequency = np.zeros(dim, dtype=np.float64)
+    for tokens in token_lists:
+        document_frequency[list({_bucket(token, dim) for token in tokens})] += 1
+    idf = (np.log((1 + n) / (1 + document_frequency)) + 1).astype(np.float32)
+    nutrition_array = np.asarray(nutrition, dtype=np.float32).reshape(n, len(NUTRITION_FIELDS))
+    mean = nutrition_array.mean(axis=0) if n else np.zeros(len(NUTRITION_FIELDS), dtype=np.float32)
+    std = nutrition_array.std(axis=0) if n else np.ones(len(NUTRITION_FIELDS), dtype=np.float32)
+    std = np.where(std > 0, std, 1).astype(np.float32)
+
+    features = _vectorize(token_lists, nutrition_array, idf, mean, std, dim)
+    ids_array = np.asarray(ids, dtype=np.int64)
+    capacity = max(int(n * GROWTH), n + 64)
+    id_capacity = max(int((ids[-1] if ids else 0) * GROWTH), (ids[-1] if ids else 0) + 1024)
+
+    target = index_dir()
+    tmp = target.with_name(target.name + '.tmp')
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+
+    neighbors = _open(tmp / 'neighbors.npy', 'w+', np.int64, (capacity, top_k), fill=-1)
+    scores = _open(tmp / 'scores.npy', 'w+', np.float32, (capacity, top_k), fill=-np.inf)
+    for start in range(0, n, block_size):
+        block = features[start:start + block_size] @ features.T
+        rows = np.arange(block.shape[0])
+        block[rows, rows + start] = -np.inf  # рецепт не рекомендует сам себя
+        index, values = _top_k(block, top_k)
+        neighbors[start:start + len(block), :index.shape[1]] = np.where(np.isfinite(values), ids_array[index], -1)
+        scores[start:start + len(block), :values.shape[1]] = values
+        if stdout:
+            stdout.write(f'Обработано рецептов: {min(start + block_size, n)} из {n}')
+
+    stored = _open(tmp / 'features.npy', 'w+', np.float32, (capacity, features.shape[1]), fill=0)
+    stored[:n] = features
+    _open(tmp / 'ids.npy', 'w+', np.int64, (capacity,), fill=-1)[:n] = ids_array
+    row_of_id = _open(tmp / 'rows.npy', 'w+', np.int32, (id_capacity,), fill=-1)
+    row_of_id[ids_array] = np.arange(n, dtype=np.int32)
+    np.save(tmp / 'idf.npy', idf)
+    for array in (neighbors, scores, stored, row_of_id):
+        array.flush()
+    _write_meta(tmp, {
+        'count': n,
+        'dim': dim,
+        'top_k': top_k,
+        'nutrition_mean': mean.tolist(),
+        'nutrition_std': std.tolist(),
+    })
+
+    with _write_lock(target):
+        old = target.with_name(target.name + '.old')
+        shutil.rmtree(old, ignore_errors=True)
+        if target.exists():
+            os.replace(target, old)
+        os.replace(tmp, target)
+        shutil.rmtree(old, ignore_errors=True)
+    return n
+
+
+class _Index:
+    """Открытый через memory map индекс одного процесса"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.stamp = os.stat(directory / 'meta.json').st_ino
+        self.rows = _open(directory / 'rows.npy', 'r')
+        self.neighbors = _open(directory / 'neighbors.npy', 'r')
+
+    def similar(self, recipe_id, limit):
+        if recipe_id >= len(self.rows):
+            return None
+        row = int(self.rows[recipe_id])
+        if row < 0:
+            return None
+        return [int(pk) for pk in self.neighbors[row] if pk >= 0][:limit]
+
+
+_index = None
+
+
+def _current_index():
+    """Индекс процесса; переоткрывается, если файлы были перестроены"""
+    global _index
+    directory = index_dir()
+    try:
+        stamp = os.stat(directory / 'meta.json').st_ino
+    except OSError:
+        _index = None
+        return None
+    if _index is None or _index.directory != directory or _index.stamp != stamp:
+        try:
+            _index = _Index(directory)
+        except (OSError, ValueError):
+            _index = None
+    return _index
+
+
+def similar_recipe_ids(recipe_id, limit=4):
+    """id похожих рецептов или None, если индекс не построен или рецепта в нём нет"""
+    if not available():
+        return None
+    index = _current_index()
+    if index is None:
+        return None
+    # Берём с запасом: часть соседей может быть снята с публикации
+    return index.similar(recipe_id, limit * 2)
+
+
+def _remove_neighbor(neighbors, scores, row, recipe_id):
+    """Убрать рецепт из списка соседей строки, сдвинув остальных вверх"""
+    keep = neighbors[row] != recipe_id
+    kept = int(keep.sum())
+    neighbors[row, :kept] = neighbors[row][keep]
+    scores[row, :kept] = scores[row][keep]
+    neighbors[row, kept:] = -1
+    scores[row, kept:] = -np.inf
+
+
+def _insert_neighbor(neighbors, scores, row, recipe_id, score):
+    position = int(np.searchsorted(-scores[row], -score))
+    neighbors[row, position + 1:] = neighbors[row, position:-1].copy()
+    scores[row, position + 1:] = scores[row, position:-1].copy()
+    neighbors[row, position] = recipe_id
+    scores[row, position] = score
+
+
+def _request_rebuild(directory, meta, reason):
+    """Поставить полную перестройку в очередь один раз до её выполнения"""
+    from .tasks import rebuild_similarity
+
+    logger.warning('Индекс похожих рецептов: %s, нужна перестройка', reason)
+    if not meta.get('rebuild_requested'):
+        meta['rebuild_requested'] = True
+        _write_meta(directory, meta)
+        rebuild_similarity.delay()
+
+
+def update_recipes(recipe_ids):
+    """Обновить рецепты в существующем индексе на месте"""
+    from .models import Recipe
+
+    directory = index_dir()
+    recipe_ids = list(recipe_ids)
+    if not available() or not recipe_ids or not (directory / 'meta.json').exists():
+        return
+    recipes = {
+        recipe.pk: recipe
+        for recipe in Recipe.objects.filter(pk__in=recipe_ids).prefetch_related('tags', 'ingredient_items')
+    }
+    with _write_lock(directory):
+        meta = _read_meta(directory)
+        rows = _open(directory / 'rows.npy', 'r+')
+        ids = _open(directory / 'ids.npy', 'r+')
+        features = _open(directory / 'features.npy', 'r+')
+        neighbors = _open(directory / 'neighbors.npy', 'r+')
+        scores = _open(directory / 'scores.npy', 'r+')
+        idf = np.load(directory / 'idf.npy')
+        mean = np.asarray(meta['nutrition_mean'], dtype=np.float32)
+        std = np.asarray(meta['nutrition_std'], dtype=np.float32)
+        count = meta['count']
+        skipped = []
+
+        for recipe_id in recipe_ids:
+            recipe = recipes.get(recipe_id)
+            if recipe_id >= len(rows):
+                # Идентификатор вышел за запас индекса
+                if recipe is not None and recipe.is_published:
+                    skipped.append(recipe_id)
+                continue
+            row = int(rows[recipe_id])
+            # Прежние оценки сходства с рецептом больше не верны
+            for other in np.nonzero((neighbors[:count] == recipe_id).any(axis=1))[0]:
+                _remove_neighbor(neighbors, scores, other, recipe_id)
+            if recipe is None or not recipe.is_published:
+                if row >= 0:
+                    rows[recipe_id] = -1
+                    ids[row] = -1
+                    features[row] = 0
+                continue
+            if row < 0:
+                if count >= len(ids):
+                    skipped.append(recipe_id)
+                    continue
+                row = count
+                count += 1
+                ids[row] = recipe_id
+
+            vector = _vectorize([recipe_tokens(recipe)], [_nutrition(recipe)], idf, mean, std, meta['dim'])[0]
+            features[row] = vector
+            similarity = features[:count] @ vector
+            similarity[row] = -np.inf
+            similarity[ids[:count] < 0] = -np.inf
+
+            # Соседи самого рецепта
+            index, values = _top_k(similarity[None, :], meta['top_k'])
+            neighbors[row] = -1
+            scores[row] = -np.inf
+            valid = np.isfinite(values[0])
+            neighbors[row, :valid.sum()] = ids[index[0][valid]]
+            scores[row, :valid.sum()] = values[0][valid]
+
+            # Рецепт может войти в списки соседей других рецептов
+            for other in np.nonzero(similarity > scores[:count, -1])[0]:
+                _insert_neighbor(neighbors, scores, other, recipe_id, similarity[other])
+            rows[recipe_id] = row
+
+        for array in (rows, ids, features, neighbors, scores):
+            array.flush()
+        if count != meta['count']:
+            meta['count'] = count
+            _write_meta(directory, meta)
+        if skipped:
+            _request_rebuild(directory, meta, f'нет места для рецептов {skipped}')
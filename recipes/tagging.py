@@ -0,0 +1,24 @@
+"""Теги рецепта из строки формы.
+
+Имена разбираются из строки через запятую, приводятся к нижнему регистру и
+очищаются от повторов. Теги находятся и создаются пачкой
+(refdata.get_or_create_tags), а связи рецепта меняются по разнице со
+старым набором: сохранение без изменения тегов не трогает промежуточную
+таблицу, а число запросов не зависит от количества тегов.
+"""
+from . import refdata
+
+
+def parse_names(text):
+    return list(dict.fromkeys(name.strip().lower() for name in (text or '').split(',') if name.strip()))
+
+
+def set_recipe_tags(recipe, text):
+    """Привести теги рецепта к списку из строки text"""
+    tags = refdata.get_or_create_tags(parse_names(text))
+    current = set(recipe.tags.values_list('pk', flat=True))
+    wanted = {tag.pk for tag in tags}
+    if current - wanted:
+        recipe.tags.remove(*(current - wanted))
+    if wanted - current:
+        recipe.tags.add(*(wanted - current))
@@ -0,0 +1,59 @@
+"""Фоновые задачи приложения recipes (выполняются обработчиком jobs)"""
+from django.contrib.auth.models import User
+
+from jobs.queue import task
+from users.models import Follow, Notification
+from . import fanout, feed, images, similarity
+from .models import Comment, Recipe
+
+
+@task(timeout=3600)
+def run_fanout(fanout_id):
+    fanout.run(fanout_id)
+
+
+@task
+def update_similarity(recipe_ids):
+    similarity.update_recipes(recipe_ids)
+
+
+@task(timeout=3600)
+def rebuild_similarity():
+    similarity.build()
+
+
+@task
+def notify_like(user_id, recipe_id):
+    user = User.objects.filter(pk=user_id).first()
+    recipe = Recipe.objects.select_related('author').filter(pk=recipe_id).first()
+    if user and recipe:
+        Notification.create_like_notification(user, recipe)
+
+
+@task
+def notify_comment(comment_id):
+    comment = Comment.objects.select_related('user', 'recipe__author').filter(pk=comment_id).first()
+    if comment:
+        Notification.create_comment_notification(comment.user, comment.recipe, comment)
+
+
+@task
+def follow_author(user_id, author_id):
+    # Подписку могли отменить, пока задача ждала в очереди
+    follow = Follow.objects.select_related('follower', 'following').filter(
+        follower_id=user_id, following_id=author_id
+    ).first()
+    if follow:
+        feed.follow_author(follow.follower, follow.following)
+
+
+@task
+def unfollow_author(user_id, author_id):
+    # Пользователь мог снова подписаться, пока задача ждала в очереди
+    if not Follow.objects.filter(follower_id=user_id, following_id=author_id).exists():
+        feed.unfollow_author(user_id, author_id)
+
+
+@task(timeout=600)
+def generate_image_derivatives(name, kinds, force=False):
+    images.generate(name, kinds, force=force)
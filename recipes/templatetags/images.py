@@ -0,0 +1,29 @@
+from django import template
+from django.forms.utils import flatatt
+from django.utils.html import format_html
+
+register = template.Library()
+
+
+@register.simple_tag
+def picture(variants, sizes=None, **attrs):
+    """Изображение с копиями нужного размера в WebP и JPEG.
+
+    {% picture recipe.card_image alt=recipe.title class="card-img-top recipe-img" %}
+
+    Остальные именованные аргументы становятся атрибутами <img>. Пока копии
+    не созданы, выводится оригинал.
+    """
+    if not variants:
+        return ''
+    attrs.setdefault('alt', '')
+    attrs.setdefault('loading', 'lazy')
+    attrs.setdefault('decoding', 'async')
+    if not variants.ready:
+        return format_html('<img src="{}"{}>', variants.field_file.url, flatatt(attrs))
+    sizes = sizes or variants.sizes
+    return format_html(
+        '<picture><source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}"{}></picture>',
+        variants.webp_srcset, sizes, variants.src, variants.jpeg_srcset, sizes, flatatt(attrs),
+    )
@@ -0,0 +1,11 @@
+from django import template
+
+from recipes.cards import render_cards
+
+register = template.Library()
+
+
+@register.simple_tag
+def recipe_cards(recipes, variant):
+    """Кэшированные карточки рецептов: {% recipe_cards recipes 'recent' as cards %}"""
+    return render_cards(recipes, variant)
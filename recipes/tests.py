@@ -1,3 +1,578 @@
-from django.test import TestCase
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import AnonymousUser, User
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.management import call_command
+from django.db import connection, router, transaction
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from pre_recipe_blog.db import replica
+from users.models import Follow, Notification
+from .models import (Category, Comment, Favorite, FeedEntry, Like, Recipe, RecipeIngredient, RecipeStep,
+                     ShoppingItem, ShoppingList)
+from .pagination import CursorPaginator, MergedCursorPaginator
+from .querybudget import QueryBudgetTestMixin
+from . import ingredients, pagecache, queryplans, refdata, tagging
+
+
+class HotPagesTestCase(TestCase):
+    """Небольшой набор данных, на котором открываются все горячие страницы"""
+
+    @classmethod
+    def setUpTestData(cls):
+        # Снимок тегов мог остаться от откаченных данных предыдущего класса
+        refdata.bump_version()
+        cls.users = [User.objects.create_user(f'cook{i}', password='password') for i in range(6)]
+        categories = [
+            Category.objects.create(name='Супы', slug='soups'),
+            Category.objects.create(name='Выпечка', slug='bakery'),
+        ]
+        cls.recipes = []
+        for i in range(12):
+            recipe = Recipe.objects.create(
+                title=f'Суп с грибами {i}',
+                slug=f'soup-{i}',
+                author=cls.users[i % len(cls.users)],
+                category=categories[i % len(categories)],
+                description='Густой суп',
+                ingredients='500 г грибов\n1 луковица\n2 картофелины',
+                instructions='Сварить',
+                cooking_time=40,
+                difficulty='easy',
+            )
+            tagging.set_recipe_tags(recipe, 'soup, mushrooms, lunch')
+            for number in range(1, 4):
+                RecipeStep.objects.create(recipe=recipe, step_number=number, description=f'Шаг {number}')
+            cls.recipes.append(recipe)
+
+        cls.recipe = cls.recipes[0]
+        for user in cls.users[1:]:
+            Like.objects.create(user=user, recipe=cls.recipe)
+            root = Comment.objects.create(recipe=cls.recipe, user=user, content='Отличный рецепт')
+            for replier in cls.users[:2]:
+                Comment.objects.create(recipe=cls.recipe, user=replier, parent=root, content='Спасибо')
+
+        reader = cls.users[1]
+        for recipe in cls.recipes[:8]:
+            Favorite.objects.create(user=reader, recipe=recipe)
+            FeedEntry.objects.create(user=reader, recipe=recipe, author=recipe.author, created_at=recipe.created_at)
+        for author in cls.users[2:]:
+            Follow.objects.create(follower=reader, following=author)
+            Notification.objects.create(recipient=reader, sender=author, notification_type='follow',
+                                        title='Новый подписчик', message=author.username)
+        shopping_list = ShoppingList.objects.create(user=reader)
+        for i in range(6):
+            ShoppingItem.objects.create(shopping_list=shopping_list, name=f'Продукт {i}', quantity='100 г',
+                                        is_checked=i % 2 == 0)
+
+    def setUp(self):
+        # Анонимные страницы иначе могут прийти из pagecache без единого запроса
+        cache.clear()
+
+
+@override_settings(QUERY_BUDGET_ACTION='raise')
+class QueryBudgetTests(QueryBudgetTestMixin, HotPagesTestCase):
+    """Горячие страницы укладываются в QUERY_BUDGETS и не делают N+1 на списках"""
+
+    def assertHotPage(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertWithinQueryBudget(response)
+        self.assertNoRepeatedQueries(response)
+        return response
+
+    def test_home(self):
+        self.assertHotPage(reverse('home'))
+
+    def test_home_logged_in(self):
+        self.client.force_login(self.users[1])
+        self.assertHotPage(reverse('home'))
+
+    def test_recipe_detail(self):
+        self.assertHotPage(reverse('recipe-detail', args=[self.recipe.slug]))
+
+    def test_recipe_detail_logged_in(self):
+        self.client.force_login(self.users[1])
+        self.assertHotPage(reverse('recipe-detail', args=[self.recipe.slug]))
+
+    def test_search_recipes(self):
+        response = self.assertHotPage(reverse('search-recipes') + '?q=суп')
+        self.assertTrue(response.context['recipes'])
+
+    def test_search_recipes_without_query(self):
+        self.assertHotPage(reverse('search-recipes'))
+
+
+class QueryPlanTests(HotPagesTestCase):
+    """Запросы горячих страниц идут по индексам: без полных просмотров и сортировок во временном B-дереве"""
+
+    def test_hot_pages_use_indexes(self):
+        self.client.force_login(self.users[1])
+        paths = queryplans.hot_paths()
+        self.assertIn(reverse('feed'), paths)
+        for path in paths:
+            with self.subTest(path=path):
+                response, planned = queryplans.check(self.client, path)
+                self.assertEqual(response.status_code, 200)
+                self.assertTrue(planned)
+                problems = [
+                    f'{", ".join(query.problems)}: {query.sql}' for query in planned if query.problems
+                ]
+                self.assertEqual(problems, [])
+
+    def test_plan_problems_detects_scan_and_temp_sort(self):
+        from django.db import connection
+
+        tables = set(connection.introspection.table_names())
+        sql = 'SELECT * FROM recipes_recipe ORDER BY title LIMIT 5'
+        problems = queryplans.plan_problems(queryplans.explain(connection, sql), tables, sql)
+        self.assertEqual(problems, ['полный просмотр recipes_recipe', 'сортировка recipes_recipe во временном B-дереве'])
+
+
+class PaginationTests(TestCase):
+    """Keyset-пагинация: курсоры, равные created_at, подсчёт и откат к первой странице"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user('paginator')
+        cls.recipes = [
+            Recipe.objects.create(
+                title=f'Рецепт {i}', slug=f'page-{i}', author=cls.author, description='d',
+                ingredients='соль', instructions='i', cooking_time=10, difficulty='easy',
+            )
+            for i in range(7)
+        ]
+        # Пары с одинаковым created_at: порядок внутри пары задаёт id
+        base = timezone.now()
+        for i, recipe in enumerate(cls.recipes):
+            Recipe.objects.filter(pk=recipe.pk).update(created_at=base + timedelta(minutes=i // 2))
+        cls.expected = list(
+            Recipe.objects.order_by('-created_at', '-id').values_list('pk', flat=True)
+        )
+
+    def paginator(self, **kwargs):
+        return CursorPaginator(Recipe.objects.filter(author=self.author), 3, **kwargs)
+
+    def walk(self, page, cursor_attr):
+        pages = [page]
+        while getattr(page, cursor_attr):
+            page = self.paginator(with_count=True).get_page(getattr(page, cursor_attr))
+            pages.append(page)
+        return pages
+
+    def test_next_cursors_walk_all_objects_in_order(self):
+        pages = self.walk(self.paginator().get_page(), 'next_cursor')
+        self.assertEqual([[recipe.pk for recipe in page] for page in pages],
+                         [self.expected[:3], self.expected[3:6], self.expected[6:]])
+        self.assertFalse(pages[0].has_previous())
+        self.assertFalse(pages[-1].has_next())
+
+    def test_previous_cursors_walk_back(self):
+        pages = self.walk(self.paginator().get_page(), 'next_cursor')
+        back = self.paginator().get_page(pages[-1].previous_cursor)
+        self.assertEqual([recipe.pk for recipe in back], self.expected[3:6])
+        back = self.paginator().get_page(back.previous_cursor)
+        self.assertEqual([recipe.pk for recipe in back], self.expected[:3])
+        self.assertFalse(back.has_previous())
+        self.assertTrue(back.has_next())
+
+    def test_ties_on_created_at_are_ordered_by_id(self):
+        Recipe.objects.filter(author=self.author).update(created_at=timezone.now())
+        ids = sorted((recipe.pk for recipe in self.recipes), reverse=True)
+        pages = self.walk(self.paginator().get_page(), 'next_cursor')
+        self.assertEqual([recipe.pk for page in pages for recipe in page], ids)
+
+    def test_with_count_numbers_pages(self):
+        paginator = self.paginator(with_count=True)
+        self.assertEqual((paginator.count, paginator.num_pages), (7, 3))
+        self.assertEqual([page.number for page in self.walk(paginator.get_page(), 'next_cursor')], [1, 2, 3])
+        self.assertIsNone(self.paginator().count)
+        self.assertIsNone(self.paginator().num_pages)
+
+    def test_last_cursor_reads_from_the_end(self):
+        first = self.paginator(with_count=True).get_page()
+        last = self.paginator(with_count=True).get_page(first.last_cursor)
+        self.assertEqual([recipe.pk for recipe in last], self.expected[-3:])
+        self.assertEqual(last.number, 3)
+        self.assertFalse(last.has_next())
+        self.assertTrue(last.has_previous())
+
+    def test_invalid_cursor_falls_back_to_first_page(self):
+        paginator = self.paginator()
+        wrong_length = paginator.encode_cursor([1], 'n', 2)
+        bad_direction = paginator.encode_cursor([str(timezone.now()), 1], 'x', 2)
+        bad_value = paginator.encode_cursor(['не дата', 1], 'n', 2)
+        for cursor in ('мусор', 'e30', wrong_length, bad_direction, bad_value):
+            with self.subTest(cursor=cursor):
+                page = paginator.get_page(cursor)
+                self.assertEqual([recipe.pk for recipe in page], self.expected[:3])
+                self.assertEqual(page.number, 1)
+                self.assertFalse(page.has_previous())
+
+    def test_merged_streams_walk_both_ways(self):
+        half = [recipe.pk for recipe in self.recipes[::2]]
+        paginator = MergedCursorPaginator([
+            (Recipe.objects.filter(pk__in=half), None),
+            (Recipe.objects.filter(author=self.author).exclude(pk__in=half), None),
+        ], 3)
+        pages = [paginator.get_page()]
+        while pages[-1].next_cursor:
+            pages.append(paginator.get_page(pages[-1].next_cursor))
+        self.assertEqual(sorted(recipe.pk for page in pages for recipe in page), sorted(self.expected))
+        keys = [(recipe.created_at, -recipe._cursor_key[1], recipe.pk) for page in pages for recipe in page]
+        self.assertEqual(keys, sorted(keys, reverse=True))
+        back = paginator.get_page(pages[-1].previous_cursor)
+        self.assertEqual([recipe.pk for recipe in back], [recipe.pk for recipe in pages[-2]])
+
+
+class IngredientParsingTests(SimpleTestCase):
+    def test_parse_line(self):
+        cases = {
+            '200 г муки': (Decimal('200'), 'g', 'муки'),
+            '1,5 кг картофеля': (Decimal('1.5'), 'kg', 'картофеля'),
+            '2 ст. л. сахара': (Decimal('2'), 'tbsp', 'сахара'),
+            '½ стакана молока': (Decimal('0.5'), 'cup', 'молока'),
+            '1 1/2 cups flour': (Decimal('1.5'), 'cup', 'flour'),
+            '2-3 зубчика чеснока': (Decimal('2'), 'clove', 'чеснока'),
+            '- Мука — 300 г': (Decimal('300'), 'g', 'мука'),
+            'Яйца 3 шт': (Decimal('3'), 'pcs', 'яйца'),
+            '3 eggs': (Decimal('3'), '', 'eggs'),
+            'Соль по вкусу': (None, '', 'соль'),
+        }
+        for line, expected in cases.items():
+            with self.subTest(line=line):
+                item = ingredients.parse_line(line)
+                self.assertEqual((item.quantity, item.unit, item.name), expected)
+                self.assertEqual(item.raw, line)
+
+    def test_normalize_name(self):
+        self.assertEqual(ingredients.normalize_name('  Зелёный  лук (свежий), по желанию'), 'зеленый лук свежий')
+
+    def test_parse_quantity_accepts_only_quantity_and_unit(self):
+        self.assertEqual(ingredients.parse_quantity('1,5 кг'), (Decimal('1.5'), 'kg'))
+        self.assertEqual(ingredients.parse_quantity('2 ст. л.'), (Decimal('2'), 'tbsp'))
+        self.assertEqual(ingredients.parse_quantity('3'), (Decimal('3'), ''))
+        self.assertIsNone(ingredients.parse_quantity('200 г муки'))
+        self.assertIsNone(ingredients.parse_quantity('щепотка'))
+
+    def test_to_base_and_format(self):
+        self.assertEqual(ingredients.to_base(Decimal('1.5'), 'kg'), (Decimal('1500'), 'g'))
+        self.assertEqual(ingredients.to_base(Decimal('2'), 'tbsp'), (Decimal('6'), 'tsp'))
+        self.assertEqual(ingredients.to_base(Decimal('2'), 'pcs'), (Decimal('2'), 'pcs'))
+        self.assertEqual(ingredients.to_base(None, 'l'), (None, 'ml'))
+        self.assertEqual(ingredients.format_quantity(Decimal('1.500'), 'kg'), '1.5 кг')
+        self.assertEqual(ingredients.format_quantity(None, 'pinch'), 'щепотка')
+
+
+class IngredientSyncTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user('ingredients')
+
+    def create_recipe(self, slug, text):
+        return Recipe.objects.create(
+            title=slug, slug=slug, author=self.author, description='d', ingredients=text,
+            instructions='i', cooking_time=10, difficulty='easy',
+        )
+
+    def rows(self, recipe):
+        return list(RecipeIngredient.objects.filter(recipe=recipe).order_by('position').values_list('pk', 'name'))
+
+    def test_save_parses_ingredients(self):
+        recipe = self.create_recipe('borsch', '300 г свеклы\n\n2 картофелины\n')
+        self.assertEqual([name for _, name in self.rows(recipe)], ['свеклы', 'картофелины'])
+
+    def test_unchanged_lines_are_not_rewritten(self):
+        recipe = self.create_recipe('borsch', '300 г свеклы\n2 картофелины')
+        before = self.rows(recipe)
+        # Пустые строки и пробелы по краям не меняют список
+        recipe.ingredients = '  300 г свеклы\n\n2 картофелины  \n'
+        with self.assertNumQueries(1):
+            self.assertFalse(ingredients.sync_recipe(recipe))
+        self.assertEqual(self.rows(recipe), before)
+
+    def test_changed_lines_are_rewritten(self):
+        recipe = self.create_recipe('borsch', '300 г свеклы\n2 картофелины')
+        before = self.rows(recipe)
+        recipe.ingredients = '300 г свеклы\n1 морковь'
+        self.assertTrue(ingredients.sync_recipe(recipe))
+        after = self.rows(recipe)
+        self.assertEqual([name for _, name in after], ['свеклы', 'морковь'])
+        self.assertFalse({pk for pk, _ in before} & {pk for pk, _ in after})
+
+    def test_backfill_resumes_after_interruption(self):
+        recipes = [self.create_recipe(f'soup-{i}', f'{i + 1} л воды\nсоль') for i in range(5)]
+        RecipeIngredient.objects.all().delete()
+        real_build_rows = ingredients.build_rows
+        built = []
+
+        def failing_build_rows(recipe, parsed):
+            if len(built) == 3:
+                raise RuntimeError('прервано')
+            built.append(recipe.pk)
+            return real_build_rows(recipe, parsed)
+
+        with mock.patch('recipes.management.commands.backfill_ingredients.build_rows', failing_build_rows):
+            with self.assertRaises(RuntimeError):
+                call_command('backfill_ingredients', chunk_size=2, stdout=StringIO())
+        # Первая порция записана, вторая откатилась целиком
+        self.assertEqual(
+            set(RecipeIngredient.objects.values_list('recipe_id', flat=True)), {recipes[0].pk, recipes[1].pk}
+        )
+
+        call_command('backfill_ingredients', chunk_size=2, stdout=StringIO())
+        for recipe in recipes:
+            self.assertEqual(len(self.rows(recipe)), 2)
+
+    def test_backfill_start_after_and_force(self):
+        recipes = [self.create_recipe(f'soup-{i}', f'{i + 1} л воды') for i in range(3)]
+        RecipeIngredient.objects.all().delete()
+        call_command('backfill_ingredients', start_after=recipes[0].pk, stdout=StringIO())
+        self.assertEqual(
+            set(RecipeIngredient.objects.values_list('recipe_id', flat=True)), {recipes[1].pk, recipes[2].pk}
+        )
+        old = set(RecipeIngredient.objects.values_list('pk', flat=True))
+        call_command('backfill_ingredients', force=True, stdout=StringIO())
+        self.assertEqual(RecipeIngredient.objects.count(), 3)
+        self.assertFalse(old & set(RecipeIngredient.objects.values_list('pk', flat=True)))
+
+
+class PageCacheTests(TestCase):
+    """Кэш анонимных страниц: HIT/MISS/STALE, сброс после коммита и исключения"""
+
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+        self.renders = 0
+
+    def view(self, request):
+        self.renders += 1
+        pagecache.tag(request, 'recipe:1')
+        return HttpResponse(f'render {self.renders}')
+
+    def get(self, view=None, user=None, **cookies):
+        request = self.factory.get('/cached/', {'page': 2})
+        request.user = user or AnonymousUser()
+        request.COOKIES.update(cookies)
+        return pagecache.cache_anonymous(view or self.view)(request)
+
+    def test_miss_then_hit(self):
+        self.assertEqual(self.get()['X-Page-Cache'], 'MISS')
+        response = self.get()
+        self.assertEqual(response['X-Page-Cache'], 'HIT')
+        self.assertEqual(response.content, b'render 1')
+        self.assertEqual(self.renders, 1)
+
+    def test_purge_makes_page_stale_and_next_request_rerenders(self):
+        self.get()
+        pagecache.purge('recipe:2')
+        self.assertEqual(self.get()['X-Page-Cache'], 'HIT')
+        pagecache.purge('recipe:1')
+        response = self.get()
+        self.assertEqual((response['X-Page-Cache'], response.content), ('MISS', b'render 2'))
+        self.assertEqual(self.get()['X-Page-Cache'], 'HIT')
+
+    def test_stale_page_is_served_while_another_request_rerenders(self):
+        self.get()
+        pagecache.purge('recipe:1')
+        # Блокировку уже взял другой запрос
+        key = pagecache._page_key(self.factory.get('/cached/', {'page': 2}))
+        self.assertTrue(cache.add(f'{key}:lock', 1))
+        response = self.get()
+        self.assertEqual((response['X-Page-Cache'], response.content), ('STALE', b'render 1'))
+        self.assertEqual(self.renders, 1)
+
+    def test_rerender_releases_lock(self):
+        self.get()
+        pagecache.purge('recipe:1')
+        self.get()
+        pagecache.purge('recipe:1')
+        self.assertEqual(self.get()['X-Page-Cache'], 'MISS')
+        self.assertEqual(self.renders, 3)
+
+    def test_purge_on_commit_waits_for_commit(self):
+        self.get()
+        with self.captureOnCommitCallbacks(execute=True):
+            pagecache.purge_on_commit('recipe:1')
+            # До коммита сброса ещё нет
+            self.assertEqual(self.get()['X-Page-Cache'], 'HIT')
+        self.assertEqual(self.get()['X-Page-Cache'], 'MISS')
+
+    def test_rolled_back_transaction_does_not_purge(self):
+        self.get()
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with self.assertRaises(ValueError), transaction.atomic():
+                pagecache.purge_on_commit('recipe:1')
+                raise ValueError
+        self.assertEqual(callbacks, [])
+        self.assertEqual(self.get()['X-Page-Cache'], 'HIT')
+
+    def test_authenticated_requests_bypass_cache(self):
+        user = User.objects.create_user('cached')
+        self.assertFalse(self.get(user=user).has_header('X-Page-Cache'))
+        self.get()
+        self.assertEqual(self.get(user=user).content, b'render 3')
+
+    def test_csrf_token_response_is_not_cached(self):
+        def view(request):
+            get_token(request)
+            return self.view(request)
+
+        self.assertFalse(self.get(view).has_header('X-Page-Cache'))
+        self.assertEqual(self.get()['X-Page-Cache'], 'MISS')
+
+    def test_messages_are_not_cached(self):
+        self.assertFalse(self.get(**{pagecache.MESSAGES_COOKIE: 'x'}).has_header('X-Page-Cache'))
+
+        def view(request):
+            request._messages = mock.Mock(used=True)
+            return self.view(request)
+
+        self.assertFalse(self.get(view).has_header('X-Page-Cache'))
+        self.assertEqual(self.get()['X-Page-Cache'], 'MISS')
+
+
+@mock.patch('pre_recipe_blog.db.replica.replica_configured', return_value=True)
+class ReplicaRoutingTests(TestCase):
+    """Маршрутизация чтения: GET на реплику, после записи и в «липкой» сессии — на основную базу"""
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.reads = []
+
+    def request(self, method='get', session=None):
+        request = getattr(self.factory, method)('/')
+        request.user = AnonymousUser()
+        request.session = SessionStore()
+        request.session.update(session or {})
+        return request
+
+    def run_view(self, request, view):
+        middleware = replica.ReplicaRoutingMiddleware(replica.read_from_replica(view))
+        return middleware(request)
+
+    def read(self, request):
+        self.reads.append(router.db_for_read(Recipe))
+        return HttpResponse()
+
+    def test_get_reads_from_replica(self, configured):
+        request = self.request()
+        self.run_view(request, self.read)
+        self.assertEqual(self.reads, [replica.REPLICA])
+        self.assertNotIn(replica.STICKY_SESSION_KEY, request.session)
+
+    def test_write_sends_rest_of_request_to_primary(self, configured):
+        def view(request):
+            self.read(request)
+            Category.objects.create(name='Салаты', slug='salads')
+            return self.read(request)
+
+        request = self.request()
+        self.run_view(request, view)
+        self.assertEqual(self.reads, [replica.REPLICA, replica.PRIMARY])
+        self.assertIs(request.session[replica.STICKY_SESSION_KEY], True)
+
+    def test_sticky_session_reads_from_primary(self, configured):
+        self.run_view(self.request(session={replica.STICKY_SESSION_KEY: True}), self.read)
+        self.assertEqual(self.reads, [replica.PRIMARY])
+
+    def test_unsafe_method_reads_from_primary_and_sticks(self, configured):
+        request = self.request('post')
+        self.run_view(request, self.read)
+        self.assertEqual(self.reads, [replica.PRIMARY])
+        self.assertIs(request.session[replica.STICKY_SESSION_KEY], True)
+
+    def test_undecorated_view_reads_from_primary(self, configured):
+        replica.ReplicaRoutingMiddleware(self.read)(self.request())
+        self.assertEqual(self.reads, [replica.PRIMARY])
+
+    def test_replica_read_at_reports_snapshot_time(self, configured):
+        snapshots = []
+
+        def view(request):
+            snapshots.append(replica.replica_read_at())
+            self.read(request)
+            snapshots.append(replica.replica_read_at())
+            return HttpResponse()
+
+        with mock.patch('pre_recipe_blog.db.replica.snapshot_time', return_value=1234.5):
+            self.run_view(self.request(), view)
+        self.assertEqual(snapshots, [None, 1234.5])
+
+    def test_middleware_is_disabled_without_replica(self, configured):
+        configured.return_value = False
+        with self.assertRaises(MiddlewareNotUsed):
+            replica.ReplicaRoutingMiddleware(self.read)
+
+
+class RecipeTagsTests(TestCase):
+    """set_recipe_tags меняет только изменившиеся связи за постоянное число запросов"""
+
+    @classmethod
+    def setUpTestData(cls):
+        refdata.bump_version()
+        cls.author = User.objects.create_user('tagger')
+
+    def create_recipe(self, slug):
+        return Recipe.objects.create(
+            title=slug, slug=slug, author=self.author, description='d', ingredients='соль',
+            instructions='i', cooking_time=10, difficulty='easy',
+        )
+
+    def through_rows(self, recipe):
+        return dict(
+            Recipe.tags.through.objects.filter(recipe=recipe).values_list('tag__name', 'pk')
+        )
+
+    def set_tags(self, recipe, text):
+        with CaptureQueriesContext(connection) as queries:
+            tagging.set_recipe_tags(recipe, text)
+        return [query['sql'] for query in queries.captured_queries]
+
+    def test_parse_names(self):
+        self.assertEqual(tagging.parse_names(' Soup, soup ,, Lunch,'), ['soup', 'lunch'])
+        self.assertEqual(tagging.parse_names(None), [])
+
+    def test_unchanged_tags_write_nothing(self):
+        recipe = self.create_recipe('unchanged')
+        tagging.set_recipe_tags(recipe, 'soup, lunch')
+        before = self.through_rows(recipe)
+        statements = self.set_tags(recipe, 'Lunch, soup')
+        self.assertEqual([sql for sql in statements if not sql.lstrip().upper().startswith('SELECT')], [])
+        self.assertEqual(self.through_rows(recipe), before)
+
+    def test_only_changed_through_rows_are_touched(self):
+        recipe = self.create_recipe('changed')
+        tagging.set_recipe_tags(recipe, 'soup, lunch, dinner')
+        before = self.through_rows(recipe)
+        tagging.set_recipe_tags(recipe, 'soup, dinner, vegan')
+        after = self.through_rows(recipe)
+        self.assertEqual(set(after), {'soup', 'dinner', 'vegan'})
+        self.assertEqual((after['soup'], after['dinner']), (before['soup'], before['dinner']))
+        self.assertNotIn(after['vegan'], before.values())
+
+    def test_query_count_does_not_depend_on_tag_count(self):
+        names = [f'tag{i}' for i in range(10)]
+        counts = []
+        for number, slug in ((2, 'few'), (10, 'many')):
+            recipe = self.create_recipe(slug)
+            counts.append(len(self.set_tags(recipe, ', '.join(names[:number]))))
+        self.assertEqual(counts[0], counts[1])
+
+        # Существующие теги и замена половины набора
+        counts = []
+        for number, slug in ((2, 'few-existing'), (10, 'many-existing')):
+            recipe = self.create_recipe(slug)
+            tagging.set_recipe_tags(recipe, ', '.join(names[:number]))
+            counts.append(len(self.set_tags(recipe, ', '.join(names[number // 2:number] + [f'fresh-{number}']))))
+        self.assertEqual(counts[0], counts[1])
@@ -7,6 +7,7 @@ urlpatterns = [
     # Home and basic views
     path('', views.home, name='home'),
     path('search/', views.search_recipes, name='search-recipes'),
+    path('feed/', views.feed_view, name='feed'),
     
     # Recipe CRUD
     path('recipe/new/', views.create_recipe, name='create-recipe'),
@@ -28,6 +29,7 @@ urlpatterns = [
     # Comments
     path('recipe/<slug:slug>/comment/', views.add_comment, name='add-comment'),
     path('recipe/<slug:slug>/comment/<int:comment_id>/reply/', views.reply_comment, name='reply-comment'),
+    path('recipe/<slug:slug>/comment/<int:comment_id>/replies/', views.comment_replies, name='comment-replies'),
     path('recipe/<slug:slug>/comment/<int:comment_id>/delete/', views.delete_comment, name='delete-comment'),
     
     # Ratings
@@ -41,6 +43,7 @@ urlpatterns = [
     path('cookbooks/<int:cookbook_id>/delete/', views.cookbook_delete, name='cookbook-delete'),
     path('cookbooks/<int:cookbook_id>/add/<int:recipe_id>/', views.cookbook_add_recipe, name='cookbook-add-recipe'),
     path('cookbooks/<int:cookbook_id>/remove/<int:recipe_id>/', views.cookbook_remove_recipe, name='cookbook-remove-recipe'),
+    path('cookbooks/<int:cookbook_id>/shopping-list/', views.add_cookbook_to_shopping_list, name='cookbook-add-to-shopping-list'),
     
     # Shopping List
     path('shopping-list/', views.shopping_list, name='shopping-list'),
@@ -1,38 +1,59 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
+from django.db import transaction
 from django.db.models import Q
 from django.core.paginator import Paginator
 from django.http import JsonResponse
-from .models import (Recipe, Category, Like, Comment, Tag, Favorite, 
+from .models import (Recipe, Category, Like, Comment, Favorite, 
                      Rating, RecipeStep, Cookbook, ShoppingList, ShoppingItem)
 from .forms import (RecipeForm, CommentForm, ReplyForm, RatingForm, 
                     RecipeStepFormSet, CookbookForm, ShoppingItemForm,
                     AddRecipeToShoppingListForm)
+from .pagination import CursorPaginator, MergedCursorPaginator
+from . import collaborative, comment_tree, fanout, feed, ingredients, pagecache, refdata, search, shopping, similarity, tagging, tasks
 from django.contrib.auth.models import User
-from users.models import Follow, Notification
+from users.models import Follow
+from pre_recipe_blog.db.replica import read_from_replica
 
 
+@pagecache.cache_anonymous
+@read_from_replica
 def home(request):
-    recipes_list = Recipe.objects.filter(is_published=True).order_by('-created_at')
-    paginator = Paginator(recipes_list, 6)
-    page_number = request.GET.get('page')
-    recipes = paginator.get_page(page_number)
-    
-    categories = Category.objects.all()
-    featured = Recipe.objects.filter(is_published=True).order_by('-created_at')[:3]
+    recipes_list = Recipe.objects.filter(is_published=True).select_related('author', 'category')
+    paginator = CursorPaginator(recipes_list, 6)
+    recipes = paginator.get_page(request.GET.get('cursor'))
+
+    featured = Recipe.objects.filter(is_published=True).select_related('author', 'category').order_by('-created_at')[:3]
+
+    # «Вам может понравиться» — предрассчитанные рекомендации (build_recommendations)
+    recommended = []
+    if request.user.is_authenticated:
+        recommended = collaborative.recommended_for_user(request.user)
 
     context = {
         'recipes': recipes,
-        'categories': categories,
         'featured_recipes': featured,
+        'recommended_recipes': recommended,
     }
+    pagecache.tag(request, 'recipes', 'categories')
+    pagecache.tag_recipes(request, list(recipes) + list(featured))
     return render(request, 'recipes/home.html', context)
 
 
+def _int_param(request, name):
+    try:
+        return int(request.GET.get(name, ''))
+    except ValueError:
+        return None
+
+
+@pagecache.cache_anonymous
+@read_from_replica
 def recipe_detail(request, slug):
-    recipe = get_object_or_404(Recipe, slug=slug)
-    comments = recipe.comments.filter(parent__isnull=True)  # Только корневые комментарии
+    recipe = get_object_or_404(Recipe.objects.select_related('author__profile', 'category'), slug=slug)
+    # Страница корневых комментариев вместе с первыми ответами — одним запросом
+    comments, comments_next = comment_tree.recipe_comments(recipe, before=_int_param(request, 'comments_before'))
     steps = recipe.steps.all()
 
     # Проверяем, лайкнул ли текущий пользователь рецепт
@@ -44,11 +65,20 @@ def recipe_detail(request, slug):
         user_favorited = Favorite.objects.filter(user=request.user, recipe=recipe).exists()
         user_rating = Rating.objects.filter(user=request.user, recipe=recipe).first()
 
-    # Рекомендации (рецепты из той же категории)
-    recommended = Recipe.objects.filter(
-        category=recipe.category,
-        is_published=True
-    ).exclude(id=recipe.id)[:4]
+    # Рекомендации: похожие по содержанию рецепты вперемешку с теми, что нравятся
+    # тем же пользователям; если ни индекс, ни соседи ещё не построены — рецепты из той же категории
+    similar_ids = collaborative.blend(
+        similarity.similar_recipe_ids(recipe.id, 4) or [],
+        collaborative.similar_recipe_ids(recipe.id, 8),
+    )
+    if similar_ids:
+        found = Recipe.objects.filter(id__in=similar_ids, is_published=True).select_related('category').order_by().in_bulk()
+        recommended = [found[pk] for pk in similar_ids if pk in found][:4]
+    else:
+        recommended = Recipe.objects.filter(
+            category=recipe.category,
+            is_published=True
+        ).select_related('category').exclude(id=recipe.id)[:4]
 
     if request.method == 'POST' and request.user.is_authenticated:
         comment_form = CommentForm(request.POST)
@@ -65,9 +95,11 @@ def recipe_detail(request, slug):
                     comment.parent = parent_comment
                 except Comment.DoesNotExist:
                     pass
-            comment.save()
+            with transaction.atomic():
+                comment.save()
+                recipe.bump_counters(comments_count=1)
             # Создаем уведомление о комментарии
-            Notification.create_comment_notification(request.user, recipe, comment)
+            tasks.notify_comment.delay(comment.pk)
             messages.success(request, 'Комментарий успешно добавлен!')
             return redirect('recipe-detail', slug=recipe.slug)
     else:
@@ -76,6 +108,7 @@ def recipe_detail(request, slug):
     context = {
         'recipe': recipe,
         'comments': comments,
+        'comments_next': comments_next,
         'comment_form': comment_form,
         'user_liked': user_liked,
         'user_favorited': user_favorited,
@@ -83,25 +116,39 @@ def recipe_detail(request, slug):
         'recommended': recommended,
         'steps': steps,
     }
+    pagecache.tag_recipes(request, [recipe, *recommended])
     return render(request, 'recipes/recipe_detail.html', context)
 
 
+@pagecache.cache_anonymous
+@read_from_replica
 def category_posts(request, slug):
-    category = get_object_or_404(Category, slug=slug)
-    recipes_list = Recipe.objects.filter(category=category, is_published=True).order_by('-created_at')
-    paginator = Paginator(recipes_list, 6)
-    page_number = request.GET.get('page')
-    recipes = paginator.get_page(page_number)
-    categories = Category.objects.all()
+    category = refdata.category_by_slug(slug) or get_object_or_404(Category, slug=slug)
+    recipes_list = Recipe.objects.filter(category=category, is_published=True).select_related('author', 'category')
+    paginator = CursorPaginator(recipes_list, 6)
+    recipes = paginator.get_page(request.GET.get('cursor'))
 
     context = {
         'category': category,
         'recipes': recipes,
-        'categories': categories,
     }
+    pagecache.tag(request, f'category:{category.pk}')
+    pagecache.tag_recipes(request, recipes)
     return render(request, 'recipes/category_posts.html', context)
 
 
+@login_required
+def feed_view(request):
+    """Лента рецептов от авторов, на которых подписан пользователь"""
+    paginator = MergedCursorPaginator(feed.feed_streams(request.user), 9)
+    recipes = paginator.get_page(request.GET.get('cursor'))
+
+    context = {
+        'recipes': recipes,
+    }
+    return render(request, 'recipes/feed.html', context)
+
+
 @login_required
 def create_recipe(request):
     if request.method == 'POST':
@@ -113,20 +160,15 @@ def create_recipe(request):
             recipe.save()
             
             # Сохранение тегов
-            tags_str = form.cleaned_data.get('tags', '')
-            if tags_str:
-                tag_names = [tag.strip() for tag in tags_str.split(',') if tag.strip()]
-                for tag_name in tag_names:
-                    tag, created = Tag.objects.get_or_create(name=tag_name.lower())
-                    recipe.tags.add(tag)
+            tagging.set_recipe_tags(recipe, form.cleaned_data.get('tags', ''))
             
             # Сохранение шагов
             if formset.is_valid():
                 formset.instance = recipe
                 formset.save()
             
-            # Создаем уведомления для подписчиков
-            Notification.create_recipe_notification(recipe)
+            # Уведомления и ленты подписчиков заполняются в фоне (recipes.fanout)
+            fanout.schedule(recipe)
             
             messages.success(request, 'Рецепт успешно создан!')
             return redirect('recipe-detail', slug=recipe.slug)
@@ -153,14 +195,8 @@ def update_recipe(request, slug):
         if form.is_valid():
             recipe = form.save(commit=False)
             
-            # Обновление тегов
-            recipe.tags.clear()
-            tags_str = form.cleaned_data.get('tags', '')
-            if tags_str:
-                tag_names = [tag.strip() for tag in tags_str.split(',') if tag.strip()]
-                for tag_name in tag_names:
-                    tag, created = Tag.objects.get_or_create(name=tag_name.lower())
-                    recipe.tags.add(tag)
+            # Обновление тегов: меняются только добавленные и удалённые связи
+            tagging.set_recipe_tags(recipe, form.cleaned_data.get('tags', ''))
             
             recipe.save()
             
@@ -201,21 +237,24 @@ def delete_recipe(request, slug):
 def like_recipe(request, slug):
     recipe = get_object_or_404(Recipe, slug=slug)
 
-    # Проверяем, есть ли уже лайк от пользователя
-    like, created = Like.objects.get_or_create(user=request.user, recipe=recipe)
+    with transaction.atomic():
+        # Проверяем, есть ли уже лайк от пользователя
+        like, created = Like.objects.get_or_create(user=request.user, recipe=recipe)
 
-    if not created:
-        # Если лайк уже был, удаляем его (переключение)
-        like.delete()
-    else:
+        if not created:
+            # Если лайк уже был, удаляем его (переключение)
+            like.delete()
+        recipe.bump_counters(likes_count=1 if created else -1)
+
+    if created:
         # Создаем уведомление о лайке
-        Notification.create_like_notification(request.user, recipe)
+        tasks.notify_like.delay(request.user.pk, recipe.pk)
 
     # Если это AJAX запрос, возвращаем JSON
     if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
         return JsonResponse({
             'liked': created,
-            'count': recipe.likes.count()
+            'count': recipe.likes_count
         })
 
     return redirect('recipe-detail', slug=slug)
@@ -226,10 +265,13 @@ def favorite_recipe(request, slug):
     """Добавить/удалить рецепт из избранного"""
     recipe = get_object_or_404(Recipe, slug=slug)
     
-    favorite, created = Favorite.objects.get_or_create(user=request.user, recipe=recipe)
+    with transaction.atomic():
+        favorite, created = Favorite.objects.get_or_create(user=request.user, recipe=recipe)
+        if not created:
+            favorite.delete()
+        recipe.bump_counters(favorites_count=1 if created else -1)
     
     if not created:
-        favorite.delete()
         message = 'Рецепт удалён из избранного'
     else:
         message = 'Рецепт добавлен в избранное'
@@ -238,7 +280,7 @@ def favorite_recipe(request, slug):
     if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
         return JsonResponse({
             'favorited': created,
-            'count': recipe.favorites.count(),
+            'count': recipe.favorites_count,
             'message': message
         })
     
@@ -249,10 +291,10 @@ def favorite_recipe(request, slug):
 @login_required
 def favorites_list(request):
     """Список избранных рецептов пользователя"""
-    favorites_list = Favorite.objects.filter(user=request.user).select_related('recipe')
-    paginator = Paginator(favorites_list, 9)
-    page_number = request.GET.get('page')
-    favorites = paginator.get_page(page_number)
+    favorites_list = Favorite.objects.filter(user=request.user).select_related('recipe__author')
+    # Избранное одного пользователя ограничено, поэтому общее число страниц считаем
+    paginator = CursorPaginator(favorites_list, 9, with_count=True)
+    favorites = paginator.get_page(request.GET.get('cursor'))
     
     context = {
         'favorites': favorites,
@@ -270,11 +312,18 @@ def rate_recipe(request, slug):
         if score and score.isdigit():
             score = int(score)
             if 1 <= score <= 5:
-                rating, created = Rating.objects.update_or_create(
-                    user=request.user,
-                    recipe=recipe,
-                    defaults={'score': score}
-                )
+                with transaction.atomic():
+                    rating = Rating.objects.select_for_update().filter(
+                        user=request.user, recipe=recipe
+                    ).first()
+                    if rating is None:
+                        Rating.objects.create(user=request.user, recipe=recipe, score=score)
+                        recipe.bump_counters(rating_count=1, rating_sum=score)
+                    elif rating.score != score:
+                        old_score = rating.score
+                        rating.score = score
+                        rating.save(update_fields=['score', 'updated_at'])
+                        recipe.bump_counters(rating_sum=score - old_score)
                 
                 if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
                     return JsonResponse({
@@ -299,9 +348,11 @@ def add_comment(request, slug):
             comment = form.save(commit=False)
             comment.recipe = recipe
             comment.user = request.user
-            comment.save()
+            with transaction.atomic():
+                comment.save()
+                recipe.bump_counters(comments_count=1)
             # Создаем уведомление о комментарии
-            Notification.create_comment_notification(request.user, recipe, comment)
+            tasks.notify_comment.delay(comment.pk)
             messages.success(request, 'Комментарий успешно добавлен!')
 
     return redirect('recipe-detail', slug=slug)
@@ -320,12 +371,24 @@ def reply_comment(request, slug, comment_id):
             reply.recipe = recipe
             reply.user = request.user
             reply.parent = parent_comment
-            reply.save()
+            with transaction.atomic():
+                reply.save()
+                recipe.bump_counters(comments_count=1)
             messages.success(request, 'Ответ добавлен!')
     
     return redirect('recipe-detail', slug=slug)
 
 
+def comment_replies(request, slug, comment_id):
+    """Следующая страница ответов на комментарий (JSON)"""
+    comment = get_object_or_404(Comment, id=comment_id, recipe__slug=slug)
+    replies, next_before = comment_tree.comment_replies(comment, before=_int_param(request, 'before'))
+    return JsonResponse({
+        'replies': [comment_tree.serialize(reply) for reply in replies],
+        'next_before': next_before,
+    })
+
+
 @login_required
 def delete_comment(request, slug, comment_id):
     """Удалить комментарий"""
@@ -333,7 +396,10 @@ def delete_comment(request, slug, comment_id):
     comment = get_object_or_404(Comment, id=comment_id, recipe=recipe)
     
     if comment.user == request.user:
-        comment.delete()
+        with transaction.atomic():
+            # Вместе с комментарием каскадно удаляются все ответы на него
+            _, deleted = comment.delete()
+            recipe.bump_counters(comments_count=-deleted.get(Comment._meta.label, 0))
         messages.success(request, 'Комментарий удалён!')
     else:
         messages.error(request, 'Вы можете удалять только свои комментарии!')
@@ -341,36 +407,53 @@ def delete_comment(request, slug, comment_id):
     return redirect('recipe-detail', slug=slug)
 
 
+@read_from_replica
 def search_recipes(request):
-    query = request.GET.get('q', '')
-    recipes_list = Recipe.objects.filter(is_published=True)
-
-    if query:
-        recipes_list = recipes_list.filter(
-            Q(title__icontains=query) |
-            Q(description__icontains=query) |
-            Q(ingredients__icontains=query) |
-            Q(category__name__icontains=query) |
-            Q(tags__name__icontains=query)
-        ).distinct()
-
-    paginator = Paginator(recipes_list, 6)
-    page_number = request.GET.get('page')
-    recipes = paginator.get_page(page_number)
+    query = request.GET.get('q', '').strip()
+    ranked = bool(query) and search.fts_available()
+
+    if ranked:
+        # Полнотекстовый поиск: результатов не больше search.MAX_RESULTS,
+        # поэтому обычная постраничная навигация здесь дешёвая
+        hits = search.search(query)
+        paginator = Paginator(hits, 6)
+        recipes = paginator.get_page(request.GET.get('page'))
+        found = Recipe.objects.select_related('author', 'category').order_by().in_bulk([hit.recipe_id for hit in recipes])
+        page_recipes = []
+        for hit in recipes:
+            recipe = found.get(hit.recipe_id)
+            if recipe is not None:
+                recipe.search_snippet = hit.snippet
+                page_recipes.append(recipe)
+        recipes.object_list = page_recipes
+    else:
+        recipes_list = Recipe.objects.filter(is_published=True).select_related('author', 'category')
+        if query:
+            recipes_list = recipes_list.filter(
+                Q(title__icontains=query) |
+                Q(description__icontains=query) |
+                Q(ingredient_items__name__icontains=query) |
+                Q(category__name__icontains=query) |
+                Q(tags__name__icontains=query)
+            ).distinct()
+        paginator = CursorPaginator(recipes_list, 6)
+        recipes = paginator.get_page(request.GET.get('cursor'))
 
     context = {
         'recipes': recipes,
         'query': query,
+        'ranked': ranked,
     }
     return render(request, 'recipes/search_results.html', context)
 
 
+@pagecache.cache_anonymous
 def user_recipes(request, username):
     user = get_object_or_404(User, username=username)
-    recipes_list = Recipe.objects.filter(author=user, is_published=True).order_by('-created_at')
-    paginator = Paginator(recipes_list, 6)
-    page_number = request.GET.get('page')
-    recipes = paginator.get_page(page_number)
+    recipes_list = Recipe.objects.filter(author=user, is_published=True).select_related('author', 'category')
+    # Рецептов одного автора немного, поэтому общее число страниц считаем
+    paginator = CursorPaginator(recipes_list, 6, with_count=True)
+    recipes = paginator.get_page(request.GET.get('cursor'))
     
     # Проверяем, подписан ли текущий пользователь на этого автора
     is_following = False
@@ -382,6 +465,8 @@ def user_recipes(request, username):
         'recipes': recipes,
         'is_following': is_following,
     }
+    pagecache.tag(request, f'author:{user.pk}')
+    pagecache.tag_recipes(request, recipes)
     return render(request, 'recipes/user_recipes.html', context)
 
 
@@ -522,9 +607,13 @@ def shopping_list(request):
     if request.method == 'POST':
         form = ShoppingItemForm(request.POST)
         if form.is_valid():
-            item = form.save(commit=False)
-            item.shopping_list = shopping_list
-            item.save()
+            entry = shopping.manual_entry(form.cleaned_data['name'], form.cleaned_data['quantity'])
+            if entry is None:
+                item = form.save(commit=False)
+                item.shopping_list = shopping_list
+                item.save()
+            else:
+                shopping.merge_items(shopping_list, [entry])
             messages.success(request, 'Элемент добавлен!')
             return redirect('shopping-list')
     else:
@@ -550,17 +639,9 @@ def add_recipe_to_shopping_list(request, slug):
     if request.method == 'POST':
         form = AddRecipeToShoppingListForm(request.POST, recipe=recipe)
         if form.is_valid():
-            selected_indices = form.cleaned_data.get('ingredients', [])
-            ingredient_lines = [line.strip() for line in recipe.ingredients.split('\n') if line.strip()]
-            
-            for idx in selected_indices:
-                idx = int(idx)
-                if 0 <= idx < len(ingredient_lines):
-                    ShoppingItem.objects.create(
-                        shopping_list=shopping_list,
-                        name=ingredient_lines[idx],
-                        recipe=recipe
-                    )
+            selected = {int(position) for position in form.cleaned_data.get('ingredients', [])}
+            items = [item for item in form.recipe_ingredients if item.position in selected]
+            shopping.merge_items(shopping_list, shopping.recipe_entries(recipe, items))
             
             messages.success(request, f'Ингредиенты добавлены в список покупок!')
             return redirect('shopping-list')
@@ -574,6 +655,35 @@ def add_recipe_to_shopping_list(request, slug):
     return render(request, 'recipes/add_to_shopping_list.html', context)
 
 
+@login_required
+def add_cookbook_to_shopping_list(request, cookbook_id):
+    """Добавить ингредиенты всех рецептов кулинарной книги в список покупок"""
+    cookbook = get_object_or_404(Cookbook, id=cookbook_id)
+    
+    if cookbook.user != request.user and not cookbook.is_public:
+        messages.error(request, 'Эта кулинарная книга приватная!')
+        return redirect('cookbook-list')
+    
+    if request.method != 'POST':
+        return redirect('cookbook-detail', cookbook_id=cookbook.id)
+    
+    shopping_list, created = ShoppingList.objects.get_or_create(
+        user=request.user,
+        defaults={'name': 'Мой список покупок'}
+    )
+    entries = []
+    for recipe in cookbook.recipes.prefetch_related('ingredient_items'):
+        entries.extend(shopping.recipe_entries(recipe, ingredients.for_recipe(recipe)))
+    created_count, updated_count = shopping.merge_items(shopping_list, entries)
+    
+    messages.success(
+        request,
+        f'Ингредиенты книги "{cookbook.name}" добавлены в список покупок: '
+        f'новых позиций {created_count}, обновлено {updated_count}.'
+    )
+    return redirect('shopping-list')
+
+
 @login_required
 def toggle_shopping_item(request, item_id):
     """Отметить/снять отметку с элемента списка"""
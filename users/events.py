@@ -0,0 +1,221 @@
+"""Поток уведомлений через Server-Sent Events.
+
+Каждая вкладка держит одно соединение (users.views.notifications_stream).
+Соединения процесса подписываются на общий NotificationHub: одна фоновая
+задача раз в NOTIFICATIONS_POLL_INTERVAL секунд читает из таблицы
+уведомлений только новые строки (id > последнего прочитанного) и раздаёт
+их подписчикам. Уведомления создаются и обработчиками очереди в других
+процессах, поэтому хаб читает таблицу, а не слушает сигналы; пока
+подписчиков нет, запросов к базе нет вовсе.
+
+Идентификатор события — id уведомления: при переподключении браузер
+присылает Last-Event-ID, и пропущенные уведомления досылаются. Сводные
+уведомления (Notification.coalesce) при каждом новом отправителе
+пересоздаются с новым id, поэтому тоже приходят в поток; поле replaces
+события указывает, какое уведомление они заменили.
+
+Счётчик непрочитанных в событиях берётся из базы, а не считается в
+процессе. Прочтение и удаление новых строк не создают, поэтому пишущие
+пути увеличивают Profile.notifications_version; хаб на каждом шаге
+сверяет версии подключённых пользователей и для изменившихся
+пересчитывает счётчик одним запросом и присылает событие unread.
+Работает только под ASGI (pre_recipe_blog.asgi).
+"""
+import asyncio
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import Max
+
+from .models import Notification, Profile
+
+POLL_BATCH_SIZE = 500
+# При большем числе подключённых пользователей фильтр по получателю не передаётся в запрос
+MAX_RECIPIENT_FILTER = 500
+BACKLOG_SIZE = 20
+RETRY_MS = 5000
+
+_FIELDS = ('id', 'recipient_id', 'notification_type', 'title', 'message', 'link', 'previous_id')
+
+
+def poll_interval():
+    return getattr(settings, 'NOTIFICATIONS_POLL_INTERVAL', 1.0)
+
+
+def heartbeat_interval():
+    return getattr(settings, 'NOTIFICATIONS_HEARTBEAT', 15)
+
+
+def format_event(data, event=None, event_id=None):
+    lines = []
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    if event:
+        lines.append(f'event: {event}')
+    lines.append(f'data: {json.dumps(data, ensure_ascii=False)}')
+    return '\n'.join(lines) + '\n\n'
+
+
+class Subscriber:
+    def __init__(self, user_id, unread, last_id, version):
+        self.user_id = user_id
+        self.unread = unread
+        self.last_id = last_id
+        self.version = version
+        self.queue = asyncio.Queue()
+
+    def deliver(self, row, unread=None):
+        if row['id'] <= self.last_id:
+            return
+        self.last_id = row['id']
+        if unread is not None:
+            self.unread = unread
+        elif row['previous_id'] is None:
+            # Подключился после чтения счётчиков: сводное уведомление заменяет уже учтённое
+            self.unread += 1
+        self.queue.put_nowait(row)
+
+    def update_unread(self, unread, version):
+        """Принять счётчик из базы; None в очереди — событие unread"""
+        self.version = version
+        if unread != self.unread:
+            self.unread = unread
+            self.queue.put_nowait(None)
+
+
+class NotificationHub:
+    """Раздача новых уведомлений подписчикам одного процесса"""
+
+    def __init__(self):
+        self.subscribers = {}
+        self.cursor = None
+        self._task = None
+
+    def subscribe(self, subscriber):
+        self.subscribers.setdefault(subscriber.user_id, set()).add(subscriber)
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done() or self._task.get_loop() is not loop:
+            # Всё, что новее состояния первого подписчика на момент подключения, ему ещё не отправлено
+            self.cursor = subscriber.last_id
+            self._task = loop.create_task(self._poll())
+
+    def unsubscribe(self, subscriber):
+        subscribers = self.subscribers.get(subscriber.user_id)
+        if subscribers is not None:
+            subscribers.discard(subscriber)
+            if not subscribers:
+                del self.subscribers[subscriber.user_id]
+
+    def publish(self, rows, counted=(), counts=None, versions=None):
+        """Разослать новые строки; counted — подписчики, для которых прочитаны counts"""
+        counts = counts or {}
+        counted = set(counted)
+        for row in rows:
+            for subscriber in self.subscribers.get(row['recipient_id'], ()):
+                unread = counts.get(subscriber.user_id) if subscriber in counted else None
+                subscriber.deliver(row, unread)
+        for subscriber in counted:
+            if subscriber.user_id in counts:
+                subscriber.update_unread(counts[subscriber.user_id], versions[subscriber.user_id])
+
+    async def _poll(self):
+        while self.subscribers:
+            await asyncio.sleep(poll_interval())
+            while True:
+                counted = [subscriber for group in self.subscribers.values() for subscriber in group]
+                rows, counts, versions = await sync_to_async(_changes_after)(self.cursor, counted)
+                if rows:
+                    self.cursor = rows[-1]['id']
+                self.publish(rows, counted, counts, versions)
+                if len(rows) < POLL_BATCH_SIZE:
+                    break
+
+
+hub = NotificationHub()
+
+
+def _notifications_after(cursor, user_ids=None):
+    notifications = Notification.objects.filter(id__gt=cursor)
+    if user_ids is not None:
+        notifications = notifications.filter(recipient_id__in=user_ids)
+    return list(notifications.order_by('id').values(*_FIELDS)[:POLL_BATCH_SIZE])
+
+
+def _chunks(items, size=MAX_RECIPIENT_FILTER):
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _changes_after(cursor, subscribers):
+    """(новые строки, счётчики непрочитанных, версии) для изменившихся пользователей"""
+    user_ids = {subscriber.user_id for subscriber in subscribers}
+    rows = _notifications_after(cursor, user_ids if len(user_ids) <= MAX_RECIPIENT_FILTER else None)
+    # Версии читаются раньше счётчиков: прочтение между запросами даст лишний пересчёт, а не пропуск
+    versions = {}
+    for chunk in _chunks(user_ids):
+        versions.update(Profile.objects.filter(user_id__in=chunk).values_list('user_id', 'notifications_version'))
+    changed = {row['recipient_id'] for row in rows} & user_ids
+    changed.update(
+        subscriber.user_id for subscriber in subscribers
+        if versions.get(subscriber.user_id, 0) != subscriber.version
+    )
+    counts = {}
+    for chunk in _chunks(changed):
+        counts.update(Notification.unread_counts(chunk))
+    return rows, counts, versions
+
+
+def _connect_state(user_id, last_event_id):
+    """(непрочитанных, версия, последний id, пропущенные уведомления) на момент подключения"""
+    version, read_at = (
+        Profile.objects.filter(user_id=user_id)
+        .values_list('notifications_version', 'notifications_read_at').first() or (0, None)
+    )
+    unread = Notification.unread_for(user_id, read_at).count()
+    last_id = Notification.objects.filter(recipient_id=user_id).aggregate(last=Max('id'))['last'] or 0
+    backlog = []
+    if last_event_id is not None:
+        backlog = list(
+            Notification.objects.filter(recipient_id=user_id, id__gt=last_event_id)
+            .order_by('-id').values(*_FIELDS)[:BACKLOG_SIZE]
+        )[::-1]
+    return unread, version, last_id, backlog
+
+
+def _event_payload(row, unread):
+    return {
+        'id': row['id'],
+        'type': row['notification_type'],
+        'title': row['title'],
+        'message': row['message'],
+        'link': row['link'],
+        'replaces': row['previous_id'],
+        'unread': unread,
+    }
+
+
+async def stream(user_id, last_event_id=None):
+    """Асинхронный генератор SSE-сообщений для пользователя"""
+    unread, version, last_id, backlog = await sync_to_async(_connect_state)(user_id, last_event_id)
+    subscriber = Subscriber(user_id, unread, last_id, version)
+    hub.subscribe(subscriber)
+    try:
+        yield f'retry: {RETRY_MS}\n\n'
+        for row in backlog:
+            yield format_event(_event_payload(row, unread), 'notification', row['id'])
+        yield format_event({'count': unread}, 'unread')
+        while True:
+            try:
+                row = await asyncio.wait_for(subscriber.queue.get(), heartbeat_interval())
+            except asyncio.TimeoutError:
+                # Комментарий не виден клиенту, но не даёт прокси закрыть соединение
+                yield ': ping\n\n'
+                continue
+            if row is None:
+                yield format_event({'count': subscriber.unread}, 'unread')
+            else:
+                yield format_event(_event_payload(row, subscriber.unread), 'notification', row['id'])
+    finally:
+        hub.unsubscribe(subscriber)
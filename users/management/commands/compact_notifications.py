@@ -0,0 +1,59 @@
+import json
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db.models import F, Q
+from django.utils import timezone
+
+from users.models import Notification
+
+
+class Command(BaseCommand):
+    help = ('Удаляет прочитанные уведомления старше указанного числа дней, пачками. '
+            'С --archive удаляемые уведомления предварительно дописываются в файл (JSON Lines)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=90,
+                            help='Удалять прочитанные уведомления старше стольких дней')
+        parser.add_argument('--chunk-size', type=int, default=1000,
+                            help='Количество уведомлений, удаляемых за один запрос')
+        parser.add_argument('--archive', metavar='PATH',
+                            help='Файл, в который дописываются удаляемые уведомления')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Только посчитать, сколько уведомлений будет удалено')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        # Прочитанные: отмеченные по отдельности или не новее отметки «прочитано до» в профиле
+        expired = Notification.objects.filter(created_at__lt=cutoff).filter(
+            Q(is_read=True) | Q(created_at__lte=F('recipient__profile__notifications_read_at'))
+        )
+
+        if options['dry_run']:
+            self.stdout.write(f'Будет удалено уведомлений: {expired.count()}')
+            return
+
+        archive = open(options['archive'], 'a', encoding='utf-8') if options['archive'] else None
+        deleted = 0
+        last_pk = 0
+        try:
+            while True:
+                chunk = list(
+                    expired.filter(pk__gt=last_pk).order_by('pk')
+                    .values('id', 'recipient_id', 'sender_id', 'notification_type', 'title',
+                            'message', 'link', 'actor_count', 'created_at')[:options['chunk_size']]
+                )
+                if not chunk:
+                    break
+                if archive:
+                    for row in chunk:
+                        archive.write(json.dumps(row, ensure_ascii=False, default=str) + '\n')
+                    archive.flush()
+                last_pk = chunk[-1]['id']
+                deleted += Notification.objects.filter(pk__in=[row['id'] for row in chunk]).delete()[0]
+                self.stdout.write(f'Удалено уведомлений: {deleted}')
+        finally:
+            if archive:
+                archive.close()
+
+        self.stdout.write(self.style.SUCCESS(f'Готово. Удалено уведомлений: {deleted}'))
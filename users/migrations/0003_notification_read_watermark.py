@@ -0,0 +1,24 @@
+# Generated by Django 5.0 on 2026-10-18 02:28
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_alter_profile_options_alter_profile_bio_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='notifications_read_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Уведомления прочитаны до'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['recipient', 'created_at'], name='notification_recipient_idx'),
+        ),
+    ]
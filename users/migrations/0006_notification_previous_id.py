@@ -0,0 +1,18 @@
+# Generated by Django 5.0 on 2026-10-18 03:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0005_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notification',
+            name='previous_id',
+            field=models.BigIntegerField(blank=True, null=True, verbose_name='Заменённое уведомление'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0 on 2026-10-18 03:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0006_notification_previous_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='notifications_version',
+            field=models.PositiveIntegerField(default=0, verbose_name='Версия уведомлений'),
+        ),
+    ]
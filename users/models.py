@@ -1,12 +1,22 @@
-from django.db import models
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models import Count, F, Q
 from django.contrib.auth.models import User
 from django.utils import timezone
 
+from recipes.images import Variants
+
 
 class Profile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, verbose_name='Пользователь')
     bio = models.TextField(max_length=500, blank=True, verbose_name='Биография')
     profile_image = models.ImageField(upload_to='profile_images/', default='profile_images/default.jpg', verbose_name='Фото профиля')
+    # Уведомления, созданные не позже этой отметки, считаются прочитанными
+    notifications_read_at = models.DateTimeField(null=True, blank=True, verbose_name='Уведомления прочитаны до')
+    # Растёт при каждом прочтении или удалении: по нему поток уведомлений (users.events) пересчитывает счётчик
+    notifications_version = models.PositiveIntegerField(default=0, verbose_name='Версия уведомлений')
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')
     updated_at = models.DateTimeField(auto_now=True, verbose_name='Дата обновления')
 
@@ -17,6 +27,16 @@ class Profile(models.Model):
     def __str__(self):
         return f'Профиль {self.user.username}'
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_image = instance.__dict__.get('profile_image')
+        return instance
+
+    def profile_image_changed(self):
+        """Отличается ли фото от загруженного из базы"""
+        return self.profile_image.name != getattr(self, '_loaded_image', None)
+
     @property
     def followers_count(self):
         return self.user.followers.count()
@@ -25,6 +45,10 @@ class Profile(models.Model):
     def following_count(self):
         return self.user.following.count()
 
+    @property
+    def avatar(self):
+        return Variants(self.profile_image, 'avatar')
+
 
 class Follow(models.Model):
     """Подписка на пользователей"""
@@ -63,39 +87,159 @@ class Notification(models.Model):
     message = models.TextField(verbose_name='Сообщение')
     link = models.URLField(blank=True, verbose_name='Ссылка')
     is_read = models.BooleanField(default=False, verbose_name='Прочитано')
+    # Повторяющиеся события (лайки рецепта, подписки) сводятся в одну строку по ключу группы
+    group_key = models.CharField(max_length=100, blank=True, verbose_name='Ключ группы')
+    actor_ids = models.JSONField(default=list, blank=True, verbose_name='Последние отправители')
+    actor_count = models.PositiveIntegerField(default=1, verbose_name='Отправителей')
+    # Сводное уведомление заменяется новой строкой, чтобы поток уведомлений (users.events) увидел новый id
+    previous_id = models.BigIntegerField(null=True, blank=True, verbose_name='Заменённое уведомление')
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')
 
+    # Сколько последних отправителей хранить для проверки повторов
+    MAX_ACTOR_IDS = 100
+
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['recipient', 'created_at'], name='notification_recipient_idx'),
+            models.Index(fields=['recipient', 'group_key'], name='notification_group_idx'),
+            models.Index(fields=['recipient', 'is_read', 'created_at'], name='notification_unread_idx'),
+        ]
         verbose_name = 'Уведомление'
         verbose_name_plural = 'Уведомления'
 
     def __str__(self):
         return f'{self.recipient.username}: {self.title}'
 
+    def is_read_before(self, read_at):
+        """Прочитано ли уведомление с учётом отметки «прочитано до»"""
+        return self.is_read or (read_at is not None and self.created_at <= read_at)
+
+    @staticmethod
+    def read_watermark(user):
+        return Profile.objects.filter(user=user).values_list('notifications_read_at', flat=True).first()
+
+    @classmethod
+    def unread_for(cls, user, read_at=None):
+        """Непрочитанные: новее отметки «прочитано до» и не отмеченные прочитанными по отдельности"""
+        notifications = cls.objects.filter(recipient=user, is_read=False)
+        if read_at is not None:
+            notifications = notifications.filter(created_at__gt=read_at)
+        return notifications
+
+    @classmethod
+    def unread_counts(cls, user_ids):
+        """Число непрочитанных для каждого из пользователей одним запросом"""
+        rows = (
+            cls.objects.filter(recipient_id__in=user_ids, is_read=False)
+            .filter(
+                Q(recipient__profile__notifications_read_at__isnull=True)
+                | Q(created_at__gt=F('recipient__profile__notifications_read_at'))
+            )
+            .order_by().values('recipient_id').annotate(count=Count('id'))
+        )
+        counts = dict.fromkeys(user_ids, 0)
+        counts.update((row['recipient_id'], row['count']) for row in rows)
+        return counts
+
+    @staticmethod
+    def unread_changed(user):
+        """Отметить, что непрочитанных стало меньше без появления новых уведомлений"""
+        Profile.objects.filter(user=user).update(notifications_version=F('notifications_version') + 1)
+
+    @classmethod
+    def mark_all_read(cls, user):
+        """Отметить все уведомления прочитанными одной записью в профиль"""
+        Profile.objects.filter(user=user).update(
+            notifications_read_at=timezone.now(),
+            notifications_version=F('notifications_version') + 1,
+        )
+
+    @classmethod
+    def coalesce(cls, recipient, sender, notification_type, group_key, title, message, link):
+        """Создать уведомление или добавить отправителя в непрочитанное уведомление той же группы.
+
+        message и link — функции от количества отправителей. Повторные действия
+        одного отправителя (лайк, снятие, снова лайк) счётчик не увеличивают.
+        Сводное уведомление не обновляется на месте, а пересоздаётся: новая
+        строка получает следующий id и previous_id старой.
+        """
+        window = timedelta(hours=getattr(settings, 'NOTIFICATION_COALESCE_HOURS', 24))
+        now = timezone.now()
+        with transaction.atomic():
+            notification = (
+                cls.unread_for(recipient, cls.read_watermark(recipient))
+                .filter(group_key=group_key, created_at__gte=now - window)
+                .select_for_update().order_by('-created_at').first()
+            )
+            if notification is None:
+                return cls.objects.create(
+                    recipient=recipient,
+                    sender=sender,
+                    notification_type=notification_type,
+                    group_key=group_key,
+                    actor_ids=[sender.pk],
+                    title=title,
+                    message=message(sender, 1),
+                    link=link(sender, 1),
+                )
+            actor_ids = list(notification.actor_ids)
+            actor_count = notification.actor_count
+            if sender.pk in actor_ids:
+                actor_ids.remove(sender.pk)
+            else:
+                actor_count += 1
+            previous_id = notification.pk
+            notification.delete()
+            # Новая строка поднимает сводное уведомление наверх списка
+            return cls.objects.create(
+                recipient=recipient,
+                sender=sender,
+                notification_type=notification_type,
+                group_key=group_key,
+                actor_ids=(actor_ids + [sender.pk])[-cls.MAX_ACTOR_IDS:],
+                actor_count=actor_count,
+                previous_id=previous_id,
+                title=title,
+                message=message(sender, actor_count),
+                link=link(sender, actor_count),
+            )
+
+    @staticmethod
+    def _with_others(sender, count):
+        return sender.username if count == 1 else f'{sender.username} и ещё {count - 1}'
+
     @classmethod
     def create_follow_notification(cls, follower, following):
         """Создать уведомление о новой подписке"""
-        return cls.objects.create(
+        return cls.coalesce(
             recipient=following,
             sender=follower,
             notification_type='follow',
+            group_key='follow',
             title='Новый подписчик',
-            message=f'{follower.username} подписался на вас',
-            link=f'/user/{follower.username}/'
+            message=lambda sender, count: (
+                f'{sender.username} подписался на вас' if count == 1
+                else f'{cls._with_others(sender, count)} подписались на вас'
+            ),
+            link=lambda sender, count: f'/user/{sender.username}/' if count == 1 else '/users/followers/',
         )
 
     @classmethod
     def create_like_notification(cls, user, recipe):
         """Создать уведомление о лайке"""
         if user != recipe.author:
-            return cls.objects.create(
+            return cls.coalesce(
                 recipient=recipe.author,
                 sender=user,
                 notification_type='like',
+                group_key=f'like:{recipe.pk}',
                 title='Новый лайк',
-                message=f'{user.username} оценил ваш рецепт "{recipe.title}"',
-                link=f'/recipe/{recipe.slug}/'
+                message=lambda sender, count: (
+                    f'{sender.username} оценил ваш рецепт "{recipe.title}"' if count == 1
+                    else f'{cls._with_others(sender, count)} оценили ваш рецепт "{recipe.title}"'
+                ),
+                link=lambda sender, count: f'/recipe/{recipe.slug}/',
             )
         return None
 
@@ -103,28 +247,31 @@ class Notification(models.Model):
     def create_comment_notification(cls, user, recipe, comment):
         """Создать уведомление о комментарии"""
         if user != recipe.author:
-            return cls.objects.create(
+            return cls.coalesce(
                 recipient=recipe.author,
                 sender=user,
                 notification_type='comment',
+                group_key=f'comment:{recipe.pk}',
                 title='Новый комментарий',
-                message=f'{user.username} прокомментировал ваш рецепт "{recipe.title}"',
-                link=f'/recipe/{recipe.slug}/'
+                message=lambda sender, count: (
+                    f'{sender.username} прокомментировал ваш рецепт "{recipe.title}"' if count == 1
+                    else f'{cls._with_others(sender, count)} прокомментировали ваш рецепт "{recipe.title}"'
+                ),
+                link=lambda sender, count: f'/recipe/{recipe.slug}/',
             )
         return None
 
     @classmethod
-    def create_recipe_notification(cls, recipe):
-        """Создать уведомления о новом рецепте для подписчиков"""
-        notifications = []
-        for follow in recipe.author.followers.all():
-            notification = cls.objects.create(
-                recipient=follow.follower,
-                sender=recipe.author,
+    def create_recipe_notifications(cls, recipe, recipient_ids):
+        """Создать уведомления о новом рецепте для пачки подписчиков одним запросом"""
+        return cls.objects.bulk_create([
+            cls(
+                recipient_id=recipient_id,
+                sender_id=recipe.author_id,
                 notification_type='recipe',
                 title='Новый рецепт',
                 message=f'{recipe.author.username} опубликовал новый рецепт "{recipe.title}"',
                 link=f'/recipe/{recipe.slug}/'
             )
-            notifications.append(notification)
-        return notifications
+            for recipient_id in recipient_ids
+        ])
@@ -1,13 +1,32 @@
 from django.db.models.signals import post_save
 from django.contrib.auth.models import User
 from django.dispatch import receiver
+from recipes import images, pagecache
 from .models import Profile
 
+# Поля пользователя, которых нет на страницах: вход (update_last_login) и смена пароля
+PRIVATE_USER_FIELDS = {'last_login', 'password'}
+
 @receiver(post_save, sender=User)
 def create_profile(sender, instance, created, **kwargs):
     if created:
         Profile.objects.create(user=instance)
 
 @receiver(post_save, sender=User)
-def save_profile(sender, instance, **kwargs):
-    instance.profile.save()
\ No newline at end of file
+def save_profile(sender, instance, update_fields=None, **kwargs):
+    if update_fields and set(update_fields) <= PRIVATE_USER_FIELDS:
+        return
+    instance.profile.save()
+
+@receiver(post_save, sender=Profile)
+def schedule_profile_images(sender, instance, created=False, raw=False, **kwargs):
+    # Проверка копий обращается к хранилищу, поэтому только для нового профиля и при смене фото
+    if not raw and (created or instance.profile_image_changed()):
+        images.schedule(instance)
+        instance._loaded_image = instance.profile_image.name
+
+@receiver(post_save, sender=Profile)
+def purge_author_pages(sender, instance, raw=False, **kwargs):
+    # Профиль сохраняется и при сохранении пользователя (save_profile), кроме входа и смены пароля
+    if not raw:
+        pagecache.purge_on_commit(f'author:{instance.user_id}')
@@ -0,0 +1,12 @@
+"""Фоновые задачи приложения users (выполняются обработчиком jobs)"""
+from jobs.queue import task
+from .models import Follow, Notification
+
+
+@task
+def notify_follow(follower_id, following_id):
+    follow = Follow.objects.select_related('follower', 'following').filter(
+        follower_id=follower_id, following_id=following_id
+    ).first()
+    if follow:
+        Notification.create_follow_notification(follow.follower, follow.following)
@@ -1,3 +1,114 @@
-from django.test import TestCase
+import json
+import os
+import tempfile
+from datetime import timedelta
+from io import StringIO
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from .models import Notification
+
+
+class NotificationTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author, cls.reader, cls.other = [
+            User.objects.create_user(username) for username in ('author', 'reader', 'other')
+        ]
+
+    def follow(self, follower):
+        return Notification.create_follow_notification(follower, self.author)
+
+
+class CoalesceTests(NotificationTestCase):
+    def test_first_sender_creates_notification(self):
+        notification = self.follow(self.reader)
+        self.assertEqual((notification.actor_count, notification.actor_ids), (1, [self.reader.pk]))
+        self.assertIsNone(notification.previous_id)
+        self.assertEqual(notification.message, 'reader подписался на вас')
+
+    def test_new_sender_recreates_row_with_previous_id(self):
+        first = self.follow(self.reader)
+        second = self.follow(self.other)
+        self.assertGreater(second.pk, first.pk)
+        self.assertEqual(second.previous_id, first.pk)
+        self.assertEqual(second.actor_count, 2)
+        self.assertEqual(second.message, 'other и ещё 1 подписались на вас')
+        self.assertEqual(list(Notification.objects.filter(recipient=self.author)), [second])
+
+    def test_same_sender_does_not_increment_actor_count(self):
+        self.follow(self.reader)
+        self.follow(self.other)
+        again = self.follow(self.reader)
+        self.assertEqual(again.actor_count, 2)
+        # Повторивший действие отправитель переезжает в конец списка
+        self.assertEqual(again.actor_ids, [self.other.pk, self.reader.pk])
+        self.assertEqual(Notification.objects.filter(recipient=self.author).count(), 1)
+
+    def test_read_notification_is_not_coalesced(self):
+        first = self.follow(self.reader)
+        Notification.mark_all_read(self.author)
+        second = self.follow(self.other)
+        self.assertIsNone(second.previous_id)
+        self.assertEqual(second.actor_count, 1)
+        self.assertTrue(Notification.objects.filter(pk=first.pk).exists())
+
+    @override_settings(NOTIFICATION_COALESCE_HOURS=2)
+    def test_notification_outside_window_is_not_coalesced(self):
+        first = self.follow(self.reader)
+        Notification.objects.filter(pk=first.pk).update(created_at=timezone.now() - timedelta(hours=3))
+        second = self.follow(self.other)
+        self.assertIsNone(second.previous_id)
+        self.assertEqual(Notification.objects.filter(recipient=self.author).count(), 2)
+
+        Notification.objects.filter(pk=second.pk).update(created_at=timezone.now() - timedelta(hours=1))
+        third = self.follow(self.reader)
+        self.assertEqual((third.previous_id, third.actor_count), (second.pk, 2))
+
+
+class CompactNotificationsTests(NotificationTestCase):
+    def setUp(self):
+        old = timezone.now() - timedelta(days=100)
+
+        def create(recipient, created_at, is_read=False):
+            notification = Notification.objects.create(
+                recipient=recipient, sender=self.other, notification_type='follow', title='t', message='m',
+                is_read=is_read,
+            )
+            Notification.objects.filter(pk=notification.pk).update(created_at=created_at)
+            return notification.pk
+
+        self.read_old = create(self.author, old, is_read=True)
+        self.watermarked_old = create(self.reader, old)
+        self.unread_old = create(self.author, old)
+        self.read_recent = create(self.author, timezone.now(), is_read=True)
+        # У reader всё не новее отметки считается прочитанным
+        self.reader.profile.notifications_read_at = old + timedelta(days=1)
+        self.reader.profile.save()
+
+    def remaining(self):
+        return set(Notification.objects.values_list('pk', flat=True))
+
+    def test_deletes_old_read_notifications(self):
+        call_command('compact_notifications', chunk_size=1, stdout=StringIO())
+        self.assertEqual(self.remaining(), {self.unread_old, self.read_recent})
+
+    def test_dry_run_only_counts(self):
+        out = StringIO()
+        call_command('compact_notifications', dry_run=True, stdout=out)
+        self.assertIn('Будет удалено уведомлений: 2', out.getvalue())
+        self.assertEqual(len(self.remaining()), 4)
+
+    def test_archive_appends_deleted_rows(self):
+        handle, path = tempfile.mkstemp(suffix='.jsonl')
+        os.close(handle)
+        self.addCleanup(os.remove, path)
+        call_command('compact_notifications', archive=path, stdout=StringIO())
+        with open(path, encoding='utf-8') as archive:
+            rows = [json.loads(line) for line in archive]
+        self.assertEqual({row['id'] for row in rows}, {self.read_old, self.watermarked_old})
+        self.assertEqual({row['title'] for row in rows}, {'t'})
+        self.assertEqual(self.remaining(), {self.unread_old, self.read_recent})
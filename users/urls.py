@@ -13,6 +13,7 @@ urlpatterns = [
     path('followers/', views.followers_list, name='followers'),
     path('notifications/', views.notifications, name='notifications'),
     path('notifications/count/', views.notifications_count, name='notifications-count'),
+    path('notifications/stream/', views.notifications_stream, name='notifications-stream'),
     path('notifications/<int:notification_id>/read/', views.mark_notification_read, name='mark-notification-read'),
     path('notifications/<int:notification_id>/delete/', views.delete_notification, name='delete-notification'),
 ]
@@ -4,11 +4,15 @@ from django.contrib.auth import login
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
-from django.http import JsonResponse
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
 from django.core.paginator import Paginator
 from .models import Profile, Follow, Notification
+from . import events
 from .forms import UserUpdateForm, ProfileUpdateForm
 from recipes.models import Recipe
+from recipes import tasks as recipe_tasks
+from . import tasks
 
 
 def register(request):
@@ -81,11 +85,13 @@ def follow_user(request, username):
     )
     
     if created:
-        # Создаем уведомление о новой подписке
-        Notification.create_follow_notification(request.user, user_to_follow)
+        # Уведомление и записи ленты создаются в фоне
+        tasks.notify_follow.delay(request.user.pk, user_to_follow.pk)
+        recipe_tasks.follow_author.delay(request.user.pk, user_to_follow.pk)
         message = f'Вы подписались на {user_to_follow.username}'
     else:
         follow.delete()
+        recipe_tasks.unfollow_author.delay(request.user.pk, user_to_follow.pk)
         message = f'Вы отписались от {user_to_follow.username}'
     
     # Если это AJAX запрос
@@ -136,8 +142,13 @@ def notifications(request):
     page_number = request.GET.get('page')
     notifications = paginator.get_page(page_number)
     
+    # Выделяем то, что было непрочитанным до открытия страницы
+    read_at = Notification.read_watermark(request.user)
+    for notification in notifications:
+        notification.is_read = notification.is_read_before(read_at)
+    
     # Отмечаем все как прочитанные при просмотре
-    Notification.objects.filter(recipient=request.user, is_read=False).update(is_read=True)
+    Notification.mark_all_read(request.user)
     
     context = {
         'notifications': notifications,
@@ -148,16 +159,41 @@ def notifications(request):
 @login_required
 def notifications_count(request):
     """Количество непрочитанных уведомлений (для AJAX)"""
-    count = Notification.objects.filter(recipient=request.user, is_read=False).count()
+    read_at = Notification.read_watermark(request.user)
+    count = Notification.unread_for(request.user, read_at).count()
     return JsonResponse({'count': count})
 
 
+async def notifications_stream(request):
+    """Поток уведомлений (Server-Sent Events), заменяет опрос notifications_count"""
+    user = await request.auser()
+    if not user.is_authenticated:
+        return HttpResponse(status=401)
+    if not isinstance(request, ASGIRequest):
+        # Под WSGI бесконечный ответ занял бы поток целиком; 204 отключает переподключение
+        return HttpResponse(status=204)
+
+    try:
+        last_event_id = int(request.headers.get('Last-Event-ID', ''))
+    except ValueError:
+        last_event_id = None
+
+    response = StreamingHttpResponse(
+        events.stream(user.pk, last_event_id),
+        content_type='text/event-stream',
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
 @login_required
 def mark_notification_read(request, notification_id):
     """Отметить уведомление как прочитанное"""
-    notification = get_object_or_404(Notification, id=notification_id, recipient=request.user)
-    notification.is_read = True
-    notification.save()
+    updated = Notification.objects.filter(id=notification_id, recipient=request.user).update(is_read=True)
+    if not updated:
+        raise Http404
+    Notification.unread_changed(request.user)
     return JsonResponse({'success': True})
 
 
@@ -166,4 +202,5 @@ def delete_notification(request, notification_id):
     """Удалить уведомление"""
     notification = get_object_or_404(Notification, id=notification_id, recipient=request.user)
     notification.delete()
+    Notification.unread_changed(request.user)
     return JsonResponse({'success': True})